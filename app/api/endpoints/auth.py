@@ -2,16 +2,29 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from app.core.security import create_access_token
-from app.core.deps import get_db, get_current_user
+from app.core.deps import get_current_user
+from app.db.database import get_db
 from app.schemas import UserCreate, User, Token
 from app.services import auth_service
+from app.services.password_hashing import PasswordHasherBusyError
 
 router = APIRouter()
 
+
+def hashing_busy(e: PasswordHasherBusyError) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail=str(e),
+        headers={"Retry-After": "1"}
+    )
+
+
 @router.post("/signup", response_model=User)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
+async def signup(user: UserCreate, db: Session = Depends(get_db)):
     try:
-        return auth_service.create_user(db=db, user=user)
+        return await auth_service.create_user(db=db, user=user)
+    except PasswordHasherBusyError as e:
+        raise hashing_busy(e)
     except ValueError as e:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -25,11 +38,14 @@ def signup(user: UserCreate, db: Session = Depends(get_db)):
     
     
 @router.post("/login", response_model=Token)
-def login(
+async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
-    user = auth_service.authenticate_user(db, form_data.username, form_data.password)
+    try:
+        user = await auth_service.authenticate_user(db, form_data.username, form_data.password)
+    except PasswordHasherBusyError as e:
+        raise hashing_busy(e)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -1,46 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException
-from app.schemas import ChatQuery, User
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from typing import Any
+import json
+from app.schemas import ChatBatchQuery, ChatQuery, User
+from app.core.config import settings
+from app.core.components import get_chat_manager
 from app.core.deps import get_current_user
-from app.services.chat_manager import ChatManager
 import logging
 
 router = APIRouter()
-chat_manager = ChatManager()
+
+
+async def ensure_conversation(chat_manager, user_id: str, current_user: User) -> None:
+    # Add debug logging
+    logging.debug(f"Checking conversation for user {user_id}")
+    logging.debug(f"Active conversations: {chat_manager.conversations.keys()}")
+
+    # Check if user has an active conversation
+    if not chat_manager.has_active_conversation(user_id):
+        # Try to reinitialize from existing vectorstore
+        vectorstore = await run_in_threadpool(chat_manager.get_vectorstore, user_id)
+        if vectorstore:
+            # Rebuilding reads recent chat history from the database
+            await run_in_threadpool(
+                chat_manager.initialize_conversation,
+                user_id,
+                current_user.name,
+                vectorstore
+            )
+        else:
+            raise HTTPException(
+                status_code=400,
+                detail="Please upload a document before starting a chat. No active conversation found."
+            )
+
+
+def format_sse(event: str, data: Any) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def check_batch_size(batch: ChatBatchQuery) -> None:
+    if len(batch.queries) > settings.CHAT_BATCH_MAX_QUESTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"A batch can hold at most {settings.CHAT_BATCH_MAX_QUESTIONS} questions"
+        )
+
+
+def sse_response(events) -> StreamingResponse:
+    return StreamingResponse(
+        events,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 
 @router.post("/")
 async def chat(
     query: ChatQuery,
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    chat_manager=Depends(get_chat_manager)
 ):
     try:
         user_id = str(current_user.id)
-        
-        # Add debug logging
-        logging.debug(f"Checking conversation for user {user_id}")
-        logging.debug(f"Active conversations: {chat_manager.conversations.keys()}")
-        
-        # Check if user has an active conversation
-        if not chat_manager.has_active_conversation(user_id):
-            # Try to reinitialize from existing vectorstore
-            vectorstore = chat_manager.get_vectorstore(user_id)
-            if vectorstore:
-                chat_manager.initialize_conversation(
-                    user_id,
-                    current_user.name,
-                    vectorstore
-                )
-            else:
-                raise HTTPException(
-                    status_code=400,
-                    detail="Please upload a document before starting a chat. No active conversation found."
-                )
-            
+        await ensure_conversation(chat_manager, user_id, current_user)
+
         response = await chat_manager.get_response(user_id, query.query)
         return response
-        
+
+    except HTTPException:
+        raise
     except ValueError as e:
         logging.error(f"ValueError in chat endpoint: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Unexpected error in chat endpoint: {str(e)}", exc_info=True)
-        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
\ No newline at end of file
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.post("/stream")
+async def chat_stream(
+    query: ChatQuery,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    chat_manager=Depends(get_chat_manager)
+):
+    """Server-Sent Events: one `sources` event, `token` events as they are generated, then `done`"""
+    user_id = str(current_user.id)
+    try:
+        await ensure_conversation(chat_manager, user_id, current_user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        stream = chat_manager.stream_response(user_id, query.query)
+        try:
+            async for event in stream:
+                if await request.is_disconnected():
+                    # Closing the generator cancels the upstream LLM call
+                    logging.info(f"Client disconnected from chat stream for user {user_id}")
+                    break
+                yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            logging.error(f"Error in chat stream: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            await stream.aclose()
+
+    return sse_response(events())
+
+
+@router.post("/batch")
+async def chat_batch(
+    batch: ChatBatchQuery,
+    current_user: User = Depends(get_current_user),
+    chat_manager=Depends(get_chat_manager)
+):
+    """Answer several independent questions about the user's documents, in input order"""
+    check_batch_size(batch)
+    try:
+        user_id = str(current_user.id)
+        await ensure_conversation(chat_manager, user_id, current_user)
+        return await chat_manager.get_batch_response(user_id, batch.queries)
+
+    except HTTPException:
+        raise
+    except ValueError as e:
+        logging.error(f"ValueError in chat batch endpoint: {str(e)}")
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Unexpected error in chat batch endpoint: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=f"An error occurred: {str(e)}")
+
+
+@router.post("/batch/stream")
+async def chat_batch_stream(
+    batch: ChatBatchQuery,
+    request: Request,
+    current_user: User = Depends(get_current_user),
+    chat_manager=Depends(get_chat_manager)
+):
+    """Server-Sent Events: one `sources` event, an `answer` event per question in input order, then `done`"""
+    check_batch_size(batch)
+    user_id = str(current_user.id)
+    try:
+        await ensure_conversation(chat_manager, user_id, current_user)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    async def events():
+        stream = chat_manager.stream_batch(user_id, batch.queries)
+        try:
+            async for event in stream:
+                if await request.is_disconnected():
+                    logging.info(f"Client disconnected from chat batch stream for user {user_id}")
+                    break
+                yield format_sse(event["event"], event["data"])
+        except Exception as e:
+            logging.error(f"Error in chat batch stream: {str(e)}", exc_info=True)
+            yield format_sse("error", {"detail": str(e)})
+        finally:
+            await stream.aclose()
+
+    return sse_response(events())
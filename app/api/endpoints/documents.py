@@ -1,58 +1,115 @@
-from fastapi import APIRouter, Depends, UploadFile, File, HTTPException
-from app.schemas import User
+from fastapi import APIRouter, Depends, UploadFile, File, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from typing import Callable, Dict, List
+import os
+import time
+from app.schemas import BulkUploadResponse, DocumentInfo, IngestionJobStatus, User
+from app.core.components import get_document_processor
+from app.core.config import settings
 from app.core.deps import get_current_user
-from app.services.document_processor import DocumentProcessor
-from app.services.chat_manager import ChatManager
+from app.db.database import get_db
+from app.services.job_queue import IngestionQueue
+from app.services import document_service, job_service
 import logging
 
 router = APIRouter()
-doc_processor = DocumentProcessor()
-chat_manager = ChatManager()
 
-@router.post("/upload")
+
+async def run_ingestion_job(job: Dict, on_progress: Callable[[Dict], None]) -> Dict:
+    # The chat endpoint (re)initializes the conversation from the pooled vectorstore
+    doc_processor = await get_document_processor()
+    return await doc_processor.process_path(
+        job["file_path"],
+        job["filename"],
+        str(job["user_id"]),
+        on_progress=on_progress,
+        extra_metadata={"job_id": job["id"]},
+        file_hash=job["file_hash"]
+    )
+
+
+ingestion_queue = IngestionQueue(
+    run_ingestion_job,
+    workers=settings.INGEST_WORKERS,
+    flush_interval=settings.INGEST_PROGRESS_FLUSH_INTERVAL,
+    lease=settings.INGEST_JOB_LEASE
+)
+
+
+def _job_status(job) -> IngestionJobStatus:
+    job_status = IngestionJobStatus(
+        job_id=job.id,
+        filename=job.filename,
+        status=job.status,
+        pages_processed=job.pages_processed or 0,
+        chunks_indexed=job.chunks_indexed or 0,
+        chunks_total=job.chunks_total,
+        error=job.error,
+        created_at=job.created_at,
+        updated_at=job.updated_at
+    )
+    live = ingestion_queue.progress(job.id)
+    if live and job.status == job_service.RUNNING:
+        job_status = job_status.model_copy(update=live)
+    return job_status
+
+
+@router.post("/upload", status_code=status.HTTP_202_ACCEPTED, response_model=IngestionJobStatus)
 async def upload_document(
     file: UploadFile = File(...),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor=Depends(get_document_processor)
 ):
     logging.info(f"Starting document upload for user: {current_user.id}")
-    
+
     if not file:
         raise HTTPException(status_code=400, detail="No file provided")
-        
+
     if not file.filename:
         raise HTTPException(status_code=400, detail="No filename provided")
-    
+
     try:
-        # Process the document and get the vectorstore
-        user_id = str(current_user.id)
-        logging.info(f"Processing document {file.filename} for user {user_id}")
-        
-        result = await doc_processor.process_file(file, user_id)
-        
-        # Initialize conversation with the vectorstore
-        if result.get("vectorstore"):
-            logging.info(f"Initializing conversation for user {user_id}")
-            chat_manager.initialize_conversation(
-                user_id,
-                current_user.name,
-                result["vectorstore"]
+        # Spool the file where the worker (or a restarted process) can find it
+        upload = await doc_processor.save_upload(file, directory=settings.UPLOAD_FOLDER)
+        try:
+            duplicate = await run_in_threadpool(
+                document_service.get_document_by_hash, db, current_user.id, upload.sha256
+            )
+            job = await run_in_threadpool(
+                job_service.create_job,
+                db,
+                current_user.id,
+                file.filename,
+                upload.path,
+                upload.sha256,
+                job_service.SKIPPED if duplicate else job_service.QUEUED,
+                ingestion_queue.owner,
+                ingestion_queue.lease
             )
-            
-            # Verify conversation was initialized
-            if not chat_manager.has_active_conversation(user_id):
-                raise HTTPException(
-                    status_code=500,
-                    detail="Failed to initialize conversation after document upload"
-                )
-                
-            logging.info(f"Successfully processed document and initialized conversation for user {user_id}")
-            
-            return {
-                "status": result["status"],
-                "message": result["message"],
-                "chunks": result["chunks"]
-            }
-            
+        except Exception:
+            os.unlink(upload.path)
+            raise
+        
+        if duplicate:
+            # Nothing to embed; the worker would only find the same chunks again
+            os.unlink(upload.path)
+            logging.info(f"Skipped {file.filename}: identical to document {duplicate.id}")
+            return _job_status(job)
+
+        ingestion_queue.submit({
+            "id": job.id,
+            "user_id": job.user_id,
+            "filename": job.filename,
+            "file_path": job.file_path,
+            "file_hash": job.file_hash
+        })
+        logging.info(f"Queued ingestion job {job.id} for {file.filename}")
+        return _job_status(job)
+
+    except HTTPException:
+        raise
     except ValueError as e:
         logging.error(f"ValueError in document upload: {str(e)}")
         raise HTTPException(status_code=400, detail=str(e))
@@ -61,4 +118,126 @@ async def upload_document(
         raise HTTPException(
             status_code=500,
             detail=f"Error processing document: {str(e)}"
-        )
\ No newline at end of file
+        )
+
+
+@router.post("/upload/bulk", response_model=BulkUploadResponse)
+async def upload_documents(
+    files: List[UploadFile] = File(...),
+    current_user: User = Depends(get_current_user),
+    doc_processor=Depends(get_document_processor)
+):
+    """Index several files, or the files in ZIP archives, in the request and report on each one"""
+    if len(files) > settings.BULK_UPLOAD_MAX_FILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"At most {settings.BULK_UPLOAD_MAX_FILES} files are accepted per upload"
+        )
+    start = time.perf_counter()
+    user_id = str(current_user.id)
+    logging.info(f"Starting bulk upload of {len(files)} file(s) for user: {user_id}")
+
+    received = await doc_processor.save_uploads(files, directory=settings.UPLOAD_FOLDER)
+    try:
+        results = await doc_processor.process_bulk(received, user_id)
+    finally:
+        await run_in_threadpool(doc_processor.cleanup_uploads, received)
+
+    counts = {
+        status: sum(result["status"] == status for result in results)
+        for status in ("success", "skipped", "failed")
+    }
+    response = BulkUploadResponse(
+        files=results,
+        succeeded=counts["success"],
+        skipped=counts["skipped"],
+        failed=counts["failed"],
+        chunks=sum(result.get("chunks", 0) for result in results),
+        embedded=sum(result.get("embedded", 0) for result in results),
+        total_ms=round((time.perf_counter() - start) * 1000, 1)
+    )
+    logging.info(
+        f"Bulk upload for user {user_id}: {response.succeeded} indexed, {response.skipped} skipped, "
+        f"{response.failed} failed, {response.embedded} chunks embedded in {response.total_ms}ms"
+    )
+    return response
+
+
+@router.get("/jobs", response_model=List[IngestionJobStatus])
+async def list_jobs(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    jobs = await run_in_threadpool(job_service.get_user_jobs, db, current_user.id)
+    return [_job_status(job) for job in jobs]
+
+
+async def _get_user_job(job_id: str, current_user: User, db: Session):
+    job = await run_in_threadpool(job_service.get_job, db, job_id)
+    if job is None or job.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+@router.get("/jobs/{job_id}", response_model=IngestionJobStatus)
+async def get_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = await _get_user_job(job_id, current_user, db)
+    return _job_status(job)
+
+
+@router.post("/jobs/{job_id}/cancel", response_model=IngestionJobStatus)
+async def cancel_job(
+    job_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    job = await _get_user_job(job_id, current_user, db)
+    if job.status in job_service.FINISHED_STATUSES:
+        raise HTTPException(status_code=409, detail=f"Job is already {job.status}")
+
+    if not await ingestion_queue.cancel(job_id):
+        raise HTTPException(status_code=409, detail="Job has already finished")
+
+    db.expire(job)
+    job = await _get_user_job(job_id, current_user, db)
+    return _job_status(job)
+
+
+def _document_info(document) -> DocumentInfo:
+    return DocumentInfo(
+        document_id=document.id,
+        filename=document.filename,
+        file_hash=document.file_hash,
+        chunks=len(document.chunk_ids),
+        created_at=document.created_at,
+        updated_at=document.updated_at
+    )
+
+
+@router.get("/", response_model=List[DocumentInfo])
+async def list_documents(
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db)
+):
+    documents = await run_in_threadpool(document_service.get_user_documents, db, current_user.id)
+    return [_document_info(document) for document in documents]
+
+
+@router.delete("/{document_id}", status_code=status.HTTP_204_NO_CONTENT)
+async def delete_document(
+    document_id: str,
+    current_user: User = Depends(get_current_user),
+    db: Session = Depends(get_db),
+    doc_processor=Depends(get_document_processor)
+):
+    document = await run_in_threadpool(document_service.get_document, db, document_id)
+    if document is None or document.user_id != current_user.id:
+        raise HTTPException(status_code=404, detail="Document not found")
+
+    filename = document.filename
+    await doc_processor.delete_document(str(current_user.id), document_id, filename)
+    logging.info(f"Deleted document {document_id} ({filename}) for user {current_user.id}")
@@ -0,0 +1,36 @@
+from fastapi import APIRouter, Request, Response, status
+from app.core import components
+from app.core.config import settings
+from app.api.endpoints.documents import ingestion_queue
+
+router = APIRouter()
+
+
+@router.get("/live")
+async def live():
+    return {"status": "ok"}
+
+
+@router.get("/ready")
+async def ready(request: Request, response: Response):
+    """Ready once the database is set up, ingestion workers run and (with warm-up on) every component is built"""
+    loaded = components.loaded()
+    checks = {
+        "database": getattr(request.app.state, "database_ready", False),
+        "ingestion_queue": ingestion_queue.running
+    }
+    if settings.WARM_UP_ON_STARTUP:
+        checks["components"] = all(loaded[name] for name in components.COMPONENTS)
+
+    body = {
+        "ready": all(checks.values()),
+        "checks": checks,
+        "loaded": loaded,
+        "warm_up_ms": {name: round(seconds * 1000, 1) for name, seconds in components.warm_up_seconds().items()}
+    }
+    warm_up = getattr(request.app.state, "warm_up", None)
+    if warm_up is not None and warm_up.done() and not warm_up.cancelled() and warm_up.exception():
+        body["warm_up_error"] = str(warm_up.exception())
+    if not body["ready"]:
+        response.status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    return body
@@ -0,0 +1,109 @@
+"""Heavy components, built on first use rather than at import.
+
+Importing this module is cheap: langchain, Chroma and the Google clients are only
+imported when a component is first requested. Endpoints take them through
+Depends(get_chat_manager) / Depends(get_document_processor), other code calls the
+build_* functions, and warm_up() builds everything ahead of traffic.
+"""
+from fastapi.concurrency import run_in_threadpool
+from functools import lru_cache
+from typing import TYPE_CHECKING, Dict, Iterable, Optional
+import sys
+import threading
+import time
+import logging
+
+if TYPE_CHECKING:
+    from app.services.chat_manager import ChatManager
+    from app.services.document_processor import DocumentProcessor
+
+# Held while building, so warm-up and an early request can't construct a component twice
+_build_lock = threading.RLock()
+
+
+@lru_cache
+def _document_processor() -> "DocumentProcessor":
+    from app.services.document_processor import DocumentProcessor
+
+    return DocumentProcessor()
+
+
+@lru_cache
+def _chat_manager() -> "ChatManager":
+    from app.services.chat_manager import ChatManager
+
+    return ChatManager()
+
+
+def build_document_processor() -> "DocumentProcessor":
+    with _build_lock:
+        return _document_processor()
+
+
+def build_chat_manager() -> "ChatManager":
+    with _build_lock:
+        return _chat_manager()
+
+
+async def get_document_processor() -> "DocumentProcessor":
+    # Once built, requests get the component without a trip through the threadpool
+    if _document_processor.cache_info().currsize:
+        return _document_processor()
+    return await run_in_threadpool(build_document_processor)
+
+
+async def get_chat_manager() -> "ChatManager":
+    if _chat_manager.cache_info().currsize:
+        return _chat_manager()
+    return await run_in_threadpool(build_chat_manager)
+
+
+COMPONENTS = {
+    "document_processor": (build_document_processor, _document_processor),
+    "chat_manager": (build_chat_manager, _chat_manager)
+}
+
+# Shared clients the components build, reported by readiness as (module, lru_cache factory)
+SHARED_CLIENTS = {
+    "embeddings": ("app.services.embeddings", "get_embeddings"),
+    "vectorstore_pool": ("app.services.vectorstore_pool", "get_vectorstore_pool"),
+    "answer_cache": ("app.services.answer_cache", "get_answer_cache")
+}
+
+_warm_up_seconds: Dict[str, float] = {}
+
+
+def loaded() -> Dict[str, bool]:
+    """Which components and shared clients exist, without importing anything to find out"""
+    status = {name: cached.cache_info().currsize > 0 for name, (_, cached) in COMPONENTS.items()}
+    for name, (module_name, factory_name) in SHARED_CLIENTS.items():
+        # The module may still be importing on the warm-up thread
+        factory = getattr(sys.modules.get(module_name), factory_name, None)
+        status[name] = factory is not None and factory.cache_info().currsize > 0
+    return status
+
+
+def warm_up_seconds() -> Dict[str, float]:
+    return dict(_warm_up_seconds)
+
+
+def shutdown() -> None:
+    """Release what built components hold outside the process: the parser worker processes"""
+    if _document_processor.cache_info().currsize:
+        _document_processor().parser_pool.shutdown()
+
+
+async def warm_up(names: Optional[Iterable[str]] = None) -> None:
+    """Build components ahead of the first request that needs them"""
+    for name in names or COMPONENTS:
+        build, cached = COMPONENTS[name]
+        if cached.cache_info().currsize:
+            continue
+        start = time.perf_counter()
+        try:
+            await run_in_threadpool(build)
+        except Exception as e:
+            logging.error(f"Warm-up of {name} failed: {str(e)}", exc_info=True)
+            raise
+        _warm_up_seconds[name] = time.perf_counter() - start
+        logging.info(f"Warmed up {name} in {_warm_up_seconds[name] * 1000:.0f}ms")
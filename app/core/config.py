@@ -1,5 +1,5 @@
 from pydantic_settings import BaseSettings
-from typing import List
+from typing import List, Optional
 from functools import lru_cache
 
 class Settings(BaseSettings):
@@ -12,9 +12,19 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    AUTH_CACHE_TTL: float = 30.0  # seconds a verified user is trusted without a lookup; 0 disables
+    AUTH_CACHE_MAX_ENTRIES: int = 10_000
+    BCRYPT_ROUNDS: int = 12  # stored hashes with fewer rounds are upgraded on the next login
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_QUEUE_SIZE: int = 16  # beyond workers + queue, login and signup return 503
     
     # Database
     DATABASE_URL: str
+    DB_POOL_SIZE: int = 5
+    DB_MAX_OVERFLOW: int = 10
+    DB_POOL_TIMEOUT: float = 30.0  # seconds to wait for a free connection
+    DB_POOL_RECYCLE: int = 1800  # seconds; -1 keeps connections forever
+    DB_POOL_PRE_PING: bool = True
     
     # External Services
     GOOGLE_API_KEY: str
@@ -25,17 +35,84 @@ class Settings(BaseSettings):
     # Document Processing
     UPLOAD_FOLDER: str = "uploads"
     MAX_UPLOAD_SIZE: int = 10 * 1024 * 1024  # 10MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # 1MB
     CHUNK_SIZE: int = 1000
     CHUNK_OVERLAP: int = 200
+    CHUNK_LENGTH_UNIT: str = "chars"  # or "tokens", counted with tiktoken's CHUNK_ENCODING
+    CHUNK_ENCODING: str = "cl100k_base"
+    PARSER_WORKERS: int = 2  # 0 parses in the threadpool instead of a process pool
+    PARSER_QUEUE_SIZE: int = 8
+    PARSER_TIMEOUT: float = 120.0  # seconds of parsing before the worker process is terminated
+    INGEST_STREAMING: bool = False  # parse, split and embed PDFs page by page; other formats load whole
+    INGEST_WORKERS: int = 2
+    INGEST_PROGRESS_FLUSH_INTERVAL: float = 2.0
+    INGEST_JOB_LEASE: float = 60.0  # seconds before another process takes over a job whose owner stopped
+    # /documents/upload/bulk: files plus ZIP members per request, and their total size once extracted
+    BULK_UPLOAD_MAX_FILES: int = 500
+    BULK_UPLOAD_MAX_SIZE: int = 200 * 1024 * 1024  # 200MB
+    BULK_EMBEDDING_BATCH_SIZE: int = 256  # chunks per embedding batch and upsert, pooled across files
     
     # Vector Store
     VECTOR_STORE_PATH: str = "./chroma_db"
+    VECTORSTORE_POOL_SIZE: int = 64
+    VECTORSTORE_IDLE_TTL: float = 900.0  # seconds
+    # "per_user" keeps a Chroma database per user; "shared" puts everyone in VECTORSTORE_SHARDS collections
+    VECTORSTORE_LAYOUT: str = "per_user"
+    VECTORSTORE_SHARDS: int = 1
+    # "compact" searches users with up to COMPACT_INDEX_MAX_CHUNKS chunks through a memory-mapped
+    # NumPy matrix instead of Chroma; Chroma still stores everything and takes over above the limit
+    VECTOR_INDEX_BACKEND: str = "chroma"
+    COMPACT_INDEX_MAX_CHUNKS: int = 5000
+    COMPACT_INDEX_DTYPE: str = "int8"  # with a scale per row; "float16" is exact but twice the size
+    
+    # Retrieval
+    RETRIEVAL_MODE: str = "hybrid"  # "vector" or "hybrid" (BM25 + vector, fused by RRF)
+    RETRIEVAL_CANDIDATES: int = 20  # per retriever, before fusion
+    KEYWORD_FAST_PATH_CONFIDENCE: Optional[float] = 0.8  # None disables the keyword-only path
+    # Overlapping chunks of a page are stitched together and duplicates dropped before prompting
+    CONTEXT_PACKING_ENABLED: bool = True
+    CONTEXT_TOKEN_BUDGET: Optional[int] = 2000  # tiktoken tokens of retrieved context; None only merges
+    
+    # Embeddings
+    EMBEDDING_MODEL: str = "models/embedding-001"
+    EMBEDDING_CACHE_ENABLED: bool = True
+    EMBEDDING_CACHE_PATH: str = "./embedding_cache/embeddings.sqlite3"
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 200_000
+    EMBEDDING_BATCH_SIZE: int = 64
+    EMBEDDING_CONCURRENCY: int = 4
+    EMBEDDING_MAX_RETRIES: int = 3
+    EMBEDDING_RETRY_BACKOFF: float = 1.0
     
     # Model Configuration
     TEMPERATURE: float = 0.3
     MAX_TOKENS: int = 2048
     TOP_K: int = 4
     
+    # Conversations
+    CONVERSATION_CACHE_SIZE: int = 256
+    CONVERSATION_IDLE_TTL: float = 1800.0  # seconds
+    CHAT_HISTORY_REBUILD_MESSAGES: int = 20
+    CHAT_MEMORY_MODE: str = "buffer"  # "buffer", "token_budget" or "summary"
+    CHAT_MEMORY_MAX_TOKENS: int = 2000
+    # "chain" rewrites follow-up questions with an extra LLM call; "single_call" answers with one call
+    CHAT_PIPELINE_MODE: str = "chain"
+    CHAT_BATCH_MAX_QUESTIONS: int = 50
+    CHAT_BATCH_CONCURRENCY: int = 4  # answers generated at once per /chat/batch request
+
+    # Answer Cache
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_MAX_ENTRIES: int = 1024
+    ANSWER_CACHE_TTL: float = 3600.0  # seconds
+    ANSWER_CACHE_SIMILARITY_THRESHOLD: Optional[float] = None  # e.g. 0.95 to match near-duplicates
+
+    # Startup
+    # Build the chat manager and document processor (LLM, embeddings, Chroma) in the
+    # background at startup; /health/ready reports ready once they exist
+    WARM_UP_ON_STARTUP: bool = True
+
+    # Observability
+    METRICS_ENABLED: bool = True  # per-stage timings at /metrics and in the Server-Timing header
+    
     class Config:
         env_file = ".env"
         case_sensitive = True
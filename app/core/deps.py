@@ -1,18 +1,27 @@
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from typing import Optional
 from app.core.config import settings
-from app.db.database import get_db
+from app.db.database import SessionLocal
 from app.schemas import TokenData, User
 from app.services import auth_service
+from app.services.principal_cache import get_principal_cache
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
+
+def _load_principal(email: str) -> Optional[User]:
+    db = SessionLocal()
+    try:
+        user = auth_service.get_user_by_email(db, email=email)
+        return User.model_validate(user) if user is not None else None
+    finally:
+        db.close()
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> User:
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -31,7 +40,13 @@ async def get_current_user(
     except JWTError:
         raise credentials_exception
         
-    user = auth_service.get_user_by_email(db, email=token_data.email)
+    # Recently verified users skip the database; the session is only opened on a miss,
+    # off the event loop, and released before the endpoint runs
+    principals = get_principal_cache()
+    user = principals.get(token_data.email)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        user = await run_in_threadpool(_load_principal, token_data.email)
+        if user is None:
+            raise credentials_exception
+        principals.put(token_data.email, user)
+    return user
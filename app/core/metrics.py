@@ -0,0 +1,225 @@
+"""Per-stage timing spans and counters, exposed in the Prometheus text format and as a Server-Timing header"""
+from bisect import bisect_left
+from contextlib import nullcontext
+from contextvars import ContextVar
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+import threading
+import time
+import logging
+from app.core.config import settings
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+# Checked on every span; when False, spans and counters cost one attribute lookup
+enabled = settings.METRICS_ENABLED
+
+# Stage durations for the current request, summed per stage for the Server-Timing header
+_request_timings: ContextVar[Optional[Dict[str, float]]] = ContextVar("request_timings", default=None)
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(labelnames, labelvalues)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, *labelvalues: str) -> None:
+        with self._lock:
+            self._values[labelvalues] = self._values.get(labelvalues, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labelvalues, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labelvalues)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        # label values -> [count per bucket (not cumulative)..., overflow, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labelvalues: str) -> None:
+        with self._lock:
+            series = self._series.get(labelvalues)
+            if series is None:
+                series = self._series[labelvalues] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[bisect_left(self.buckets, value)] += 1
+            series[-1] += value
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            snapshot = sorted((labelvalues, list(series)) for labelvalues, series in self._series.items())
+        for labelvalues, series in snapshot:
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                labels = _format_labels(self.labelnames, labelvalues, f'le="{bound}"')
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            cumulative += series[len(self.buckets)]
+            labels = _format_labels(self.labelnames, labelvalues, 'le="+Inf"')
+            lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, labelvalues)
+            lines.append(f"{self.name}_sum{labels} {series[-1]}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+STAGE_SECONDS = Histogram(
+    "docmind_stage_seconds",
+    "Time spent in each ingestion and chat stage",
+    labelnames=("stage",)
+)
+CHUNKS = Counter(
+    "docmind_chunks_total",
+    "Chunks split, embedded, reused unchanged and retrieved",
+    labelnames=("kind",)
+)
+LLM_TOKENS = Counter(
+    "docmind_llm_tokens_total",
+    "LLM tokens reported by the model, by direction",
+    labelnames=("direction",)
+)
+CONTEXT_TOKENS = Counter(
+    "docmind_context_tokens_total",
+    "Tokens of retrieved context before and after packing",
+    labelnames=("kind",)
+)
+_metrics = [STAGE_SECONDS, CHUNKS, LLM_TOKENS, CONTEXT_TOKENS]
+
+# Existing stats() methods, rendered as gauges named docmind_<name>_<key>
+_collectors: Dict[str, Callable[[], Dict]] = {}
+
+
+class _Span:
+    __slots__ = ("stage", "start")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        observe(self.stage, time.perf_counter() - self.start)
+
+
+_NOOP_SPAN = nullcontext()
+
+
+def span(stage: str):
+    """Time a block as one stage; a shared no-op context manager when metrics are disabled"""
+    if not enabled:
+        return _NOOP_SPAN
+    return _Span(stage)
+
+
+def observe(stage: str, seconds: float) -> None:
+    """Record a stage duration measured elsewhere (e.g. in a parser worker process)"""
+    if not enabled:
+        return
+    STAGE_SECONDS.observe(seconds, stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        timings[stage] = timings.get(stage, 0.0) + seconds
+
+
+def count_chunks(kind: str, amount: int) -> None:
+    if enabled and amount:
+        CHUNKS.inc(amount, kind)
+
+
+def count_llm_tokens(usage: Optional[Dict]) -> None:
+    """Record a message's usage_metadata; models that don't report usage are skipped"""
+    if not enabled or not usage:
+        return
+    LLM_TOKENS.inc(usage.get("input_tokens", 0), "input")
+    LLM_TOKENS.inc(usage.get("output_tokens", 0), "output")
+
+
+def count_context_tokens(retrieved: int, packed: int) -> None:
+    if not enabled:
+        return
+    CONTEXT_TOKENS.inc(retrieved, "retrieved")
+    CONTEXT_TOKENS.inc(packed, "packed")
+
+
+def register_collector(name: str, collect: Callable[[], Dict]) -> None:
+    _collectors[name] = collect
+
+
+def render() -> str:
+    lines = []
+    for metric in _metrics:
+        lines.extend(metric.render())
+    for name, collect in sorted(_collectors.items()):
+        try:
+            values = collect()
+        except Exception as e:
+            logging.warning(f"Metrics collector {name} failed: {str(e)}")
+            continue
+        for key, value in values.items():
+            # Skip descriptive fields such as the vectorstore layout
+            if isinstance(value, bool) or not isinstance(value, (int, float)):
+                continue
+            metric = f"docmind_{name}_{key}"
+            lines.append(f"# TYPE {metric} gauge")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+
+class ServerTimingMiddleware:
+    """Adds a Server-Timing header summing the stages timed while handling the request.
+
+    Stages that finish after the headers are sent (e.g. a streamed answer) only reach /metrics.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not enabled:
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, float] = {}
+        token = _request_timings.set(timings)
+        start = time.perf_counter()
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                entries = [f"{stage};dur={seconds * 1000:.1f}" for stage, seconds in timings.items()]
+                entries.append(f"total;dur={(time.perf_counter() - start) * 1000:.1f}")
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", ", ".join(entries).encode("latin-1")))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
@@ -1,4 +1,5 @@
-from sqlalchemy import Boolean, Column, Integer, String
+from datetime import datetime
+from sqlalchemy import JSON, Boolean, Column, DateTime, ForeignKey, Integer, String, Text, UniqueConstraint
 from app.db.database import Base
 
 class User(Base):
@@ -7,4 +8,44 @@ class User(Base):
     email = Column(String, unique=True, index=True)
     name = Column(String)
     hashed_password = Column(String)
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+
+class IngestionJob(Base):
+    __tablename__ = "ingestion_jobs"
+    id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    file_path = Column(String, nullable=False)
+    file_hash = Column(String(64))
+    status = Column(String(16), index=True, nullable=False, default="queued")
+    owner = Column(String(64), nullable=True)  # the ingestion queue holding the job, see job_service
+    lease_expires_at = Column(DateTime, nullable=True)
+    pages_processed = Column(Integer, default=0)
+    chunks_indexed = Column(Integer, default=0)
+    chunks_total = Column(Integer, nullable=True)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class DocumentRecord(Base):
+    __tablename__ = "documents"
+    # A filename is one document with versions; concurrent first uploads can't both create it
+    __table_args__ = (UniqueConstraint("user_id", "filename", name="uq_documents_user_filename"),)
+    id = Column(String(36), primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    filename = Column(String, nullable=False)
+    file_hash = Column(String(64), index=True, nullable=False)
+    chunk_ids = Column(JSON, nullable=False, default=list)  # in document order
+    chunk_hashes = Column(JSON, nullable=False, default=list)  # sha256 of each chunk's text
+    created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ChatMessage(Base):
+    __tablename__ = "chat_messages"
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    role = Column(String(8), nullable=False)  # "human" or "ai"
+    content = Column(Text, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
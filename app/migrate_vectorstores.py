@@ -0,0 +1,117 @@
+"""Move per-user Chroma databases into the shared (optionally sharded) layout.
+
+Run with: python -m app.migrate_vectorstores [--shards N] [--delete-source]
+
+Embeddings are copied as stored, so nothing is re-embedded. The command is
+idempotent: chunks keep their ids, so running it again just upserts them again.
+Set VECTORSTORE_LAYOUT=shared (and the same VECTORSTORE_SHARDS) once it has run.
+"""
+from langchain_chroma import Chroma
+from typing import List
+import argparse
+import os
+import shutil
+import time
+import logging
+from app.core.config import settings
+from app.services.keyword_index import KeywordIndex
+from app.services.tenant_store import TenantVectorStore
+from app.services.vectorstore_pool import (
+    KEYWORD_INDEX_FILE,
+    LEGACY_KEYWORD_INDEX_FILE,
+    SHARED,
+    SHARED_DIRECTORY,
+    TENANTS_DIRECTORY,
+    VectorStorePool,
+    shard_for
+)
+
+
+def per_user_directories(persist_directory: str) -> List[str]:
+    """User ids that still have their own Chroma database"""
+    if not os.path.isdir(persist_directory):
+        return []
+    return sorted(
+        name for name in os.listdir(persist_directory)
+        if name not in (SHARED_DIRECTORY, TENANTS_DIRECTORY)
+        and os.path.exists(os.path.join(persist_directory, name, "chroma.sqlite3"))
+    )
+
+
+def migrate_user(pool: VectorStorePool, user_id: str, batch_size: int = 1000) -> int:
+    """Copy one user's chunks and keyword index into the shared layout, returning the chunk count"""
+    source_path = os.path.join(pool.persist_directory, user_id)
+    source = Chroma(persist_directory=source_path, collection_name=f"user_{user_id}")
+    target = TenantVectorStore(pool.shared_store(shard_for(user_id, pool.shards)), user_id)._collection
+    try:
+        copied = 0
+        while True:
+            records = source._collection.get(
+                include=["embeddings", "documents", "metadatas"],
+                limit=batch_size,
+                offset=copied
+            )
+            if not records["ids"]:
+                break
+            target.upsert(
+                ids=records["ids"],
+                embeddings=records["embeddings"],
+                documents=records["documents"],
+                metadatas=[metadata or {} for metadata in records["metadatas"]]
+            )
+            copied += len(records["ids"])
+    finally:
+        close = getattr(getattr(source, "_client", None), "close", None)
+        if callable(close):
+            close()
+
+    migrated = target.count()
+    if migrated < copied:
+        raise RuntimeError(f"Only {migrated} of {copied} chunks for user {user_id} reached the shared collection")
+
+    os.makedirs(pool.user_path(user_id), exist_ok=True)
+    keyword_index = os.path.join(source_path, KEYWORD_INDEX_FILE)
+    legacy_keyword_index = os.path.join(source_path, LEGACY_KEYWORD_INDEX_FILE)
+    if os.path.exists(keyword_index):
+        # Through SQLite rather than a file copy, as a running server may be writing to it
+        KeywordIndex(keyword_index).backup(os.path.join(pool.user_path(user_id), KEYWORD_INDEX_FILE))
+    elif os.path.exists(legacy_keyword_index):
+        shutil.copy2(legacy_keyword_index, os.path.join(pool.user_path(user_id), LEGACY_KEYWORD_INDEX_FILE))
+    return copied
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--persist-directory", default=settings.VECTOR_STORE_PATH)
+    parser.add_argument("--shards", type=int, default=settings.VECTORSTORE_SHARDS)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--delete-source", action="store_true", help="remove each per-user database once copied")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    # Only stored embeddings are copied, so the pool never needs an embedding model
+    pool = VectorStorePool(args.persist_directory, embeddings=None, layout=SHARED, shards=args.shards)
+    users = per_user_directories(args.persist_directory)
+    logging.info(f"Migrating {len(users)} per-user vectorstores into {args.shards} shared collection(s)")
+
+    total, failed = 0, []
+    for user_id in users:
+        start = time.perf_counter()
+        try:
+            chunks = migrate_user(pool, user_id, args.batch_size)
+        except Exception as e:
+            logging.error(f"Failed to migrate user {user_id}: {str(e)}", exc_info=True)
+            failed.append(user_id)
+            continue
+        total += chunks
+        if args.delete_source:
+            shutil.rmtree(os.path.join(args.persist_directory, user_id))
+        logging.info(f"Migrated {chunks} chunks for user {user_id} in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    logging.info(f"Migrated {total} chunks for {len(users) - len(failed)} users; {len(failed)} failed")
+    if failed:
+        raise SystemExit(f"Migration failed for users: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
+from datetime import datetime
 from typing import Optional
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field
 
 class UserBase(BaseModel):
     email: EmailStr
@@ -29,6 +30,9 @@ class TokenData(BaseModel):
 class ChatQuery(BaseModel):
     query: str
 
+class ChatBatchQuery(BaseModel):
+    queries: list[str] = Field(min_length=1)
+
 class ChatResponse(BaseModel):
     answer: str
     sources: list[str]
@@ -36,4 +40,40 @@ class ChatResponse(BaseModel):
 class DocumentUploadResponse(BaseModel):
     status: str
     message: str
-    chunks: int
\ No newline at end of file
+    chunks: int
+
+class BulkFileResult(BaseModel):
+    filename: str
+    status: str  # "success", "skipped" or "failed"
+    message: str
+    chunks: int = 0
+    embedded: int = 0
+    document_id: Optional[str] = None
+
+class BulkUploadResponse(BaseModel):
+    files: list[BulkFileResult]
+    succeeded: int
+    skipped: int
+    failed: int
+    chunks: int
+    embedded: int
+    total_ms: float
+
+class IngestionJobStatus(BaseModel):
+    job_id: str
+    filename: str
+    status: str
+    pages_processed: int
+    chunks_indexed: int
+    chunks_total: Optional[int] = None
+    error: Optional[str] = None
+    created_at: datetime
+    updated_at: datetime
+
+class DocumentInfo(BaseModel):
+    document_id: str
+    filename: str
+    file_hash: str
+    chunks: int
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,205 @@
+from langchain_core.embeddings import Embeddings
+from fastapi.concurrency import run_in_threadpool
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Set, Tuple
+import re
+import threading
+import time
+import numpy as np
+from app.core.config import settings
+from app.services.embeddings import get_embeddings
+
+CacheKey = Tuple[str, int, str, str]  # user, document-set version, conversation context, query
+
+
+def normalize_query(query: str) -> str:
+    query = re.sub(r"\s+", " ", query.strip().lower())
+    return query.rstrip("?!. ")
+
+
+def _unit(vector: List[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = np.linalg.norm(vector)
+    return vector / norm if norm else vector
+
+
+class AnswerCache:
+    """TTL/LRU-bounded cache of chat answers per user and document-set version.
+
+    Answers to follow-up questions depend on the conversation, so callers pass a
+    context string (a digest of the chat history) that becomes part of the key;
+    only context-free entries take part in the similarity lookup.
+
+    Versions are bumped in-process whenever a user's documents change. Other worker
+    processes only see the change once their entries expire, so keep the TTL short
+    when running several workers.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl: float = 3600.0,
+        similarity_threshold: Optional[float] = None,
+        embeddings: Optional[Embeddings] = None
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embeddings = embeddings
+        self._entries: "OrderedDict[CacheKey, Dict]" = OrderedDict()
+        self._user_keys: Dict[str, Set[CacheKey]] = {}
+        # Unit query embeddings of each user's context-free entries, stacked into a matrix on first lookup
+        self._embeddings: Dict[str, Dict[CacheKey, np.ndarray]] = {}
+        self._matrices: Dict[str, Tuple[List[CacheKey], np.ndarray]] = {}
+        self._versions: Dict[str, int] = {}
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.seconds_saved_total = 0.0
+
+    @property
+    def semantic(self) -> bool:
+        return self.similarity_threshold is not None and self.embeddings is not None
+
+    def version(self, user_id: str) -> int:
+        return self._versions.get(user_id, 0)
+
+    def invalidate(self, user_id: str) -> None:
+        """Called when a user's documents change; their cached answers are no longer valid"""
+        with self._lock:
+            self._versions[user_id] = self.version(user_id) + 1
+            for key in self._user_keys.pop(user_id, set()):
+                self._entries.pop(key, None)
+            self._embeddings.pop(user_id, None)
+            self._matrices.pop(user_id, None)
+
+    def _forget_embedding(self, key: CacheKey) -> None:
+        embeddings = self._embeddings.get(key[0])
+        if embeddings is not None and embeddings.pop(key, None) is not None:
+            self._matrices.pop(key[0], None)
+            if not embeddings:
+                del self._embeddings[key[0]]
+
+    def _matrix(self, user_id: str) -> Optional[Tuple[List[CacheKey], np.ndarray]]:
+        matrix = self._matrices.get(user_id)
+        if matrix is None:
+            embeddings = self._embeddings.get(user_id)
+            if not embeddings:
+                return None
+            matrix = self._matrices[user_id] = (list(embeddings), np.stack(list(embeddings.values())))
+        return matrix
+
+    def _remove(self, key: CacheKey) -> None:
+        self._entries.pop(key, None)
+        self._forget_embedding(key)
+        keys = self._user_keys.get(key[0])
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._user_keys[key[0]]
+
+    def _fresh(self, key: CacheKey) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry["created"] > self.ttl:
+            self._remove(key)
+            return None
+        return entry
+
+    def _hit(self, key: CacheKey, entry: Dict) -> Dict:
+        self._entries.move_to_end(key)
+        self.hits += 1
+        self.seconds_saved_total += entry["latency"]
+        return entry["response"]
+
+    async def embed(self, query: str) -> Optional[List[float]]:
+        if not self.semantic:
+            return None
+        return await run_in_threadpool(self.embeddings.embed_query, normalize_query(query))
+
+    def lookup(
+        self,
+        user_id: str,
+        query: str,
+        query_embedding: Optional[List[float]] = None,
+        context: str = ""
+    ) -> Optional[Dict]:
+        """Return a cached response for this exact (normalized) or, if enabled, a similar query"""
+        with self._lock:
+            version = self.version(user_id)
+            key = (user_id, version, context, normalize_query(query))
+            entry = self._fresh(key)
+            if entry is not None:
+                return self._hit(key, entry)
+            # A similar question asked in another conversation may have meant something else
+            matrix = self._matrix(user_id) if query_embedding is not None and not context else None
+            if matrix is None:
+                self.misses += 1
+                return None
+
+        # Scored outside the lock; the arrays are replaced, never changed, once built
+        keys, embeddings = matrix
+        scores = embeddings @ _unit(query_embedding)
+        candidates = np.flatnonzero(scores >= self.similarity_threshold)
+        with self._lock:
+            for position in candidates[np.argsort(-scores[candidates])]:
+                candidate = keys[position]
+                candidate_entry = self._fresh(candidate)
+                if candidate_entry is not None and candidate[1] == self.version(user_id):
+                    self.semantic_hits += 1
+                    return self._hit(candidate, candidate_entry)
+            self.misses += 1
+            return None
+
+    def store(
+        self,
+        user_id: str,
+        query: str,
+        response: Dict,
+        latency: float,
+        query_embedding: Optional[List[float]] = None,
+        version: Optional[int] = None,
+        context: str = ""
+    ) -> None:
+        with self._lock:
+            current = self.version(user_id)
+            # Documents changed while this answer was being generated; don't cache it
+            if version is not None and version != current:
+                return
+            key = (user_id, current, context, normalize_query(query))
+            self._entries[key] = {"response": response, "latency": latency, "created": time.monotonic()}
+            self._forget_embedding(key)
+            if query_embedding is not None and not context:
+                self._embeddings.setdefault(user_id, {})[key] = _unit(query_embedding)
+                self._matrices.pop(user_id, None)
+            self._entries.move_to_end(key)
+            self._user_keys.setdefault(user_id, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_ratio": self.hits / lookups if lookups else 0.0,
+            "seconds_saved_total": self.seconds_saved_total
+        }
+
+
+@lru_cache
+def get_answer_cache() -> AnswerCache:
+    semantic = settings.ANSWER_CACHE_SIMILARITY_THRESHOLD is not None
+    return AnswerCache(
+        max_entries=settings.ANSWER_CACHE_MAX_ENTRIES,
+        ttl=settings.ANSWER_CACHE_TTL,
+        similarity_threshold=settings.ANSWER_CACHE_SIMILARITY_THRESHOLD,
+        embeddings=get_embeddings() if semantic else None
+    )
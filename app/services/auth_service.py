@@ -1,13 +1,13 @@
 from datetime import datetime, timedelta
 from typing import Optional
+from fastapi.concurrency import run_in_threadpool
 from jose import jwt
-from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+import logging
 from app.core.config import settings
 from app.db.models import User  # Updated import path
 from app.schemas import UserCreate
-
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from app.services.password_hashing import get_password_hasher, pwd_context
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     return pwd_context.verify(plain_password, hashed_password)
@@ -18,26 +18,54 @@ def get_password_hash(password: str) -> str:
 def get_user_by_email(db: Session, email: str):
     return db.query(User).filter(User.email == email).first()  # Using User directly
 
-def create_user(db: Session, user: UserCreate):
-    db_user = get_user_by_email(db, email=user.email)
+def _find_user(db: Session, email: str):
+    """Look a user up and end the transaction, so no connection is held while a hash runs"""
+    user = get_user_by_email(db, email)
+    if user is not None:
+        db.expunge(user)
+    db.rollback()
+    return user
+
+def _save_password_hash(db: Session, user_id: int, hashed_password: str) -> None:
+    # Set on a loaded instance rather than a bulk UPDATE, so the ORM update events fire
+    db_user = db.get(User, user_id)
+    if db_user is None:
+        return
+    db_user.hashed_password = hashed_password
+    db.commit()
+
+def _add_user(db: Session, db_user: User) -> User:
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+async def create_user(db: Session, user: UserCreate):
+    db_user = await run_in_threadpool(_find_user, db, user.email)
     if db_user:
         raise ValueError("Email already registered")
         
-    hashed_password = get_password_hash(user.password)
+    # bcrypt runs on the dedicated hashing pool; database calls stay on the threadpool
+    hashed_password = await get_password_hasher().hash(user.password)
     db_user = User(  # Using User directly
         email=user.email,
         name=user.name,
         hashed_password=hashed_password
     )
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    return db_user
+    return await run_in_threadpool(_add_user, db, db_user)
 
-def authenticate_user(db: Session, email: str, password: str):
-    user = get_user_by_email(db, email)
-    if not user or not verify_password(password, user.hashed_password):
+async def authenticate_user(db: Session, email: str, password: str):
+    user = await run_in_threadpool(_find_user, db, email)
+    if not user:
+        return None
+    valid, new_hash = await get_password_hasher().verify_and_update(password, user.hashed_password)
+    if not valid:
         return None
+    if new_hash is not None:
+        # Upgrade hashes made with an older cost or scheme while we know the password
+        await run_in_threadpool(_save_password_hash, db, user.id, new_hash)
+        user.hashed_password = new_hash
+        logging.info(f"Upgraded password hash for user {user.id}")
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -47,4 +75,4 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -
     else:
         expire = datetime.utcnow() + timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     to_encode.update({"exp": expire})
-    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
\ No newline at end of file
+    return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
@@ -0,0 +1,31 @@
+from typing import List
+from sqlalchemy.orm import Session
+from app.db.models import ChatMessage
+
+HUMAN = "human"
+AI = "ai"
+
+
+def add_turn(db: Session, user_id: int, question: str, answer: str) -> None:
+    db.add_all([
+        ChatMessage(user_id=user_id, role=HUMAN, content=question),
+        ChatMessage(user_id=user_id, role=AI, content=answer)
+    ])
+    db.commit()
+
+
+def get_recent_messages(db: Session, user_id: int, limit: int) -> List[ChatMessage]:
+    """Most recent messages for a user, oldest first"""
+    messages = (
+        db.query(ChatMessage)
+        .filter(ChatMessage.user_id == user_id)
+        .order_by(ChatMessage.id.desc())
+        .limit(limit)
+        .all()
+    )
+    return list(reversed(messages))
+
+
+def clear_history(db: Session, user_id: int) -> None:
+    db.query(ChatMessage).filter(ChatMessage.user_id == user_id).delete()
+    db.commit()
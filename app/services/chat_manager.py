@@ -1,25 +1,59 @@
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain.memory import ConversationBufferMemory
 from langchain.chains import ConversationalRetrievalChain
-from langchain_chroma import Chroma
-from typing import Dict, Optional
+from langchain_core.documents import Document
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import BaseMessage, HumanMessage, get_buffer_string
+from langchain_core.vectorstores import VectorStore
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterator, Dict, List, Optional, Tuple
+import asyncio
+import hashlib
 import os
+import time
+from app.core import metrics
 from app.core.config import settings
+from app.db.database import SessionLocal
+from app.services import chat_history_service
+from app.services.answer_cache import get_answer_cache
+from app.services.context_packing import pack_context
+from app.services.conversation_registry import ConversationRegistry
+from app.services.embeddings import embed_queries
+from app.services.memory import TokenBudgetMemory
 from app.services.prompts import CHAT_PROMPT
+from app.services.query_analysis import is_small_talk, is_standalone
+from app.services.retrievers import HybridRetriever, search_by_vectors
+from app.services.vectorstore_pool import get_vectorstore_pool
 import logging
 
+
+def _last_question(history: List[BaseMessage]) -> str:
+    for message in reversed(history):
+        if isinstance(message, HumanMessage):
+            return message.content
+    return ""
+
+
+def _cache_context(query: str, chat_history: str) -> str:
+    """The conversation's part of the answer cache key; empty when the answer doesn't depend on it"""
+    if not chat_history or (is_standalone(query) and not is_small_talk(query)):
+        return ""
+    # A follow-up like "explain it simply" is only reused after the same history
+    return hashlib.sha256(chat_history.encode("utf-8")).hexdigest()
+
+
 class ChatManager:
     _instance = None
     
-    def __new__(cls):
+    def __new__(cls, *args, **kwargs):
         if cls._instance is None:
             cls._instance = super(ChatManager, cls).__new__(cls)
             cls._instance.initialized = False
         return cls._instance
     
-    def __init__(self):
+    def __init__(self, llm: Optional[BaseChatModel] = None):
         if not self.initialized:
-            self.llm = ChatGoogleGenerativeAI(
+            self.llm = llm or ChatGoogleGenerativeAI(
                 model="gemini-1.5-flash",
                 temperature=0.3,
                 max_tokens=None,
@@ -27,23 +61,70 @@ class ChatManager:
                 max_retries=2,
                 google_api_key=settings.GOOGLE_API_KEY,
             )
-            self.conversations = {}
-            self.vectorstores = {}
+            # Bounded so worker memory stays flat; evicted chats are rebuilt from the database
+            self.conversations = ConversationRegistry(
+                max_entries=settings.CONVERSATION_CACHE_SIZE,
+                idle_ttl=settings.CONVERSATION_IDLE_TTL
+            )
+            # Shared with DocumentProcessor; handles reopen lazily from disk after a restart
+            self.vectorstores = get_vectorstore_pool(settings.VECTOR_STORE_PATH)
+            self.vectorstores.on_evict(self._on_vectorstore_evicted)
+            self.answer_cache = get_answer_cache() if settings.ANSWER_CACHE_ENABLED else None
+            metrics.register_collector("vectorstore_pool", self.vectorstores.stats)
+            metrics.register_collector("conversations", self.conversations.stats)
+            if self.answer_cache is not None:
+                metrics.register_collector("answer_cache", self.answer_cache.stats)
             self.initialized = True
     
-    def initialize_conversation(self, user_id: str, user_name: str, vectorstore: Chroma) -> None:
+    def _create_memory(self) -> ConversationBufferMemory:
+        memory_kwargs = {
+            "memory_key": "chat_history",
+            "output_key": "answer",
+            "input_key": "question",
+            "return_messages": True
+        }
+        mode = settings.CHAT_MEMORY_MODE
+        if mode == "buffer":
+            return ConversationBufferMemory(**memory_kwargs)
+        if mode in ("token_budget", "summary"):
+            # "summary" folds dropped turns into a running summary instead of forgetting them
+            return TokenBudgetMemory(
+                max_token_limit=settings.CHAT_MEMORY_MAX_TOKENS,
+                llm=self.llm if mode == "summary" else None,
+                **memory_kwargs
+            )
+        raise ValueError(f"Unknown CHAT_MEMORY_MODE: {mode}")
+    
+    def _create_retriever(self, user_id: str, vectorstore: VectorStore):
+        if settings.RETRIEVAL_MODE == "hybrid":
+            keyword_index = self.vectorstores.keyword_index(user_id)
+            if keyword_index is not None:
+                return HybridRetriever(
+                    vectorstore=vectorstore,
+                    keyword_index=keyword_index,
+                    k=settings.TOP_K,
+                    candidates=settings.RETRIEVAL_CANDIDATES,
+                    fast_path_confidence=settings.KEYWORD_FAST_PATH_CONFIDENCE
+                )
+        return vectorstore.as_retriever(search_kwargs={"k": settings.TOP_K})
+    
+    def initialize_conversation(self, user_id: str, user_name: str, vectorstore: VectorStore) -> None:
         """Initialize or reinitialize a conversation for a user"""
         try:
-            memory = ConversationBufferMemory(
-                memory_key="chat_history",
-                output_key="answer",
-                input_key="question",
-                return_messages=True
-            )
+            start = time.perf_counter()
+            memory = self._create_memory()
+            history = self._load_history(user_id)
+            for message in history:
+                if message.role == chat_history_service.HUMAN:
+                    memory.chat_memory.add_user_message(message.content)
+                else:
+                    memory.chat_memory.add_ai_message(message.content)
+            if isinstance(memory, TokenBudgetMemory):
+                memory.prune()
             
             qa_chain = ConversationalRetrievalChain.from_llm(
                 llm=self.llm,
-                retriever=vectorstore.as_retriever(search_kwargs={"k": 4}),
+                retriever=self._create_retriever(user_id, vectorstore),
                 memory=memory,
                 combine_docs_chain_kwargs={"prompt": CHAT_PROMPT},
                 return_source_documents=True,
@@ -55,21 +136,118 @@ class ChatManager:
                 "user_name": user_name,
                 "memory": memory
             }
-            self.vectorstores[user_id] = vectorstore
             
             # Verify initialization
             if not self.has_active_conversation(user_id):
                 raise ValueError("Failed to initialize conversation")
+            
+            if history:
+                elapsed = time.perf_counter() - start
+                self.conversations.record_rebuild(elapsed)
+                logging.info(
+                    f"Rebuilt conversation for user {user_id} from {len(history)} messages "
+                    f"in {elapsed * 1000:.1f}ms"
+                )
                 
         except Exception as e:
             logging.error(f"Error initializing conversation: {str(e)}", exc_info=True)
             raise ValueError(f"Failed to initialize conversation: {str(e)}")
             
-    
+    def _load_history(self, user_id: str):
+        db = SessionLocal()
+        try:
+            return chat_history_service.get_recent_messages(
+                db, int(user_id), settings.CHAT_HISTORY_REBUILD_MESSAGES
+            )
+        finally:
+            db.close()
+            
+    def _save_turn(self, user_id: str, question: str, answer: str) -> None:
+        db = SessionLocal()
+        try:
+            chat_history_service.add_turn(db, int(user_id), question, answer)
+        finally:
+            db.close()
        
-    def get_vectorstore(self, user_id: str) -> Optional[Chroma]:
-        """Get the vectorstore for a user if it exists"""
-        return self.vectorstores.get(user_id)
+    def get_vectorstore(self, user_id: str) -> Optional[VectorStore]:
+        """Get the store to search a user's chunks with, if they have any: Chroma or their compact index.
+
+        Opening it can build the user's indexes, so async callers run this on the threadpool.
+        """
+        return self.vectorstores.retrieval_store(user_id)
+        
+    def _on_vectorstore_evicted(self, user_id: str) -> None:
+        # The chain's retriever points at the closed handle, so rebuild it on the next chat
+        self.conversations.pop(user_id, None)
+        
+    async def _record_turn(self, user_id: str, conversation: Dict, query: str, answer: str) -> None:
+        # Keep memory and stored history in step
+        await conversation["memory"].asave_context({"question": query}, {"answer": answer})
+        await run_in_threadpool(self._save_turn, user_id, query, answer)
+        
+    async def _memory_messages(self, conversation: Dict) -> List[BaseMessage]:
+        memory = conversation["memory"]
+        return (await memory.aload_memory_variables({}))[memory.memory_key]
+        
+    async def _cached_response(self, user_id: str, query: str, context: str):
+        """Return (cached response or None, query embedding, document-set version)"""
+        if self.answer_cache is None:
+            return None, None, None
+        version = self.answer_cache.version(user_id)
+        with metrics.span("cache_lookup"):
+            # Only context-free questions are matched by similarity, so only they need an embedding
+            query_embedding = await self.answer_cache.embed(query) if not context else None
+            cached = self.answer_cache.lookup(user_id, query, query_embedding, context)
+        return cached, query_embedding, version
+        
+    def _pack(self, docs: List[Document]) -> List[Document]:
+        """Merge overlapping chunks and fit them to CONTEXT_TOKEN_BUDGET; the merged spans are the sources"""
+        if not settings.CONTEXT_PACKING_ENABLED or not docs:
+            return docs
+        with metrics.span("pack"):
+            packed = pack_context(docs, settings.CONTEXT_TOKEN_BUDGET, settings.CHUNK_ENCODING)
+        metrics.count_context_tokens(packed.tokens_before, packed.tokens_after)
+        return packed.documents
+        
+    async def _prepare_answer(
+        self, conversation: Dict, query: str, history: Optional[List[BaseMessage]] = None
+    ) -> Tuple[str, List[Document], str, int]:
+        """Return the question to answer, its context documents, the chat history and the LLM calls made"""
+        chain = conversation["chain"]
+        if history is None:
+            history = await self._memory_messages(conversation)
+        chat_history = get_buffer_string(history, ai_prefix="Assistant")
+        if is_small_talk(query):
+            # CHAT_PROMPT answers greetings on its own; searching for "hi" only adds latency
+            return query, [], chat_history, 0
+        
+        question = search_query = query
+        llm_calls = 0
+        if chat_history and not is_standalone(query):
+            if settings.CHAT_PIPELINE_MODE == "single_call":
+                # Search with the previous question for context; the answer call still sees the full history
+                search_query = f"{_last_question(history)} {query}".strip()
+            else:
+                with metrics.span("rewrite"):
+                    generated = await chain.question_generator.ainvoke({
+                        "question": query,
+                        "chat_history": chat_history
+                    })
+                question = search_query = generated["text"]
+                llm_calls += 1
+        
+        with metrics.span("retrieve"):
+            docs = await chain.retriever.ainvoke(search_query)
+        metrics.count_chunks("retrieved", len(docs))
+        return question, self._pack(docs), chat_history, llm_calls
+        
+    def _answer_prompt(self, conversation: Dict, question: str, docs: List[Document], chat_history: str) -> str:
+        return CHAT_PROMPT.format(
+            context="\n\n".join(doc.page_content for doc in docs),
+            chat_history=chat_history,
+            user_name=conversation["user_name"],
+            question=question
+        )
         
     async def get_response(self, user_id: str, query: str) -> Dict:
         """Get a response from the conversation chain"""
@@ -77,23 +255,253 @@ class ChatManager:
             raise ValueError("No active conversation found for this user. Please upload a document first.")
             
         conversation = self.conversations[user_id]
-        result = await conversation["chain"].ainvoke({
-            "question": query,
-            "user_name": conversation["user_name"]
-        })
-        
-        return {
-            "answer": result["answer"],
-            "sources": [doc.page_content for doc in result["source_documents"]]
+        history = await self._memory_messages(conversation)
+        context = _cache_context(query, get_buffer_string(history, ai_prefix="Assistant"))
+        cached, query_embedding, version = await self._cached_response(user_id, query, context)
+        if cached is not None:
+            await self._record_turn(user_id, conversation, query, cached["answer"])
+            return cached
+        
+        start = time.perf_counter()
+        # Pin the handle so it can't be evicted while it is being searched
+        async with self.vectorstores.alease_retrieval(user_id):
+            question, docs, chat_history, llm_calls = await self._prepare_answer(conversation, query, history)
+            with metrics.span("generate"):
+                message = await self.llm.ainvoke(self._answer_prompt(conversation, question, docs, chat_history))
+        metrics.count_llm_tokens(message.usage_metadata)
+        
+        answer = message.content
+        await self._record_turn(user_id, conversation, query, answer)
+        logging.info(f"Answered for user {user_id} with {llm_calls + 1} LLM call(s)")
+        
+        response = {
+            "answer": answer,
+            "sources": [doc.page_content for doc in docs]
         }
+        if self.answer_cache is not None:
+            self.answer_cache.store(
+                user_id, query, response, time.perf_counter() - start, query_embedding, version, context
+            )
+        return response
+        
+    async def stream_response(self, user_id: str, query: str) -> AsyncIterator[Dict]:
+        """Stream a response as events: the retrieved sources, then answer tokens, then done"""
+        if user_id not in self.conversations:
+            raise ValueError("No active conversation found for this user. Please upload a document first.")
+            
+        conversation = self.conversations[user_id]
+        start = time.perf_counter()
+        time_to_first_token = None
+        parts = []
+        
+        history = await self._memory_messages(conversation)
+        context = _cache_context(query, get_buffer_string(history, ai_prefix="Assistant"))
+        cached, query_embedding, version = await self._cached_response(user_id, query, context)
+        if cached is not None:
+            await self._record_turn(user_id, conversation, query, cached["answer"])
+            yield {"event": "sources", "data": cached["sources"]}
+            yield {"event": "token", "data": cached["answer"]}
+            total_ms = round((time.perf_counter() - start) * 1000, 1)
+            yield {
+                "event": "done",
+                "data": {"answer": cached["answer"], "ttft_ms": total_ms, "total_ms": total_ms, "cached": True}
+            }
+            return
+        
+        async with self.vectorstores.alease_retrieval(user_id):
+            question, docs, chat_history, llm_calls = await self._prepare_answer(conversation, query, history)
+            sources = [doc.page_content for doc in docs]
+            yield {"event": "sources", "data": sources}
+            
+            prompt = self._answer_prompt(conversation, question, docs, chat_history)
+            generate_start = time.perf_counter()
+            async for chunk in self.llm.astream(prompt):
+                metrics.count_llm_tokens(chunk.usage_metadata)
+                if not chunk.content:
+                    continue
+                if time_to_first_token is None:
+                    time_to_first_token = time.perf_counter() - start
+                parts.append(chunk.content)
+                yield {"event": "token", "data": chunk.content}
+            # Includes time the client took to read the tokens, as the stream is paced by it
+            metrics.observe("generate", time.perf_counter() - generate_start)
+        
+        answer = "".join(parts)
+        await self._record_turn(user_id, conversation, query, answer)
+        
+        total = time.perf_counter() - start
+        if self.answer_cache is not None:
+            self.answer_cache.store(
+                user_id, query, {"answer": answer, "sources": sources}, total, query_embedding, version, context
+            )
+        ttft_ms = round(time_to_first_token * 1000, 1) if time_to_first_token is not None else None
+        logging.info(
+            f"Streamed answer for user {user_id}: ttft={ttft_ms}ms total={total * 1000:.1f}ms "
+            f"llm_calls={llm_calls + 1}"
+        )
+        yield {
+            "event": "done",
+            "data": {"answer": answer, "ttft_ms": ttft_ms, "total_ms": round(total * 1000, 1), "cached": False}
+        }
+        
+    def _retrieve_batch(self, user_id: str, vectorstore: VectorStore, queries: List[str]) -> List[List[Document]]:
+        """Retrieve for several queries with one embedding call and one vector query, packing each context"""
+        def embed(texts: List[str]) -> List[List[float]]:
+            return embed_queries(vectorstore.embeddings, texts)
+        
+        retriever = self._create_retriever(user_id, vectorstore)
+        if isinstance(retriever, HybridRetriever):
+            found = retriever.search_batch(queries, embed)
+        else:
+            found = search_by_vectors(vectorstore, embed(queries), settings.TOP_K)
+        metrics.count_chunks("retrieved", sum(len(docs) for docs in found))
+        return [self._pack(docs) for docs in found]
+        
+    async def _generate(self, conversation: Dict, question: str, docs: List[Document], limit: asyncio.Semaphore) -> str:
+        async with limit:
+            with metrics.span("generate"):
+                message = await self.llm.ainvoke(self._answer_prompt(conversation, question, docs, ""))
+        metrics.count_llm_tokens(message.usage_metadata)
+        return message.content
+        
+    async def stream_batch(self, user_id: str, queries: List[str]) -> AsyncIterator[Dict]:
+        """Answer several questions about the user's documents as events, in input order.
+        
+        Questions are answered independently: without the chat history, and without
+        being added to it. Cache misses are retrieved together, with the chunks found
+        for more than one question sent once in the `sources` event, then each answer
+        arrives as an `answer` event referencing them by index.
+        """
+        if user_id not in self.conversations:
+            raise ValueError("No active conversation found for this user. Please upload a document first.")
+            
+        conversation = self.conversations[user_id]
+        start = time.perf_counter()
+        version = self.answer_cache.version(user_id) if self.answer_cache is not None else None
+        cached: List[Optional[Dict]] = [None] * len(queries)
+        if self.answer_cache is not None:
+            # Exact matches only; a semantic lookup would cost an embedding call per question. Batch
+            # questions are answered without the chat history, so they share the context-free entries
+            with metrics.span("cache_lookup"):
+                cached = [self.answer_cache.lookup(user_id, query) for query in queries]
+        
+        contexts: List[List[Document]] = [[] for _ in queries]
+        to_search = [
+            position for position, query in enumerate(queries)
+            if cached[position] is None and not is_small_talk(query)
+        ]
+        
+        async with self.vectorstores.alease_retrieval(user_id) as vectorstore:
+            if vectorstore is None:
+                raise ValueError("No documents found for this user. Please upload a document first.")
+            if to_search:
+                with metrics.span("retrieve"):
+                    found = await run_in_threadpool(
+                        self._retrieve_batch, user_id, vectorstore, [queries[position] for position in to_search]
+                    )
+                for position, docs in zip(to_search, found):
+                    contexts[position] = docs
+            
+            # Overlapping chunks (and cached answers' sources) are listed once
+            sources: List[str] = []
+            source_index: Dict[str, int] = {}
+            
+            def source_refs(texts: List[str]) -> List[int]:
+                for text in texts:
+                    if text not in source_index:
+                        source_index[text] = len(sources)
+                        sources.append(text)
+                return [source_index[text] for text in texts]
+            
+            refs = [
+                source_refs(cached[position]["sources"] if cached[position] is not None
+                            else [doc.page_content for doc in contexts[position]])
+                for position in range(len(queries))
+            ]
+            yield {"event": "sources", "data": sources}
+            
+            limit = asyncio.Semaphore(settings.CHAT_BATCH_CONCURRENCY)
+            tasks = [
+                None if cached[position] is not None else asyncio.create_task(
+                    self._generate(conversation, query, contexts[position], limit)
+                )
+                for position, query in enumerate(queries)
+            ]
+            answered = failed = 0
+            try:
+                for position, (query, task) in enumerate(zip(queries, tasks)):
+                    result = {"index": position, "question": query, "sources": refs[position]}
+                    if task is None:
+                        result.update(answer=cached[position]["answer"], cached=True)
+                    else:
+                        try:
+                            answer = await task
+                        except Exception as e:
+                            logging.error(f"Batch answer {position} failed for user {user_id}: {str(e)}")
+                            failed += 1
+                            result.update(answer=None, cached=False, error=str(e))
+                        else:
+                            answered += 1
+                            result.update(answer=answer, cached=False)
+                            if self.answer_cache is not None:
+                                self.answer_cache.store(
+                                    user_id, query,
+                                    {"answer": answer, "sources": [doc.page_content for doc in contexts[position]]},
+                                    time.perf_counter() - start, version=version
+                                )
+                    yield {"event": "answer", "data": result}
+            finally:
+                # Stops generation when the client goes away mid-batch
+                pending = [task for task in tasks if task is not None]
+                for task in pending:
+                    if not task.done():
+                        task.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+        
+        total = time.perf_counter() - start
+        logging.info(
+            f"Answered batch of {len(queries)} for user {user_id}: {answered} generated, "
+            f"{len(queries) - answered - failed} cached, {failed} failed, {len(sources)} sources "
+            f"in {total * 1000:.1f}ms"
+        )
+        yield {
+            "event": "done",
+            "data": {
+                "questions": len(queries),
+                "generated": answered,
+                "cached": len(queries) - answered - failed,
+                "failed": failed,
+                "total_ms": round(total * 1000, 1)
+            }
+        }
+        
+    async def get_batch_response(self, user_id: str, queries: List[str]) -> Dict:
+        """Answer several questions at once; see stream_batch"""
+        response = {"answers": [], "sources": []}
+        events = self.stream_batch(user_id, queries)
+        try:
+            async for event in events:
+                if event["event"] == "answer":
+                    response["answers"].append(event["data"])
+                elif event["event"] in ("sources", "done"):
+                    response[event["event"]] = event["data"]
+        finally:
+            # If this request is cancelled, stop the batch's generation now rather than when it's collected
+            await events.aclose()
+        return response
         
     def clear_conversation(self, user_id: str) -> None:
         """Clear a user's conversation history"""
         if user_id in self.conversations:
             self.conversations[user_id]["memory"].clear()
+        db = SessionLocal()
+        try:
+            chat_history_service.clear_history(db, int(user_id))
+        finally:
+            db.close()
             
     def has_active_conversation(self, user_id: str) -> bool:
         """Check if a user has an active conversation"""
         has_conversation = user_id in self.conversations
-        has_vectorstore = user_id in self.vectorstores
+        has_vectorstore = self.vectorstores.exists(user_id)
         return has_conversation and has_vectorstore
\ No newline at end of file
@@ -0,0 +1,114 @@
+from langchain_core.documents import Document
+from bisect import bisect_left, bisect_right
+from typing import Iterable, List, Optional, Sequence, Tuple
+import re
+from app.services.memory import get_encoding
+
+CHARS = "chars"
+TOKENS = "tokens"
+DEFAULT_SEPARATORS = ("\n\n", "\n", ". ", " ")
+WHITESPACE = re.compile(r"\s+")
+
+Span = Tuple[int, int]
+
+
+class OffsetTextSplitter:
+    """Splits text into overlapping chunks by working on offsets into the source text.
+
+    Chunk boundaries are found with bounded str.rfind calls, so the only strings
+    created are the chunks themselves. A chunk ends at the strongest separator in
+    the second half of its window (paragraph, line, sentence, then word). Sizes are
+    measured in characters, or in tiktoken tokens when length_unit is "tokens".
+    """
+
+    def __init__(
+        self,
+        chunk_size: int = 1000,
+        chunk_overlap: int = 200,
+        length_unit: str = CHARS,
+        encoding_name: str = "cl100k_base",
+        separators: Sequence[str] = DEFAULT_SEPARATORS
+    ):
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        if not 0 <= chunk_overlap < chunk_size:
+            raise ValueError("chunk_overlap must be between 0 and chunk_size")
+        if length_unit not in (CHARS, TOKENS):
+            raise ValueError(f"Unknown chunk length unit: {length_unit}")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.length_unit = length_unit
+        self.encoding_name = encoding_name
+        self.separators = tuple(separators)
+
+    def _positions(self, text: str) -> Optional[List[int]]:
+        """Character offset where each token starts, followed by len(text); None when sizing by characters"""
+        if self.length_unit == CHARS:
+            return None
+        encoding = get_encoding(self.encoding_name)
+        _, offsets = encoding.decode_with_offsets(encoding.encode(text, disallowed_special=()))
+        return offsets + [len(text)]
+
+    def _break(self, text: str, start: int, end: int) -> int:
+        floor = start + (end - start) // 2
+        for separator in self.separators:
+            position = text.rfind(separator, floor, end)
+            if position != -1:
+                return position + len(separator)
+        return end
+
+    def split_offsets(self, text: str) -> List[Span]:
+        """(start, end) character offsets of each chunk, with surrounding whitespace trimmed"""
+        # Work in length units (characters or tokens); positions maps a token to its offset
+        positions = self._positions(text)
+        units = len(text) if positions is None else len(positions) - 1
+        spans = []
+        start_unit = 0
+        while start_unit < units:
+            end_unit = min(start_unit + self.chunk_size, units)
+            if positions is None:
+                start, end = start_unit, end_unit
+            else:
+                start, end = positions[start_unit], positions[end_unit]
+            if end_unit < units:
+                broken = self._break(text, start, end)
+                broken_unit = broken if positions is None else bisect_right(positions, broken) - 1
+                if broken_unit > start_unit:
+                    end, end_unit = broken, broken_unit
+
+            chunk_start, chunk_end = start, end
+            while chunk_start < chunk_end and text[chunk_start].isspace():
+                chunk_start += 1
+            while chunk_end > chunk_start and text[chunk_end - 1].isspace():
+                chunk_end -= 1
+            if chunk_end > chunk_start:
+                spans.append((chunk_start, chunk_end))
+            if end_unit >= units:
+                break
+
+            next_unit = max(end_unit - self.chunk_overlap, start_unit + 1)
+            if next_unit < end_unit and self.chunk_overlap:
+                # Start the overlap on a word rather than part-way through one
+                match = WHITESPACE.search(text, next_unit if positions is None else positions[next_unit], end)
+                if match:
+                    aligned = match.end() if positions is None else bisect_left(positions, match.end())
+                    if aligned < end_unit:
+                        next_unit = aligned
+            start_unit = next_unit
+        return spans
+
+    def split_text(self, text: str) -> List[str]:
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def split_documents(self, documents: Iterable[Document]) -> List[Document]:
+        """Split documents, recording each chunk's page and its offsets within that page"""
+        chunks = []
+        for number, document in enumerate(documents):
+            text = document.page_content
+            page = document.metadata.get("page", number)
+            for start, end in self.split_offsets(text):
+                chunks.append(Document(
+                    page_content=text[start:end],
+                    metadata={**document.metadata, "page": page, "start_index": start, "end_index": end}
+                ))
+        return chunks
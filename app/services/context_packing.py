@@ -0,0 +1,123 @@
+from langchain_core.documents import Document
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from app.services.memory import count_tokens, get_encoding
+
+SEPARATOR = "\n\n"  # between context documents in CHAT_PROMPT
+# Chunks are trimmed of surrounding whitespace, so neighbours without overlap are a few characters apart
+ADJACENT_GAP = 4
+
+
+class PackedContext(NamedTuple):
+    documents: List[Document]
+    tokens_before: int  # context tokens of the retrieved chunks as they came
+    tokens_after: int
+
+
+def _span(doc: Document) -> Optional[Tuple]:
+    """(source key, start, end) for chunks that record their offsets within a page"""
+    metadata = doc.metadata
+    start, end = metadata.get("start_index"), metadata.get("end_index")
+    source = metadata.get("document_id") or metadata.get("source")
+    if source is None or not isinstance(start, int) or not isinstance(end, int):
+        return None
+    return (source, metadata.get("page")), start, end
+
+
+def _stitch(text: str, end: int, doc: Document, start: int, next_end: int) -> Optional[str]:
+    """text (ending at end) extended by doc, or None if their offsets and text don't line up"""
+    if start > end:
+        return f"{text} {doc.page_content}"
+    if next_end <= end:
+        # Contained in the span so far; checked against the text it claims to repeat
+        return text if doc.page_content in text else None
+    overlap = end - start
+    if overlap > len(text) or (overlap and text[-overlap:] != doc.page_content[:overlap]):
+        return None
+    return text + doc.page_content[overlap:]
+
+
+def merge_chunks(docs: List[Document]) -> List[Document]:
+    """Stitch overlapping or adjacent chunks of the same page together and drop exact duplicates.
+
+    A merged span takes the rank of its best-ranked chunk and keeps that chunk's
+    metadata, with the offsets widened and its chunks listed in text order in chunk_ids.
+    """
+    groups: Dict[Tuple, List[Tuple[int, int, int]]] = {}
+    spans: List[Optional[Tuple[int, Document]]] = [None] * len(docs)
+    for rank, doc in enumerate(docs):
+        span = _span(doc)
+        if span is None:
+            spans[rank] = (rank, doc)
+        else:
+            key, start, end = span
+            groups.setdefault(key, []).append((start, end, rank))
+
+    for members in groups.values():
+        members.sort()
+        run: List[int] = []
+        text, end = "", -1
+        for start, next_end, rank in members + [(None, None, None)]:
+            stitched = None
+            if run and start is not None and start <= end + ADJACENT_GAP:
+                stitched = _stitch(text, end, docs[rank], start, next_end)
+            if stitched is not None:
+                text, end = stitched, max(end, next_end)
+                run.append(rank)
+                continue
+            if run:
+                best = min(run)
+                merged = docs[best]
+                if len(run) > 1:
+                    metadata = {
+                        **merged.metadata,
+                        "start_index": min(docs[member].metadata["start_index"] for member in run),
+                        "end_index": end,
+                        "chunk_ids": [docs[member].metadata.get("chunk_id") for member in run]
+                    }
+                    merged = Document(page_content=text, metadata=metadata)
+                spans[best] = (best, merged)
+            if start is not None:
+                run, text, end = [rank], docs[rank].page_content, next_end
+
+    merged_docs, seen = [], set()
+    for entry in spans:
+        if entry is None or entry[1].page_content in seen:
+            continue
+        seen.add(entry[1].page_content)
+        merged_docs.append(entry[1])
+    return merged_docs
+
+
+def _truncate(text: str, tokens: int, encoding_name: str) -> str:
+    encoding = get_encoding(encoding_name)
+    return encoding.decode(encoding.encode(text, disallowed_special=())[:tokens])
+
+
+def pack_context(
+    docs: List[Document],
+    token_budget: Optional[int] = None,
+    encoding_name: str = "cl100k_base"
+) -> PackedContext:
+    """Merge retrieved chunks, then keep the best-ranked spans that fit in token_budget.
+
+    Spans that don't fit are skipped in favour of smaller, lower-ranked ones; if
+    even the best span is over budget it is cut down to it. No budget only merges.
+    """
+    separator = count_tokens(SEPARATOR, encoding_name)
+    sizes = {id(doc): count_tokens(doc.page_content, encoding_name) for doc in docs}
+    tokens_before = sum(sizes.values()) + separator * max(len(docs) - 1, 0)
+
+    packed, used = [], 0
+    for doc in merge_chunks(docs):
+        size = sizes.get(id(doc))
+        if size is None:
+            size = count_tokens(doc.page_content, encoding_name)
+        cost = size + (separator if packed else 0)
+        if token_budget is None or used + cost <= token_budget:
+            packed.append(doc)
+            used += cost
+        elif not packed and token_budget > 0:
+            text = _truncate(doc.page_content, token_budget, encoding_name)
+            packed.append(Document(page_content=text, metadata={**doc.metadata, "truncated": True}))
+            used = count_tokens(text, encoding_name)
+    return PackedContext(packed, tokens_before, used)
@@ -0,0 +1,85 @@
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import threading
+import time
+import logging
+
+
+class ConversationRegistry:
+    """Size- and idle-time-bounded LRU map of user id to live conversation state"""
+
+    def __init__(self, max_entries: int = 256, idle_ttl: float = 1800.0):
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self._entries: "OrderedDict[str, Dict]" = OrderedDict()
+        self._last_used: Dict[str, float] = {}
+        self._lock = threading.RLock()
+        self.evictions = 0
+        self.rebuilds = 0
+        self.rebuild_seconds_total = 0.0
+
+    def __contains__(self, user_id: str) -> bool:
+        with self._lock:
+            self._evict_idle()
+            return user_id in self._entries
+
+    def __getitem__(self, user_id: str) -> Dict:
+        entry = self.get(user_id)
+        if entry is None:
+            raise KeyError(user_id)
+        return entry
+
+    def __setitem__(self, user_id: str, conversation: Dict) -> None:
+        with self._lock:
+            self._entries[user_id] = conversation
+            self._entries.move_to_end(user_id)
+            self._last_used[user_id] = time.monotonic()
+            while len(self._entries) > self.max_entries:
+                oldest, _ = self._entries.popitem(last=False)
+                self._last_used.pop(oldest, None)
+                self.evictions += 1
+                logging.info(f"Evicted conversation for user {oldest}")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, user_id: str) -> Optional[Dict]:
+        with self._lock:
+            self._evict_idle()
+            entry = self._entries.get(user_id)
+            if entry is not None:
+                self._entries.move_to_end(user_id)
+                self._last_used[user_id] = time.monotonic()
+            return entry
+
+    def pop(self, user_id: str, default=None):
+        with self._lock:
+            self._last_used.pop(user_id, None)
+            return self._entries.pop(user_id, default)
+
+    def keys(self) -> List[str]:
+        with self._lock:
+            return list(self._entries.keys())
+
+    def record_rebuild(self, seconds: float) -> None:
+        self.rebuilds += 1
+        self.rebuild_seconds_total += seconds
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        # Entries are in LRU order, so stop at the first one that is still fresh
+        for user_id in list(self._entries):
+            if self._last_used.get(user_id, 0) >= cutoff:
+                break
+            del self._entries[user_id]
+            self._last_used.pop(user_id, None)
+            self.evictions += 1
+
+    def stats(self) -> Dict:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+            "rebuilds": self.rebuilds,
+            "rebuild_seconds_total": self.rebuild_seconds_total
+        }
@@ -1,140 +1,628 @@
-from langchain_community.document_loaders import (
-    PyPDFLoader,
-    Docx2txtLoader,
-    UnstructuredPowerPointLoader,
-    TextLoader
-)
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_chroma import Chroma
-from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from langchain_core.documents import Document
 from fastapi import UploadFile, HTTPException
-from typing import Dict, List
+from fastapi.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
+from sqlalchemy.exc import IntegrityError
+from typing import AsyncIterator, Callable, Dict, Iterable, List, Optional, Tuple
+import asyncio
+import hashlib
 import os
-import tempfile
-import shutil
+import uuid
 import logging
+from app.core import metrics
 from app.core.config import settings
+from app.db.database import SessionLocal
+from app.db.models import DocumentRecord
+from app.services import document_service
+from app.services.answer_cache import get_answer_cache
+from app.services.chunking import OffsetTextSplitter
+from app.services.embeddings import get_embeddings
+from app.services.ingestion import ChunkDiff, EmbeddingPipeline
+from app.services.parsing import STREAMING_EXTENSIONS, ParserBusyError, ParserPool
+from app.services.uploads import ReceivedFile, SpooledUpload, extract_zip, spool_upload
+from app.services.vectorstore_pool import get_vectorstore_pool
 
 SUPPORTED_EXTENSIONS = {'.pdf', '.docx', '.pptx', '.txt'}
+ARCHIVE_EXTENSION = '.zip'  # bulk uploads only
+
+
+def file_sha256(file_path: str, chunk_size: int = 1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
 
 class DocumentProcessor:
-    def __init__(self, persist_directory: str = "./chroma_db"):
+    def __init__(self, persist_directory: str = settings.VECTOR_STORE_PATH):
         self.persist_directory = persist_directory
-        os.makedirs(self.persist_directory, exist_ok=True)
+        self.embeddings = get_embeddings()
+        # Chroma handles are shared with ChatManager and reopened lazily from disk
+        self.vectorstores = get_vectorstore_pool(persist_directory)
         
-        try:
-            self.embeddings = GoogleGenerativeAIEmbeddings(
-                model="models/embedding-001",
-                google_api_key=settings.GOOGLE_API_KEY
-            )
-        except Exception as e:
-            logging.error(f"Failed to initialize embeddings: {str(e)}")
-            raise
+        self.pipeline = EmbeddingPipeline(
+            self.embeddings,
+            batch_size=settings.EMBEDDING_BATCH_SIZE,
+            concurrency=settings.EMBEDDING_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+            retry_backoff=settings.EMBEDDING_RETRY_BACKOFF
+        )
+        # Bulk uploads pool the chunks of many files, so fewer, larger batches and upserts
+        self.bulk_pipeline = EmbeddingPipeline(
+            self.embeddings,
+            batch_size=settings.BULK_EMBEDDING_BATCH_SIZE,
+            concurrency=settings.EMBEDDING_CONCURRENCY,
+            max_retries=settings.EMBEDDING_MAX_RETRIES,
+            retry_backoff=settings.EMBEDDING_RETRY_BACKOFF
+        )
             
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
-            length_function=len,
-            separators=["\n\n", "\n", " ", ""]
+        # Chunks record their page and character offsets so answers can cite exact spans
+        self.text_splitter = OffsetTextSplitter(
+            chunk_size=settings.CHUNK_SIZE,
+            chunk_overlap=settings.CHUNK_OVERLAP,
+            length_unit=settings.CHUNK_LENGTH_UNIT,
+            encoding_name=settings.CHUNK_ENCODING
         )
         
-    def _get_loader(self, file_path: str, extension: str):
+        # Parsing and splitting are CPU-bound, so they run outside the event loop
+        self.parser_pool = ParserPool(
+            max_workers=settings.PARSER_WORKERS,
+            max_queued=settings.PARSER_QUEUE_SIZE,
+            timeout=settings.PARSER_TIMEOUT
+        )
+        # (user_id, filename) -> [lock, holders and waiters]; see _lock_documents
+        self._document_locks: Dict[Tuple[str, str], list] = {}
+        
+    @asynccontextmanager
+    async def _lock_documents(self, user_id: str, filenames: Iterable[str]):
+        """Index one version of a document at a time, so each diffs against the last one saved.
+
+        Only serializes within this process; the unique (user_id, filename) constraint
+        stops another process from creating the same document concurrently.
+        """
+        keys = sorted({(user_id, filename) for filename in filenames})
+        entries = []
+        for key in keys:
+            entry = self._document_locks.setdefault(key, [asyncio.Lock(), 0])
+            entry[1] += 1
+            entries.append(entry)
+        acquired = []
         try:
-            if extension == '.pdf':
-                return PyPDFLoader(file_path)
-            elif extension == '.docx':
-                return Docx2txtLoader(file_path)
-            elif extension == '.pptx':
-                return UnstructuredPowerPointLoader(file_path)
-            elif extension == '.txt':
-                return TextLoader(file_path)
-            else:
-                raise ValueError(f"Unsupported file type: {extension}")
-        except Exception as e:
-            logging.error(f"Error creating loader for {extension}: {str(e)}")
-            raise
+            for entry in entries:
+                await entry[0].acquire()
+                acquired.append(entry[0])
+            yield
+        finally:
+            for lock in acquired:
+                lock.release()
+            for key, entry in zip(keys, entries):
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._document_locks[key]
+        
+    @staticmethod
+    def _discard_chunks(vectorstore, keyword_index, vector_index, chunk_ids: List[str]) -> None:
+        vectorstore._collection.delete(ids=chunk_ids)
+        keyword_index.remove(chunk_ids)
+        if vector_index is not None:
+            vector_index.remove(chunk_ids)
         
-    async def process_file(self, file: UploadFile, user_id: str) -> Dict:
-        logging.info(f"Processing file: {file.filename} for user: {user_id}")
+    async def _stream_splits(
+        self,
+        file_path: str,
+        extension: str,
+        progress: Dict,
+        on_progress: Optional[Callable[[Dict], None]]
+    ) -> AsyncIterator[Document]:
+        async for page_splits in self.parser_pool.stream(file_path, extension, self.text_splitter):
+            progress["pages_processed"] += 1
+            if on_progress:
+                on_progress(dict(progress))
+            metrics.count_chunks("split", len(page_splits))
+            for split in page_splits:
+                yield split
         
-        # Validate file extension
-        file_extension = os.path.splitext(file.filename)[1].lower()
+    def validate_extension(self, filename: str) -> str:
+        file_extension = os.path.splitext(filename)[1].lower()
         if file_extension not in SUPPORTED_EXTENSIONS:
             raise HTTPException(
                 status_code=400,
                 detail=f"Unsupported file type. Supported types: {', '.join(SUPPORTED_EXTENSIONS)}"
             )
+        return file_extension
+        
+    async def save_upload(self, file: UploadFile, directory: Optional[str] = None) -> SpooledUpload:
+        """Validate an upload and stream it to disk without holding it in memory"""
+        file_extension = self.validate_extension(file.filename)
+        return await spool_upload(
+            file,
+            suffix=file_extension,
+            max_size=settings.MAX_UPLOAD_SIZE,
+            chunk_size=settings.UPLOAD_CHUNK_SIZE,
+            directory=directory
+        )
+        
+    async def process_path(
+        self,
+        file_path: str,
+        filename: str,
+        user_id: str,
+        on_progress: Optional[Callable[[Dict], None]] = None,
+        extra_metadata: Optional[Dict] = None,
+        file_hash: Optional[str] = None
+    ) -> Dict:
+        """Parse, split and index a file that has already been saved to disk.
 
-        # Create user directory
-        user_db_path = f"{self.persist_directory}/{user_id}"
-        os.makedirs(user_db_path, exist_ok=True)
+        Identical re-uploads are skipped, and a new version of a document (same
+        filename) only embeds its added or changed chunks.
+        """
+        logging.info(f"Processing file: {filename} for user: {user_id}")
+        file_extension = self.validate_extension(filename)
         
-        # Create temp file
-        temp_path = None
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=file_extension) as temp_file:
-                content = await file.read()
-                if not content:
-                    raise ValueError("Empty file uploaded")
-                temp_file.write(content)
-                temp_path = temp_file.name
+            if file_hash is None:
+                file_hash = await run_in_threadpool(file_sha256, file_path)
+            async with self._lock_documents(user_id, [filename]):
+                duplicate, previous = await run_in_threadpool(self._find_versions, user_id, filename, file_hash)
+                if duplicate is not None:
+                    logging.info(f"Skipping {filename} for user {user_id}: identical to document {duplicate.id}")
+                    return {
+                        "status": "skipped",
+                        "message": f"{filename} is already indexed as {duplicate.filename}",
+                        "chunks": 0,
+                        "document_id": duplicate.id
+                    }
                 
-            logging.info(f"Temporary file created at: {temp_path}")
-            
-            # Load and process document
-            loader = self._get_loader(temp_path, file_extension)
-            documents = loader.load()
-            logging.info(f"Loaded {len(documents)} documents")
-            
-            # Split documents
-            splits = self.text_splitter.split_documents(documents)
-            logging.info(f"Created {len(splits)} splits")
-            
-            if not splits:
-                raise ValueError("No content could be extracted from the document")
-            
-            # Create vectorstore with explicit persistence
-            logging.info(f"Creating vectorstore in {user_db_path}")
-            vectorstore = Chroma(
-                persist_directory=user_db_path,
-                embedding_function=self.embeddings,
-                collection_name=f"user_{user_id}"
+                async with self.vectorstores.alease(user_id, create=True) as vectorstore:
+                    return await self._index_file(
+                        vectorstore, user_id, file_path, filename, file_extension,
+                        on_progress, extra_metadata, file_hash, previous
+                    )
+        except HTTPException:
+            raise
+        except IntegrityError:
+            raise HTTPException(
+                status_code=409,
+                detail=f"{filename} was uploaded by another request at the same time; upload it again to update it"
             )
-            # Add documents to the vectorstore
-            vectorstore.add_documents(splits)
-            
-            return {
-                "status": "success",
-                "message": f"Processed {file.filename} successfully",
-                "chunks": len(splits),
-                "vectorstore": vectorstore
-            }
-            
+        except ParserBusyError as e:
+            raise HTTPException(status_code=503, detail=str(e))
+        except TimeoutError as e:
+            raise HTTPException(status_code=504, detail=str(e))
         except Exception as e:
             logging.error(f"Error processing document: {str(e)}", exc_info=True)
             raise HTTPException(
                 status_code=500,
                 detail=f"Error processing document: {str(e)}"
             )
+        
+    async def _index_file(
+        self,
+        vectorstore,
+        user_id: str,
+        file_path: str,
+        filename: str,
+        file_extension: str,
+        on_progress: Optional[Callable[[Dict], None]],
+        extra_metadata: Optional[Dict],
+        file_hash: str,
+        previous: Optional[DocumentRecord] = None
+    ) -> Dict:
+        progress = {"pages_processed": 0, "chunks_indexed": 0, "chunks_total": None}
+        
+        def report(chunks_indexed: int) -> None:
+            progress["chunks_indexed"] = chunks_indexed
+            if on_progress:
+                on_progress(dict(progress))
+        
+        if settings.INGEST_STREAMING and file_extension in STREAMING_EXTENSIONS:
+            # Parse, split and embed page by page so memory doesn't grow with document length
+            splits = self._stream_splits(file_path, file_extension, progress, on_progress)
+        else:
+            # Load and split the document in the parser pool
+            splits = await self.parser_pool.parse(file_path, file_extension, self.text_splitter)
+            logging.info(f"Created {len(splits)} splits")
+            metrics.count_chunks("split", len(splits))
+            if not splits:
+                raise ValueError("No content could be extracted from the document")
+            progress["chunks_total"] = len(splits)
+            progress["pages_processed"] = len({split.metadata.get("page", 0) for split in splits})
+        
+        # Chunks unchanged since the previous version keep their ids and embeddings
+        if previous is not None:
+            diff = ChunkDiff(previous.chunk_ids, previous.chunk_hashes)
+            document_id = previous.id
+        else:
+            diff = ChunkDiff()
+            document_id = str(uuid.uuid4())
+        extra_metadata = {**(extra_metadata or {}), "document_id": document_id}
+        
+        # Embed in concurrent batches, upserting each batch (and its keywords) as it completes
+        keyword_index = await run_in_threadpool(self.vectorstores.keyword_index, user_id)
+        vector_index = await run_in_threadpool(self.vectorstores.vector_index, user_id)
+        try:
+            indexed = await self.pipeline.add_documents(
+                vectorstore,
+                diff.changed(splits),
+                on_progress=report,
+                extra_metadata=extra_metadata,
+                on_batch=keyword_index.add,
+                on_vectors=vector_index.add if vector_index is not None else None
+            )
+            if not diff.chunk_ids:
+                raise ValueError("No content could be extracted from the document")
+            metrics.count_chunks("reused", len(diff.reused))
+            await self.pipeline.refresh_metadata(
+                vectorstore, diff.reused, extra_metadata, on_batch=keyword_index.add
+            )
+            await run_in_threadpool(
+                self._save_document, user_id, filename, file_hash, diff, document_id
+            )
+        except BaseException:
+            # Don't leave a partially indexed document behind after a failure or cancellation
+            if diff.added:
+                await run_in_threadpool(self._discard_chunks, vectorstore, keyword_index, vector_index, diff.added)
+            raise
+        
+        stale = diff.stale
+        if stale:
+            await run_in_threadpool(self._discard_chunks, vectorstore, keyword_index, vector_index, stale)
+        if vector_index is not None:
+            await run_in_threadpool(self.vectorstores.save_vector_index, user_id, vector_index)
+        # Answers cached against the previous document set are stale now
+        get_answer_cache().invalidate(user_id)
+        logging.info(
+            f"Indexed {filename} for user {user_id}: {len(diff.chunk_ids)} chunks from "
+            f"{progress['pages_processed']} pages ({indexed} embedded, {len(diff.reused)} unchanged, "
+            f"{len(stale)} removed)"
+        )
+        
+        return {
+            "status": "success",
+            "message": f"Processed {filename} successfully",
+            "chunks": len(diff.chunk_ids),
+            "embedded": indexed,
+            "document_id": document_id,
+            "vectorstore": vectorstore
+        }
+        
+    def _find_versions(self, user_id: str, filename: str, file_hash: str):
+        """Return (identical document or None, previous version of this filename or None)"""
+        db = SessionLocal()
+        try:
+            duplicate = document_service.get_document_by_hash(db, int(user_id), file_hash)
+            previous = None
+            if duplicate is None:
+                previous = document_service.get_document_by_filename(db, int(user_id), filename)
+            return duplicate, previous
         finally:
-            if temp_path and os.path.exists(temp_path):
-                os.unlink(temp_path)
-                logging.info(f"Cleaned up temporary file: {temp_path}")
-
-    def get_relevant_chunks(self, user_id: str, query: str, k: int = 4) -> List[str]:
-        user_db_path = f"{self.persist_directory}/{user_id}"
-        if not os.path.exists(user_db_path):
-            raise ValueError("No documents found for this user")
+            db.close()
             
-        vectorstore = Chroma(
-            persist_directory=user_db_path,
-            embedding_function=self.embeddings
-        )
+    def _save_document(self, user_id: str, filename: str, file_hash: str, diff: ChunkDiff, document_id: str) -> None:
+        db = SessionLocal()
+        try:
+            document_service.save_document(
+                db, int(user_id), filename, file_hash, diff.chunk_ids, diff.chunk_hashes, document_id
+            )
+        finally:
+            db.close()
         
-        docs = vectorstore.similarity_search(query, k=k)
+    async def process_file(
+        self,
+        file: UploadFile,
+        user_id: str,
+        on_progress: Optional[Callable[[Dict], None]] = None
+    ) -> Dict:
+        """Spool an upload to a temp file and process it in the request"""
+        upload = await self.save_upload(file)
+        logging.info(f"Temporary file created at: {upload.path} (sha256 {upload.sha256})")
+        try:
+            result = await self.process_path(
+                upload.path, file.filename, user_id, on_progress, file_hash=upload.sha256
+            )
+            result["file_hash"] = upload.sha256
+            return result
+        finally:
+            if os.path.exists(upload.path):
+                os.unlink(upload.path)
+                logging.info(f"Cleaned up temporary file: {upload.path}")
+
+    async def save_uploads(self, files: List[UploadFile], directory: Optional[str] = None) -> List[ReceivedFile]:
+        """Spool a bulk upload to disk, expanding ZIP archives into their files.
+
+        Unsupported or oversized files are returned with an error rather than
+        failing the request; exceeding BULK_UPLOAD_MAX_FILES or BULK_UPLOAD_MAX_SIZE
+        in total does fail it, after removing what was already spooled.
+        """
+        received: List[ReceivedFile] = []
+        total = 0
+        try:
+            for file in files:
+                filename = file.filename or ""
+                extension = os.path.splitext(filename)[1].lower()
+                if len(received) >= settings.BULK_UPLOAD_MAX_FILES:
+                    raise HTTPException(
+                        status_code=400,
+                        detail=f"At most {settings.BULK_UPLOAD_MAX_FILES} files are accepted per upload"
+                    )
+                if extension not in SUPPORTED_EXTENSIONS and extension != ARCHIVE_EXTENSION:
+                    received.append(ReceivedFile(filename, None, f"Unsupported file type: {extension or 'none'}"))
+                    continue
+                try:
+                    upload = await spool_upload(
+                        file,
+                        suffix=extension,
+                        # Archives are bounded by what they expand to instead
+                        max_size=settings.BULK_UPLOAD_MAX_SIZE if extension == ARCHIVE_EXTENSION
+                        else settings.MAX_UPLOAD_SIZE,
+                        chunk_size=settings.UPLOAD_CHUNK_SIZE,
+                        directory=directory
+                    )
+                except (HTTPException, ValueError) as e:
+                    received.append(ReceivedFile(filename, None, str(getattr(e, "detail", None) or e)))
+                    continue
+                if extension != ARCHIVE_EXTENSION:
+                    received.append(ReceivedFile(filename, upload))
+                    total += upload.size
+                    if total > settings.BULK_UPLOAD_MAX_SIZE:
+                        raise HTTPException(
+                            status_code=413,
+                            detail=f"Upload exceeds {settings.BULK_UPLOAD_MAX_SIZE // (1024 * 1024)}MB in total"
+                        )
+                    continue
+                try:
+                    members = await run_in_threadpool(
+                        extract_zip,
+                        upload.path,
+                        SUPPORTED_EXTENSIONS,
+                        max_size=settings.MAX_UPLOAD_SIZE,
+                        max_files=settings.BULK_UPLOAD_MAX_FILES - len(received),
+                        max_total_size=settings.BULK_UPLOAD_MAX_SIZE - total,
+                        directory=directory,
+                        chunk_size=settings.UPLOAD_CHUNK_SIZE
+                    )
+                except ValueError as e:
+                    raise HTTPException(status_code=400, detail=f"{filename}: {str(e)}")
+                finally:
+                    os.unlink(upload.path)
+                total += sum(member.upload.size for member in members if member.upload is not None)
+                received.extend(members)
+        except BaseException:
+            self.cleanup_uploads(received)
+            raise
+        return received
+
+    @staticmethod
+    def cleanup_uploads(received: List[ReceivedFile]) -> None:
+        for file in received:
+            if file.upload is not None and os.path.exists(file.upload.path):
+                os.unlink(file.upload.path)
+
+    async def _parse_for_bulk(self, entry: Dict, limit: asyncio.Semaphore) -> Dict:
+        async with limit:
+            try:
+                entry["splits"] = await self.parser_pool.parse(entry["path"], entry["extension"], self.text_splitter)
+            except Exception as e:
+                logging.error(f"Error parsing {entry['filename']} in bulk upload: {str(e)}")
+                entry["error"] = str(e)
+        return entry
+
+    async def _bulk_splits(self, entries: List[Dict]) -> AsyncIterator[Document]:
+        """Splits of every file, in the order the files finish parsing, each run through its ChunkDiff"""
+        # Never more than the pool's workers at once, so one bulk upload can't fill the parser queue
+        limit = asyncio.Semaphore(max(self.parser_pool.max_workers, 1))
+        tasks = [asyncio.create_task(self._parse_for_bulk(entry, limit)) for entry in entries]
+        try:
+            for parsed in asyncio.as_completed(tasks):
+                entry = await parsed
+                splits = entry.pop("splits", None)
+                if entry.get("error"):
+                    continue
+                metrics.count_chunks("split", len(splits))
+                if not splits:
+                    entry["error"] = "No content could be extracted from the document"
+                    continue
+                entry["pages"] = len({split.metadata.get("page", 0) for split in splits})
+                for split in splits:
+                    split.metadata["document_id"] = entry["document_id"]
+                async for split in entry["diff"].changed(splits):
+                    yield split
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def process_bulk(self, files: List[ReceivedFile], user_id: str) -> List[Dict]:
+        """Index many saved files in one pass, returning a result per file in order.
+
+        Files are parsed in parallel in the parser pool and their chunks share
+        embedding batches and upserts of BULK_EMBEDDING_BATCH_SIZE; the database,
+        keyword index and vector index are written once at the end. A file that
+        can't be parsed fails on its own, but an embedding or upsert failure fails
+        every file being indexed, as their chunks share batches.
+        """
+        results: List[Optional[Dict]] = [None] * len(files)
+
+        def fail(position: int, error: str) -> None:
+            results[position] = {"filename": files[position].filename, "status": "failed", "message": error}
+
+        # Held from the version lookup until the documents are saved, as for a single file
+        async with self._lock_documents(user_id, [file.filename for file in files if file.upload is not None]):
+            versions = await run_in_threadpool(self._find_bulk_versions, user_id, files)
+            entries: List[Dict] = []
+            hashes: Dict[str, str] = {}
+            filenames = set()
+            for position, (file, (duplicate, previous)) in enumerate(zip(files, versions)):
+                if file.upload is None:
+                    fail(position, file.error)
+                elif duplicate is not None:
+                    results[position] = {
+                        "filename": file.filename,
+                        "status": "skipped",
+                        "message": f"{file.filename} is already indexed as {duplicate.filename}",
+                        "document_id": duplicate.id
+                    }
+                elif file.upload.sha256 in hashes:
+                    results[position] = {
+                        "filename": file.filename,
+                        "status": "skipped",
+                        "message": f"{file.filename} is identical to {hashes[file.upload.sha256]} in this upload"
+                    }
+                elif file.filename in filenames:
+                    fail(position, f"{file.filename} appears more than once in this upload")
+                else:
+                    hashes[file.upload.sha256] = file.filename
+                    filenames.add(file.filename)
+                    # Chunks unchanged since the previous version keep their ids and embeddings
+                    entries.append({
+                        "position": position,
+                        "filename": file.filename,
+                        "path": file.upload.path,
+                        "extension": os.path.splitext(file.filename)[1].lower(),
+                        "file_hash": file.upload.sha256,
+                        "document_id": previous.id if previous is not None else str(uuid.uuid4()),
+                        "diff": ChunkDiff(previous.chunk_ids, previous.chunk_hashes) if previous else ChunkDiff()
+                    })
+
+            if entries:
+                await self._index_bulk(user_id, entries)
+        for entry in entries:
+            if entry.get("error"):
+                fail(entry["position"], entry["error"])
+            else:
+                results[entry["position"]] = {
+                    "filename": entry["filename"],
+                    "status": "success",
+                    "message": f"Processed {entry['filename']} successfully",
+                    "chunks": len(entry["diff"].chunk_ids),
+                    "embedded": len(entry["diff"].added),
+                    "document_id": entry["document_id"]
+                }
+        return results
+
+    async def _index_bulk(self, user_id: str, entries: List[Dict]) -> None:
+        """Index the parsed entries, recording an "error" on each one that wasn't indexed"""
+        async with self.vectorstores.alease(user_id, create=True) as vectorstore:
+            keyword_index = await run_in_threadpool(self.vectorstores.keyword_index, user_id)
+            vector_index = await run_in_threadpool(self.vectorstores.vector_index, user_id)
+            try:
+                indexed = await self.bulk_pipeline.add_documents(
+                    vectorstore,
+                    self._bulk_splits(entries),
+                    on_batch=keyword_index.add,
+                    on_vectors=vector_index.add if vector_index is not None else None
+                )
+                done = [entry for entry in entries if not entry.get("error")]
+                reused = [split for entry in done for split in entry["diff"].reused]
+                metrics.count_chunks("reused", len(reused))
+                # document_id is already in each split's metadata
+                await self.pipeline.refresh_metadata(vectorstore, reused, on_batch=keyword_index.add)
+                await run_in_threadpool(self._save_documents, user_id, done)
+            except BaseException as e:
+                # As for a single file, nothing partially indexed is left behind
+                added = [chunk_id for entry in entries for chunk_id in entry["diff"].added]
+                if added:
+                    await run_in_threadpool(self._discard_chunks, vectorstore, keyword_index, vector_index, added)
+                if not isinstance(e, Exception):
+                    raise
+                logging.error(f"Bulk upload for user {user_id} failed: {str(e)}", exc_info=True)
+                for entry in entries:
+                    entry.setdefault("error", f"Error processing document: {str(e)}")
+                return
+
+            stale = [chunk_id for entry in done for chunk_id in entry["diff"].stale]
+            if stale:
+                await run_in_threadpool(self._discard_chunks, vectorstore, keyword_index, vector_index, stale)
+            if vector_index is not None:
+                await run_in_threadpool(self.vectorstores.save_vector_index, user_id, vector_index)
+        get_answer_cache().invalidate(user_id)
+        logging.info(
+            f"Bulk indexed {len(done)} of {len(entries)} files for user {user_id}: "
+            f"{sum(len(entry['diff'].chunk_ids) for entry in done)} chunks "
+            f"({indexed} embedded, {len(reused)} unchanged, {len(stale)} removed)"
+        )
+
+    def _find_bulk_versions(self, user_id: str, files: List[ReceivedFile]) -> List[tuple]:
+        """(identical document or None, previous version or None) for each file, in one session"""
+        db = SessionLocal()
+        try:
+            versions = []
+            for file in files:
+                duplicate = previous = None
+                if file.upload is not None:
+                    duplicate = document_service.get_document_by_hash(db, int(user_id), file.upload.sha256)
+                    if duplicate is None:
+                        previous = document_service.get_document_by_filename(db, int(user_id), file.filename)
+                versions.append((duplicate, previous))
+            return versions
+        finally:
+            db.close()
+
+    def _save_documents(self, user_id: str, entries: List[Dict]) -> None:
+        # One transaction, so a failure leaves no document pointing at chunks that get rolled back
+        db = SessionLocal()
+        try:
+            for entry in entries:
+                diff = entry["diff"]
+                document_service.save_document(
+                    db, int(user_id), entry["filename"], entry["file_hash"],
+                    diff.chunk_ids, diff.chunk_hashes, entry["document_id"], commit=False
+                )
+            db.commit()
+        finally:
+            db.close()
+
+    def get_relevant_chunks(self, user_id: str, query: str, k: int = 4) -> List[str]:
+        with self.vectorstores.lease_retrieval(user_id) as vectorstore:
+            if vectorstore is None:
+                raise ValueError("No documents found for this user")
+            docs = vectorstore.similarity_search(query, k=k)
         return [doc.page_content for doc in docs]
 
+    def delete_chunks(self, user_id: str, chunk_ids: List[str]) -> None:
+        """Remove one document's chunks from the user's vectorstore and keyword index"""
+        with self.vectorstores.lease(user_id) as vectorstore:
+            if vectorstore is None or not chunk_ids:
+                return
+            keyword_index = self.vectorstores.keyword_index(user_id)
+            vector_index = self.vectorstores.vector_index(user_id)
+            self._discard_chunks(vectorstore, keyword_index, vector_index, chunk_ids)
+            if vector_index is not None:
+                self.vectorstores.save_vector_index(user_id, vector_index)
+        get_answer_cache().invalidate(user_id)
+
+    def _chunk_ids(self, document_id: str) -> Optional[List[str]]:
+        """The chunk ids the document lists, or None if it is gone"""
+        db = SessionLocal()
+        try:
+            document = document_service.get_document(db, document_id)
+            return list(document.chunk_ids) if document is not None else None
+        finally:
+            db.close()
+
+    def _delete_record(self, document_id: str) -> None:
+        db = SessionLocal()
+        try:
+            document_service.delete_document(db, document_id)
+        finally:
+            db.close()
+
+    async def delete_document(self, user_id: str, document_id: str, filename: str) -> None:
+        """Delete a document and its chunks, holding its filename's lock so no new version is indexed meanwhile"""
+        async with self._lock_documents(user_id, [filename]):
+            # Read under the lock, as a version indexed since the caller looked may have other chunks
+            chunk_ids = await run_in_threadpool(self._chunk_ids, document_id)
+            if chunk_ids is None:
+                return
+            await run_in_threadpool(self.delete_chunks, user_id, chunk_ids)
+            await run_in_threadpool(self._delete_record, document_id)
+
     def clear_user_documents(self, user_id: str):
-        user_db_path = f"{self.persist_directory}/{user_id}"
-        if os.path.exists(user_db_path):
-            shutil.rmtree(user_db_path)
\ No newline at end of file
+        self.vectorstores.delete_user(user_id)
+        get_answer_cache().invalidate(user_id)
+        db = SessionLocal()
+        try:
+            document_service.delete_user_documents(db, int(user_id))
+        finally:
+            db.close()
\ No newline at end of file
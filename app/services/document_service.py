@@ -0,0 +1,71 @@
+from typing import List, Optional
+import uuid
+from sqlalchemy.orm import Session
+from app.db.models import DocumentRecord
+
+
+def get_document(db: Session, document_id: str) -> Optional[DocumentRecord]:
+    return db.query(DocumentRecord).filter(DocumentRecord.id == document_id).first()
+
+
+def get_user_documents(db: Session, user_id: int) -> List[DocumentRecord]:
+    return (
+        db.query(DocumentRecord)
+        .filter(DocumentRecord.user_id == user_id)
+        .order_by(DocumentRecord.created_at.desc())
+        .all()
+    )
+
+
+def get_document_by_hash(db: Session, user_id: int, file_hash: str) -> Optional[DocumentRecord]:
+    return (
+        db.query(DocumentRecord)
+        .filter(DocumentRecord.user_id == user_id, DocumentRecord.file_hash == file_hash)
+        .first()
+    )
+
+
+def get_document_by_filename(db: Session, user_id: int, filename: str) -> Optional[DocumentRecord]:
+    return (
+        db.query(DocumentRecord)
+        .filter(DocumentRecord.user_id == user_id, DocumentRecord.filename == filename)
+        .order_by(DocumentRecord.updated_at.desc())
+        .first()
+    )
+
+
+def save_document(
+    db: Session,
+    user_id: int,
+    filename: str,
+    file_hash: str,
+    chunk_ids: List[str],
+    chunk_hashes: List[str],
+    document_id: Optional[str] = None,
+    commit: bool = True
+) -> DocumentRecord:
+    """Create the document, or record a new version of it when document_id is given"""
+    document = get_document(db, document_id) if document_id else None
+    if document is None:
+        document = DocumentRecord(id=document_id or str(uuid.uuid4()), user_id=user_id)
+        db.add(document)
+    document.filename = filename
+    document.file_hash = file_hash
+    document.chunk_ids = chunk_ids
+    document.chunk_hashes = chunk_hashes
+    if not commit:
+        db.flush()
+        return document
+    db.commit()
+    db.refresh(document)
+    return document
+
+
+def delete_document(db: Session, document_id: str) -> None:
+    db.query(DocumentRecord).filter(DocumentRecord.id == document_id).delete()
+    db.commit()
+
+
+def delete_user_documents(db: Session, user_id: int) -> None:
+    db.query(DocumentRecord).filter(DocumentRecord.user_id == user_id).delete()
+    db.commit()
@@ -0,0 +1,42 @@
+from langchain_core.embeddings import Embeddings
+from langchain_google_genai import GoogleGenerativeAIEmbeddings
+from functools import lru_cache
+from typing import List
+import logging
+from app.core import metrics
+from app.core.config import settings
+from app.services.embedding_cache import CachedEmbeddings, build_embedding_cache
+
+
+@lru_cache
+def get_embeddings() -> Embeddings:
+    """Process-wide embedding client, shared by ingestion and retrieval"""
+    try:
+        embeddings = GoogleGenerativeAIEmbeddings(
+            model=settings.EMBEDDING_MODEL,
+            google_api_key=settings.GOOGLE_API_KEY
+        )
+    except Exception as e:
+        logging.error(f"Failed to initialize embeddings: {str(e)}")
+        raise
+
+    # Identical chunks (re-uploads, shared templates) are only embedded once
+    if settings.EMBEDDING_CACHE_ENABLED:
+        cache = build_embedding_cache(
+            settings.EMBEDDING_CACHE_PATH,
+            settings.EMBEDDING_CACHE_MAX_ENTRIES
+        )
+        if cache is not None:
+            embeddings = CachedEmbeddings(embeddings, cache, settings.EMBEDDING_MODEL)
+            metrics.register_collector("embedding_cache", cache.stats)
+    return embeddings
+
+
+def embed_queries(embeddings: Embeddings, texts: List[str]) -> List[List[float]]:
+    """Embed several search queries with one backend call instead of one embed_query each"""
+    if isinstance(embeddings, CachedEmbeddings):
+        # Query embeddings are never cached, see CachedEmbeddings.embed_query
+        embeddings = embeddings.embeddings
+    if isinstance(embeddings, GoogleGenerativeAIEmbeddings):
+        return embeddings.embed_documents(texts, task_type="RETRIEVAL_QUERY")
+    return embeddings.embed_documents(texts)
@@ -0,0 +1,221 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from fastapi.concurrency import run_in_threadpool
+from typing import AsyncIterable, AsyncIterator, Callable, Dict, Iterable, List, Optional, Union
+import asyncio
+import hashlib
+import uuid
+import logging
+from app.core import metrics
+
+ProgressCallback = Callable[[int], None]
+BatchCallback = Callable[[List[str], List[str], List[dict]], None]
+VectorsCallback = Callable[[List[str], List[List[float]]], None]
+DocumentSource = Union[Iterable[Document], AsyncIterable[Document]]
+
+
+def _clean_metadata(metadata: dict, chunk_id: str) -> dict:
+    # Chroma only stores scalar values and rejects empty metadata dicts
+    cleaned = {
+        key: value for key, value in metadata.items()
+        if isinstance(value, (str, int, float, bool))
+    }
+    cleaned["chunk_id"] = chunk_id
+    return cleaned
+
+
+async def _aiter(documents: Iterable[Document]) -> AsyncIterator[Document]:
+    for document in documents:
+        yield document
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class ChunkDiff:
+    """Matches a document's chunks against its previous version by content hash.
+
+    Unchanged chunks keep their ids and stored embeddings; changed() only yields
+    the new or changed ones, so only those are embedded.
+    """
+
+    def __init__(self, previous_ids: Iterable[str] = (), previous_hashes: Iterable[str] = ()):
+        self._reusable: Dict[str, List[str]] = {}
+        for chunk_id, digest in zip(previous_ids, previous_hashes):
+            self._reusable.setdefault(digest, []).append(chunk_id)
+        self.chunk_ids: List[str] = []
+        self.chunk_hashes: List[str] = []
+        self.added: List[str] = []
+        self.reused: List[Document] = []
+
+    async def changed(self, documents: DocumentSource) -> AsyncIterator[Document]:
+        if not hasattr(documents, "__aiter__"):
+            documents = _aiter(documents)
+        async for document in documents:
+            digest = chunk_hash(document.page_content)
+            candidates = self._reusable.get(digest)
+            if candidates:
+                chunk_id = candidates.pop(0)
+                document.metadata["chunk_id"] = chunk_id
+                self.reused.append(document)
+            else:
+                chunk_id = str(uuid.uuid4())
+                document.metadata["chunk_id"] = chunk_id
+                self.added.append(chunk_id)
+                yield document
+            self.chunk_ids.append(chunk_id)
+            self.chunk_hashes.append(digest)
+
+    @property
+    def stale(self) -> List[str]:
+        """Previous chunk ids with no match in the new version"""
+        return [chunk_id for chunk_ids in self._reusable.values() for chunk_id in chunk_ids]
+
+
+class EmbeddingPipeline:
+    """Embeds document splits in bounded-concurrency batches and upserts each batch on completion"""
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        batch_size: int = 64,
+        concurrency: int = 4,
+        max_retries: int = 3,
+        retry_backoff: float = 1.0
+    ):
+        if batch_size < 1 or concurrency < 1:
+            raise ValueError("batch_size and concurrency must be at least 1")
+        self.embeddings = embeddings
+        self.batch_size = batch_size
+        self.concurrency = concurrency
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+
+    async def _iter_batches(self, documents: DocumentSource) -> AsyncIterator[List[Document]]:
+        # Async sources are pulled lazily, so a streaming producer only runs ahead by one batch
+        if not hasattr(documents, "__aiter__"):
+            documents = _aiter(documents)
+        batch = []
+        async for document in documents:
+            batch.append(document)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    async def _embed_with_retry(self, texts: List[str]) -> List[List[float]]:
+        attempt = 0
+        while True:
+            try:
+                return await run_in_threadpool(self.embeddings.embed_documents, texts)
+            except Exception as e:
+                attempt += 1
+                if attempt > self.max_retries:
+                    raise
+                delay = self.retry_backoff * (2 ** (attempt - 1))
+                logging.warning(
+                    f"Embedding batch of {len(texts)} failed (attempt {attempt}/{self.max_retries}): "
+                    f"{str(e)}; retrying in {delay:.1f}s"
+                )
+                await asyncio.sleep(delay)
+
+    async def _index_batch(
+        self,
+        vectorstore,
+        batch: List[Document],
+        extra_metadata: Dict,
+        on_batch: Optional[BatchCallback],
+        on_vectors: Optional[VectorsCallback]
+    ) -> int:
+        texts = [doc.page_content for doc in batch]
+        with metrics.span("embed"):
+            vectors = await self._embed_with_retry(texts)
+        ids = [doc.metadata.get("chunk_id") or str(uuid.uuid4()) for doc in batch]
+        metadatas = [
+            _clean_metadata({**doc.metadata, **extra_metadata}, chunk_id)
+            for doc, chunk_id in zip(batch, ids)
+        ]
+        with metrics.span("upsert"):
+            await run_in_threadpool(
+                vectorstore._collection.upsert,
+                ids=ids,
+                embeddings=vectors,
+                documents=texts,
+                metadatas=metadatas
+            )
+        metrics.count_chunks("embedded", len(batch))
+        # The keyword index writes to SQLite and the compact index quantizes, so both stay off the event loop
+        if on_batch:
+            await run_in_threadpool(on_batch, ids, texts, metadatas)
+        if on_vectors:
+            await run_in_threadpool(on_vectors, ids, vectors)
+        return len(batch)
+
+    async def add_documents(
+        self,
+        vectorstore,
+        documents: DocumentSource,
+        on_progress: Optional[ProgressCallback] = None,
+        extra_metadata: Optional[Dict] = None,
+        on_batch: Optional[BatchCallback] = None,
+        on_vectors: Optional[VectorsCallback] = None
+    ) -> int:
+        """Embed and upsert documents, returning the number of chunks indexed.
+
+        on_batch is called with each batch's ids, texts and metadatas once it is
+        upserted, and on_vectors with its ids and embeddings, both on the threadpool.
+        """
+        extra_metadata = extra_metadata or {}
+        indexed = 0
+        pending = set()
+
+        def collect(done) -> None:
+            nonlocal indexed
+            for task in done:
+                indexed += task.result()
+                if on_progress:
+                    on_progress(indexed)
+
+        try:
+            async for batch in self._iter_batches(documents):
+                # Backpressure: never have more than `concurrency` batches in flight
+                if len(pending) >= self.concurrency:
+                    done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                    collect(done)
+                pending.add(asyncio.create_task(
+                    self._index_batch(vectorstore, batch, extra_metadata, on_batch, on_vectors)
+                ))
+
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                collect(done)
+        except BaseException:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise
+
+        return indexed
+
+    async def refresh_metadata(
+        self,
+        vectorstore,
+        documents: List[Document],
+        extra_metadata: Optional[Dict] = None,
+        on_batch: Optional[BatchCallback] = None
+    ) -> None:
+        """Update the metadata of already-embedded chunks (e.g. new page numbers) without re-embedding"""
+        if not documents:
+            return
+        extra_metadata = extra_metadata or {}
+        ids = [doc.metadata["chunk_id"] for doc in documents]
+        texts = [doc.page_content for doc in documents]
+        metadatas = [
+            _clean_metadata({**doc.metadata, **extra_metadata}, chunk_id)
+            for doc, chunk_id in zip(documents, ids)
+        ]
+        await run_in_threadpool(vectorstore._collection.update, ids=ids, metadatas=metadatas)
+        if on_batch:
+            await run_in_threadpool(on_batch, ids, texts, metadatas)
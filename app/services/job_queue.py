@@ -0,0 +1,224 @@
+from fastapi.concurrency import run_in_threadpool
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Deque, Dict, List, Optional
+import asyncio
+import os
+import socket
+import uuid
+import logging
+from app.db.database import SessionLocal
+from app.services import job_service
+
+JobHandler = Callable[[Dict, Callable[[Dict], None]], Awaitable[Dict]]
+
+
+def _with_db(function, *args, **kwargs):
+    db = SessionLocal()
+    try:
+        return function(db, *args, **kwargs)
+    finally:
+        db.close()
+
+
+def _persist(job_id: str, owner: Optional[str] = None, **fields) -> bool:
+    return _with_db(job_service.update_job, job_id, owner, **fields)
+
+
+def _job_status(job_id: str) -> Optional[str]:
+    job = _with_db(job_service.get_job, job_id)
+    return job.status if job is not None else None
+
+
+def _take_over_abandoned(owner: str, lease: float) -> List[Dict]:
+    db = SessionLocal()
+    try:
+        return [
+            {
+                "id": job.id,
+                "user_id": job.user_id,
+                "filename": job.filename,
+                "file_path": job.file_path,
+                "file_hash": job.file_hash
+            }
+            for job in job_service.get_abandoned_jobs(db)
+            if job_service.take_over_job(db, job.id, owner, lease)
+        ]
+    finally:
+        db.close()
+
+
+class IngestionQueue:
+    """Runs ingestion jobs on a fixed number of workers, round-robin across users.
+
+    Jobs are leased in the database (see job_service), so with several processes each
+    job runs in exactly one of them: the one that created it, or whichever takes it
+    over once its owner's lease lapses.
+    """
+
+    def __init__(self, handler: JobHandler, workers: int = 2, flush_interval: float = 2.0, lease: float = 60.0):
+        self.handler = handler
+        self.workers = workers
+        self.flush_interval = flush_interval
+        self.lease = lease
+        self.owner = f"{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        # user_id -> that user's queued jobs; iteration order is the round-robin order
+        self._pending: "OrderedDict[int, Deque[Dict]]" = OrderedDict()
+        self._running: Dict[str, asyncio.Task] = {}
+        self._progress: Dict[str, Dict] = {}
+        self._wakeup = asyncio.Event()
+        self._workers: List[asyncio.Task] = []
+
+    async def start(self) -> None:
+        """Start the workers and take over jobs abandoned by stopped or crashed processes"""
+        await self._recover()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.workers)]
+        self._workers.append(asyncio.create_task(self._keep_leases()))
+        logging.info(f"Started {self.workers} ingestion workers as {self.owner}")
+
+    async def _recover(self) -> None:
+        for job in await run_in_threadpool(_take_over_abandoned, self.owner, self.lease):
+            if os.path.exists(job["file_path"]):
+                logging.info(f"Took over ingestion job {job['id']}")
+                self._enqueue(job)
+            else:
+                await run_in_threadpool(
+                    _persist, job["id"], self.owner,
+                    status=job_service.FAILED,
+                    error="Uploaded file was lost before processing finished"
+                )
+
+    async def _keep_leases(self) -> None:
+        while True:
+            await asyncio.sleep(self.lease / 3)
+            try:
+                await run_in_threadpool(_with_db, job_service.renew_leases, self.owner, self.lease)
+                await self._recover()
+            except Exception as e:
+                logging.error(f"Renewing ingestion job leases failed: {str(e)}")
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    async def stop(self) -> None:
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        # Unfinished jobs stay in the database for the next process to take over without waiting
+        await run_in_threadpool(_with_db, job_service.release_jobs, self.owner)
+
+    def submit(self, job: Dict) -> None:
+        """Queue a job created with owner=self.owner"""
+        self._enqueue(job)
+
+    def _enqueue(self, job: Dict) -> None:
+        self._pending.setdefault(job["user_id"], deque()).append(job)
+        self._wakeup.set()
+
+    def _next_job(self) -> Optional[Dict]:
+        if not self._pending:
+            return None
+        user_id, jobs = next(iter(self._pending.items()))
+        job = jobs.popleft()
+        # Rotate the user to the back so other users get the next slot
+        del self._pending[user_id]
+        if jobs:
+            self._pending[user_id] = jobs
+        return job
+
+    def progress(self, job_id: str) -> Optional[Dict]:
+        """Live progress of a job running on this worker, fresher than the database row"""
+        return self._progress.get(job_id)
+
+    async def cancel(self, job_id: str) -> bool:
+        """Cancel an unfinished job; False if it has already finished"""
+        for user_id, jobs in list(self._pending.items()):
+            for job in jobs:
+                if job["id"] == job_id:
+                    jobs.remove(job)
+                    if not jobs:
+                        del self._pending[user_id]
+                    await run_in_threadpool(_persist, job_id, self.owner, status=job_service.CANCELLED)
+                    self._cleanup(job)
+                    return True
+
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+            return True
+        # Held by another process (or waiting to be retried here); its owner stops it on its next update
+        return await run_in_threadpool(_with_db, job_service.cancel_job, job_id)
+
+    @staticmethod
+    def _cleanup(job: Dict) -> None:
+        if os.path.exists(job["file_path"]):
+            os.unlink(job["file_path"])
+
+    async def _work(self) -> None:
+        while True:
+            job = self._next_job()
+            if job is None:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            await self._run(job)
+
+    async def _claim(self, job: Dict) -> bool:
+        """Mark the job running here; otherwise retry it later or drop it"""
+        if await run_in_threadpool(_with_db, job_service.start_job, job["id"], self.owner, self.lease):
+            return True
+        status = await run_in_threadpool(_job_status, job["id"])
+        if status == job_service.QUEUED:
+            # Another job for the same file is running; two would race to replace its chunks
+            asyncio.get_running_loop().call_later(self.flush_interval, self._enqueue, job)
+        elif status == job_service.CANCELLED:
+            self._cleanup(job)
+        else:
+            logging.info(f"Ingestion job {job['id']} is held by another process")
+        return False
+
+    async def _run(self, job: Dict) -> None:
+        job_id = job["id"]
+        if not await self._claim(job):
+            return
+        progress = {"pages_processed": 0, "chunks_indexed": 0, "chunks_total": None}
+        self._progress[job_id] = progress
+
+        task = asyncio.create_task(self.handler(job, progress.update))
+        self._running[job_id] = task
+        held = True
+        try:
+            while not task.done():
+                await asyncio.wait({task}, timeout=self.flush_interval)
+                if not task.done():
+                    held = await run_in_threadpool(_persist, job_id, self.owner, **progress)
+                    if not held:
+                        # Cancelled from another process, or taken over after our lease lapsed
+                        task.cancel()
+                        await asyncio.wait({task})
+
+            result = task.result()
+            await run_in_threadpool(
+                _persist, job_id, self.owner,
+                status=job_service.SKIPPED if result["status"] == "skipped" else job_service.SUCCEEDED,
+                **{**progress, "chunks_indexed": result["chunks"], "chunks_total": result["chunks"]}
+            )
+            logging.info(f"Ingestion job {job_id} finished with {result['chunks']} chunks")
+        except asyncio.CancelledError:
+            if not task.done():
+                # The worker itself is being stopped; the job is taken over once released
+                task.cancel()
+                raise
+            await run_in_threadpool(_persist, job_id, self.owner, status=job_service.CANCELLED, **progress)
+            logging.info(f"Ingestion job {job_id} was cancelled")
+        except Exception as e:
+            detail = getattr(e, "detail", None) or str(e)
+            await run_in_threadpool(_persist, job_id, self.owner, status=job_service.FAILED, error=detail, **progress)
+            logging.error(f"Ingestion job {job_id} failed: {detail}")
+        finally:
+            self._running.pop(job_id, None)
+            self._progress.pop(job_id, None)
+            # A job taken over by another process still needs its file
+            if task.done() and (held or await run_in_threadpool(_job_status, job_id) == job_service.CANCELLED):
+                self._cleanup(job)
@@ -0,0 +1,165 @@
+from datetime import datetime, timedelta
+from typing import List, Optional
+import uuid
+from sqlalchemy import or_
+from sqlalchemy.orm import Session, aliased
+from app.db.models import IngestionJob
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+SKIPPED = "skipped"  # identical to a document the user already has
+
+FINISHED_STATUSES = {SUCCEEDED, FAILED, CANCELLED, SKIPPED}
+UNFINISHED_STATUSES = [QUEUED, RUNNING]
+
+# Unfinished jobs are held by one ingestion queue (owner) until lease_expires_at. The
+# owner renews its leases while it is alive; a job whose lease has lapsed is taken over
+# by whichever queue notices first. Every change of hands is a conditional UPDATE, so
+# two processes never both run a job.
+
+
+def _lease_expiry(lease_seconds: float) -> datetime:
+    return datetime.utcnow() + timedelta(seconds=lease_seconds)
+
+
+def create_job(
+    db: Session,
+    user_id: int,
+    filename: str,
+    file_path: str,
+    file_hash: str,
+    status: str = QUEUED,
+    owner: Optional[str] = None,
+    lease_seconds: float = 0.0
+) -> IngestionJob:
+    job = IngestionJob(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        filename=filename,
+        file_path=file_path,
+        file_hash=file_hash,
+        status=status,
+        owner=owner,
+        lease_expires_at=_lease_expiry(lease_seconds) if owner else None
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    return job
+
+
+def get_job(db: Session, job_id: str) -> Optional[IngestionJob]:
+    return db.query(IngestionJob).filter(IngestionJob.id == job_id).first()
+
+
+def get_user_jobs(db: Session, user_id: int, limit: int = 50) -> List[IngestionJob]:
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.user_id == user_id)
+        .order_by(IngestionJob.created_at.desc())
+        .limit(limit)
+        .all()
+    )
+
+
+def _lease_lapsed(now: datetime):
+    return or_(IngestionJob.lease_expires_at.is_(None), IngestionJob.lease_expires_at < now)
+
+
+def get_abandoned_jobs(db: Session) -> List[IngestionJob]:
+    """Unfinished jobs whose owner stopped renewing its lease"""
+    return (
+        db.query(IngestionJob)
+        .filter(IngestionJob.status.in_(UNFINISHED_STATUSES), _lease_lapsed(datetime.utcnow()))
+        .order_by(IngestionJob.created_at)
+        .all()
+    )
+
+
+def take_over_job(db: Session, job_id: str, owner: str, lease_seconds: float) -> bool:
+    """Requeue an abandoned job under owner; False if it finished or someone else took it first"""
+    updated = (
+        db.query(IngestionJob)
+        .filter(
+            IngestionJob.id == job_id,
+            IngestionJob.status.in_(UNFINISHED_STATUSES),
+            _lease_lapsed(datetime.utcnow())
+        )
+        .update(
+            {"status": QUEUED, "owner": owner, "lease_expires_at": _lease_expiry(lease_seconds)},
+            synchronize_session=False
+        )
+    )
+    db.commit()
+    return updated > 0
+
+
+def start_job(db: Session, job_id: str, owner: str, lease_seconds: float) -> bool:
+    """Mark owner's queued job running, unless another job for the same file is running"""
+    now = datetime.utcnow()
+    other = aliased(IngestionJob)
+    same_file_running = (
+        db.query(other.id)
+        .filter(
+            other.user_id == IngestionJob.user_id,
+            other.filename == IngestionJob.filename,
+            other.id != IngestionJob.id,
+            other.status == RUNNING,
+            other.lease_expires_at >= now
+        )
+        .exists()
+    )
+    updated = (
+        db.query(IngestionJob)
+        .filter(
+            IngestionJob.id == job_id,
+            IngestionJob.owner == owner,
+            IngestionJob.status == QUEUED,
+            ~same_file_running
+        )
+        .update(
+            {"status": RUNNING, "error": None, "lease_expires_at": _lease_expiry(lease_seconds)},
+            synchronize_session=False
+        )
+    )
+    db.commit()
+    return updated > 0
+
+
+def renew_leases(db: Session, owner: str, lease_seconds: float) -> int:
+    updated = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.owner == owner, IngestionJob.status.in_(UNFINISHED_STATUSES))
+        .update({"lease_expires_at": _lease_expiry(lease_seconds)}, synchronize_session=False)
+    )
+    db.commit()
+    return updated
+
+
+def release_jobs(db: Session, owner: str) -> int:
+    """Let other processes take over owner's unfinished jobs straight away"""
+    return renew_leases(db, owner, -1.0)
+
+
+def cancel_job(db: Session, job_id: str) -> bool:
+    """Cancel a job whichever process holds it; its owner notices on its next update"""
+    updated = (
+        db.query(IngestionJob)
+        .filter(IngestionJob.id == job_id, IngestionJob.status.in_(UNFINISHED_STATUSES))
+        .update({"status": CANCELLED}, synchronize_session=False)
+    )
+    db.commit()
+    return updated > 0
+
+
+def update_job(db: Session, job_id: str, owner: Optional[str] = None, **fields) -> bool:
+    """Update a job; given an owner, only while that owner still holds it unfinished"""
+    query = db.query(IngestionJob).filter(IngestionJob.id == job_id)
+    if owner is not None:
+        query = query.filter(IngestionJob.owner == owner, IngestionJob.status.in_(UNFINISHED_STATUSES))
+    updated = query.update(fields, synchronize_session=False)
+    db.commit()
+    return updated > 0
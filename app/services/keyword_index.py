@@ -0,0 +1,196 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+from collections import Counter
+import json
+import math
+import os
+import re
+import sqlite3
+import threading
+import logging
+
+# Keeps identifiers such as "7.2", "sku-1042" or "v2_final" as single terms
+TOKEN_PATTERN = re.compile(r"[a-z0-9]+(?:[._\-/][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by do does for from has have how i in is it of on or "
+    "say says said that the this to was what when where which who why with you".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN_PATTERN.findall(text.lower()) if token not in STOPWORDS]
+
+
+class KeywordIndex:
+    """BM25 inverted index over a user's chunks, stored in SQLite next to their collection.
+
+    Postings, chunk lengths and chunk texts live in the database, so adding or
+    removing chunks writes only those rows and texts are read from disk when a
+    hit is returned. Every worker process opens the same file, so each sees the
+    others' writes on its next search. Without a path the index is in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, k1: float = 1.5, b: float = 0.75):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self._lock = threading.RLock()
+
+        self._conn = sqlite3.connect(path or ":memory:", check_same_thread=False)
+        if path:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(
+            "CREATE TABLE IF NOT EXISTS chunks ("
+            "id TEXT PRIMARY KEY, text TEXT NOT NULL, metadata TEXT NOT NULL, length INTEGER NOT NULL);"
+            "CREATE TABLE IF NOT EXISTS postings ("
+            "term TEXT NOT NULL, chunk_id TEXT NOT NULL, frequency INTEGER NOT NULL, "
+            "PRIMARY KEY (term, chunk_id)) WITHOUT ROWID;"
+            "CREATE INDEX IF NOT EXISTS ix_postings_chunk_id ON postings (chunk_id);"
+            # One row: chunk count and total length, kept in step so searches don't scan chunks
+            "CREATE TABLE IF NOT EXISTS totals (id INTEGER PRIMARY KEY CHECK (id = 0), "
+            "chunks INTEGER NOT NULL, length INTEGER NOT NULL);"
+            "INSERT OR IGNORE INTO totals (id, chunks, length) VALUES (0, 0, 0);"
+        )
+        self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT chunks FROM totals").fetchone()[0]
+
+    def add(self, ids: List[str], texts: List[str], metadatas: List[dict]) -> None:
+        with self._lock, self._conn:
+            # A chunk listed twice keeps its last text, as when it is added twice
+            chunks = {chunk_id: (text, metadata) for chunk_id, text, metadata in zip(ids, texts, metadatas)}
+            self._remove(chunks)
+            rows, postings = [], []
+            for chunk_id, (text, metadata) in chunks.items():
+                terms = Counter(tokenize(text))
+                rows.append((chunk_id, text, json.dumps(metadata), sum(terms.values())))
+                postings.extend((term, chunk_id, frequency) for term, frequency in terms.items())
+            self._conn.executemany("INSERT INTO chunks (id, text, metadata, length) VALUES (?, ?, ?, ?)", rows)
+            self._conn.executemany("INSERT INTO postings (term, chunk_id, frequency) VALUES (?, ?, ?)", postings)
+            total = sum(row[3] for row in rows)
+            self._conn.execute(
+                "UPDATE totals SET chunks = chunks + ?, length = length + ?", (len(chunks), total)
+            )
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock, self._conn:
+            self._remove(ids)
+
+    def remove_where(self, key: str, value) -> None:
+        with self._lock, self._conn:
+            rows = self._conn.execute(
+                "SELECT id FROM chunks WHERE json_extract(metadata, ?) = ?", (f"$.{key}", value)
+            ).fetchall()
+            self._remove([chunk_id for (chunk_id,) in rows])
+
+    def _remove(self, ids: Iterable[str]) -> None:
+        ids = list(dict.fromkeys(ids))
+        # Stay well below SQLite's bound-parameter limit
+        for start in range(0, len(ids), 500):
+            batch = ids[start:start + 500]
+            placeholders = ",".join("?" * len(batch))
+            count, length = self._conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM(length), 0) FROM chunks WHERE id IN ({placeholders})", batch
+            ).fetchone()
+            if not count:
+                continue
+            self._conn.execute(f"DELETE FROM postings WHERE chunk_id IN ({placeholders})", batch)
+            self._conn.execute(f"DELETE FROM chunks WHERE id IN ({placeholders})", batch)
+            self._conn.execute("UPDATE totals SET chunks = chunks - ?, length = length - ?", (count, length))
+
+    def _idf(self, chunks: int, frequency: int) -> float:
+        return math.log(1 + (chunks - frequency + 0.5) / (frequency + 0.5))
+
+    def _frequencies(self, terms: Iterable[str]) -> Dict[str, int]:
+        terms = list(terms)
+        if not terms:
+            return {}
+        placeholders = ",".join("?" * len(terms))
+        return dict(self._conn.execute(
+            f"SELECT term, COUNT(*) FROM postings WHERE term IN ({placeholders}) GROUP BY term", terms
+        ).fetchall())
+
+    def search(self, query: str, k: int = 4) -> List[Tuple[str, float]]:
+        """Top-k (chunk_id, BM25 score) pairs"""
+        with self._lock:
+            chunks, total_length = self._conn.execute("SELECT chunks, length FROM totals").fetchone()
+            if not chunks:
+                return []
+            average_length = total_length / chunks
+            scores: Dict[str, float] = {}
+            for term in set(tokenize(query)):
+                postings = self._conn.execute(
+                    "SELECT postings.chunk_id, postings.frequency, chunks.length FROM postings "
+                    "JOIN chunks ON chunks.id = postings.chunk_id WHERE postings.term = ?",
+                    (term,)
+                ).fetchall()
+                if not postings:
+                    continue
+                idf = self._idf(chunks, len(postings))
+                for chunk_id, frequency, length in postings:
+                    norm = self.k1 * (1 - self.b + self.b * length / average_length)
+                    scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+            return sorted(scores.items(), key=lambda item: item[1], reverse=True)[:k]
+
+    def confidence(self, query: str, score: float) -> float:
+        """A score relative to an average-length chunk containing every known query term once"""
+        with self._lock:
+            chunks = self._conn.execute("SELECT chunks FROM totals").fetchone()[0]
+            frequencies = self._frequencies(set(tokenize(query)))
+        ideal = sum(self._idf(chunks, frequency) for frequency in frequencies.values())
+        return score / ideal if ideal else 0.0
+
+    def document(self, chunk_id: str) -> Tuple[str, dict]:
+        with self._lock:
+            row = self._conn.execute("SELECT text, metadata FROM chunks WHERE id = ?", (chunk_id,)).fetchone()
+        if row is None:
+            raise KeyError(chunk_id)
+        return row[0], json.loads(row[1])
+
+    def documents(self, chunk_ids: Iterable[str]) -> Dict[str, Tuple[str, dict]]:
+        """(text, metadata) by chunk id, in one query per 500 ids; ids no longer indexed are left out"""
+        chunk_ids = list(dict.fromkeys(chunk_ids))
+        rows = []
+        with self._lock:
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(chunk_ids), 500):
+                batch = chunk_ids[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._conn.execute(
+                    f"SELECT id, text, metadata FROM chunks WHERE id IN ({placeholders})", batch
+                ).fetchall())
+        return {chunk_id: (text, json.loads(metadata)) for chunk_id, text, metadata in rows}
+
+    def backup(self, path: str) -> None:
+        """Copy the index to path, consistent even while other processes write to it"""
+        target = sqlite3.connect(path)
+        try:
+            with self._lock:
+                self._conn.backup(target)
+        finally:
+            target.close()
+
+    @classmethod
+    def from_json(cls, path: str, json_path: str) -> "KeywordIndex":
+        """Convert an index saved by earlier versions as one JSON file"""
+        index = cls(path)
+        with open(json_path, encoding="utf-8") as f:
+            documents = json.load(f)["documents"]
+        if documents:
+            ids = list(documents)
+            index.add(ids, [documents[i][0] for i in ids], [documents[i][1] for i in ids])
+        os.unlink(json_path)
+        logging.info(f"Converted keyword index with {len(index)} chunks to {path}")
+        return index
+
+    @classmethod
+    def from_collection(cls, path: str, collection) -> "KeywordIndex":
+        """Build an index for a collection indexed before keyword search existed"""
+        index = cls(path)
+        records = collection.get(include=["documents", "metadatas"])
+        if records["ids"]:
+            index.add(records["ids"], records["documents"], [m or {} for m in records["metadatas"]])
+        logging.info(f"Built keyword index with {len(index)} chunks at {path}")
+        return index
@@ -0,0 +1,87 @@
+from langchain.memory import ConversationBufferMemory
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.messages import BaseMessage, SystemMessage, get_buffer_string
+from typing import Any, Dict, List, Optional, Tuple
+from functools import lru_cache
+import tiktoken
+from app.services.prompts import HISTORY_SUMMARY_PROMPT
+
+
+@lru_cache
+def get_encoding(encoding_name: str = "cl100k_base"):
+    return tiktoken.get_encoding(encoding_name)
+
+
+def count_tokens(text: str, encoding_name: str = "cl100k_base") -> int:
+    return len(get_encoding(encoding_name).encode(text, disallowed_special=()))
+
+
+class TokenBudgetMemory(ConversationBufferMemory):
+    """Conversation buffer kept under a tiktoken-counted budget.
+
+    Once the history exceeds max_token_limit, the oldest turns are dropped or, when an
+    llm is set, folded into a running summary kept as the first message.
+    """
+
+    max_token_limit: int = 2000
+    encoding_name: str = "cl100k_base"
+    llm: Optional[BaseLanguageModel] = None
+
+    def _message_tokens(self, message: BaseMessage) -> int:
+        return count_tokens(
+            get_buffer_string([message], human_prefix=self.human_prefix, ai_prefix=self.ai_prefix),
+            self.encoding_name
+        )
+
+    def _split_overflow(self) -> Tuple[str, List[BaseMessage], List[BaseMessage]]:
+        """Return (existing summary, messages to drop, messages to keep)"""
+        messages = self.chat_memory.messages
+        summary = messages[0].content if messages and isinstance(messages[0], SystemMessage) else ""
+        turns = messages[1:] if summary else list(messages)
+
+        total = count_tokens(summary, self.encoding_name) + sum(self._message_tokens(m) for m in turns)
+        dropped: List[BaseMessage] = []
+        # Drop whole human/ai pairs, but always keep the latest turn
+        while total > self.max_token_limit and len(turns) > 2:
+            for message in turns[:2]:
+                total -= self._message_tokens(message)
+            dropped.extend(turns[:2])
+            turns = turns[2:]
+        return summary, dropped, turns
+
+    def _summary_prompt(self, summary: str, dropped: List[BaseMessage]) -> str:
+        return HISTORY_SUMMARY_PROMPT.format(
+            summary=summary or "(none)",
+            new_lines=get_buffer_string(dropped, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix)
+        )
+
+    def _replace(self, summary: str, turns: List[BaseMessage]) -> None:
+        self.chat_memory.clear()
+        messages = ([SystemMessage(content=summary)] if summary else []) + turns
+        self.chat_memory.add_messages(messages)
+
+    def prune(self) -> None:
+        summary, dropped, turns = self._split_overflow()
+        if not dropped:
+            return
+        if self.llm is not None:
+            summary = self.llm.invoke(self._summary_prompt(summary, dropped))
+            summary = getattr(summary, "content", summary)
+        self._replace(summary, turns)
+
+    async def aprune(self) -> None:
+        summary, dropped, turns = self._split_overflow()
+        if not dropped:
+            return
+        if self.llm is not None:
+            summary = await self.llm.ainvoke(self._summary_prompt(summary, dropped))
+            summary = getattr(summary, "content", summary)
+        self._replace(summary, turns)
+
+    def save_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        super().save_context(inputs, outputs)
+        self.prune()
+
+    async def asave_context(self, inputs: Dict[str, Any], outputs: Dict[str, str]) -> None:
+        await super().asave_context(inputs, outputs)
+        await self.aprune()
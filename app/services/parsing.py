@@ -0,0 +1,193 @@
+from langchain_community.document_loaders import (
+    PyPDFLoader,
+    Docx2txtLoader,
+    UnstructuredPowerPointLoader,
+    TextLoader
+)
+from langchain_core.documents import Document
+from fastapi.concurrency import iterate_in_threadpool, run_in_threadpool
+from contextlib import asynccontextmanager, nullcontext
+from typing import AsyncIterator, Iterator, List, Set, Tuple
+import asyncio
+import multiprocessing
+import multiprocessing.pool
+import time
+import logging
+from app.core import metrics
+
+# (page_content, metadata) pairs are all that cross the process boundary
+ParsedChunk = Tuple[str, dict]
+# Formats whose loader yields one page at a time; the others load the whole file at once
+STREAMING_EXTENSIONS = {'.pdf'}
+
+
+class ParserBusyError(RuntimeError):
+    """Raised when the parser queue is full and a file cannot be admitted"""
+
+
+def get_loader(file_path: str, extension: str):
+    try:
+        if extension == '.pdf':
+            return PyPDFLoader(file_path)
+        elif extension == '.docx':
+            return Docx2txtLoader(file_path)
+        elif extension == '.pptx':
+            return UnstructuredPowerPointLoader(file_path)
+        elif extension == '.txt':
+            return TextLoader(file_path)
+        else:
+            raise ValueError(f"Unsupported file type: {extension}")
+    except Exception as e:
+        logging.error(f"Error creating loader for {extension}: {str(e)}")
+        raise
+
+
+def _plain_metadata(metadata: dict) -> dict:
+    return {
+        key: value for key, value in metadata.items()
+        if isinstance(value, (str, int, float, bool))
+    }
+
+
+def load_and_split(file_path: str, extension: str, text_splitter) -> Tuple[List[ParsedChunk], float, float]:
+    """Parse and split a file; runs inside a worker process.
+
+    Returns the chunks with the parse and split times, since metrics can't be
+    recorded from the worker.
+    """
+    start = time.perf_counter()
+    documents = get_loader(file_path, extension).load()
+    parsed = time.perf_counter()
+    for number, document in enumerate(documents):
+        document.metadata.setdefault("page", number)
+    splits = text_splitter.split_documents(documents)
+    chunks = [(split.page_content, _plain_metadata(split.metadata)) for split in splits]
+    return chunks, parsed - start, time.perf_counter() - parsed
+
+
+def iter_split_pages(file_path: str, extension: str, text_splitter) -> Iterator[List[Document]]:
+    """Lazily parse a file page by page (or section by section), yielding each page's splits"""
+    pages = enumerate(get_loader(file_path, extension).lazy_load())
+    while True:
+        with metrics.span("parse"):
+            number, page = next(pages, (None, None))
+        if page is None:
+            return
+        page.metadata.setdefault("page", number)
+        with metrics.span("split"):
+            splits = text_splitter.split_documents([page])
+        yield splits
+
+
+def _ready() -> bool:
+    """Run once in a new worker, so importing the parsers isn't counted against a file's timeout"""
+    return True
+
+
+class ParserPool:
+    """Runs CPU-bound parsing and splitting in worker processes with a bounded queue.
+
+    Each worker process parses one file at a time, so a parse that runs past the
+    timeout can be stopped by terminating its process; the worker's slot is only
+    given to the next file once that process has exited.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queued: int = 8, timeout: float = 120.0):
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._slots = asyncio.Semaphore(max(max_workers, 1))
+        self._idle: List[multiprocessing.pool.Pool] = []
+        self._workers: Set[multiprocessing.pool.Pool] = set()
+        self._admitted = 0
+
+    def _start_worker(self) -> multiprocessing.pool.Pool:
+        # spawn keeps network clients and their threads out of the children
+        worker = self._context.Pool(processes=1)
+        self._workers.add(worker)
+        worker.apply(_ready)
+        return worker
+
+    def _terminate(self, worker: multiprocessing.pool.Pool) -> None:
+        self._workers.discard(worker)
+        worker.terminate()
+        worker.join()
+
+    async def _run_in_worker(self, *args) -> Tuple[List[ParsedChunk], float, float]:
+        async with self._slots:
+            worker = self._idle.pop() if self._idle else await run_in_threadpool(self._start_worker)
+            loop = asyncio.get_running_loop()
+            done = loop.create_future()
+
+            def settle(method: str, value) -> None:
+                # Called on the pool's result thread
+                loop.call_soon_threadsafe(lambda: done.done() or getattr(done, method)(value))
+
+            worker.apply_async(
+                load_and_split, args,
+                callback=lambda value: settle("set_result", value),
+                error_callback=lambda error: settle("set_exception", error)
+            )
+            try:
+                # Timed from here, once a worker is free, so time spent queued doesn't count
+                result = await asyncio.wait_for(done, timeout=self.timeout)
+            except asyncio.TimeoutError:
+                logging.error(f"Parsing {args[0]} exceeded {self.timeout}s, terminating its worker")
+                await run_in_threadpool(self._terminate, worker)
+                raise TimeoutError(f"Document parsing timed out after {self.timeout:.0f} seconds")
+            except asyncio.CancelledError:
+                # Nobody is waiting for the result any more; don't let the parse hold the worker
+                await run_in_threadpool(self._terminate, worker)
+                raise
+            except Exception:
+                self._idle.append(worker)
+                raise
+            self._idle.append(worker)
+            return result
+
+    @asynccontextmanager
+    async def _admit(self):
+        if self._admitted >= self.max_workers + self.max_queued:
+            raise ParserBusyError("Too many documents are being processed, please retry shortly")
+        self._admitted += 1
+        try:
+            yield
+        finally:
+            self._admitted -= 1
+
+    async def parse(self, file_path: str, extension: str, text_splitter) -> List[Document]:
+        async with self._admit():
+            if self.max_workers == 0:
+                # Threads can't be stopped, so in-process parsing runs without the timeout
+                parsed, parse_seconds, split_seconds = await run_in_threadpool(
+                    load_and_split, file_path, extension, text_splitter
+                )
+            else:
+                parsed, parse_seconds, split_seconds = await self._run_in_worker(
+                    file_path, extension, text_splitter
+                )
+
+        metrics.observe("parse", parse_seconds)
+        metrics.observe("split", split_seconds)
+        return [Document(page_content=text, metadata=metadata) for text, metadata in parsed]
+
+    async def stream(self, file_path: str, extension: str, text_splitter) -> AsyncIterator[List[Document]]:
+        """Yield each page's splits, parsed on a thread under the same admission and worker limits.
+
+        A thread can't be stopped mid-page, so the timeout is checked between pages.
+        """
+        async with self._admit():
+            async with self._slots if self.max_workers else nullcontext():
+                start = time.monotonic()
+                async for page_splits in iterate_in_threadpool(iter_split_pages(file_path, extension, text_splitter)):
+                    yield page_splits
+                    if time.monotonic() - start > self.timeout:
+                        logging.error(f"Parsing {file_path} exceeded {self.timeout}s")
+                        raise TimeoutError(f"Document parsing timed out after {self.timeout:.0f} seconds")
+
+    def shutdown(self) -> None:
+        """Stop every worker process, including any still parsing"""
+        for worker in list(self._workers):
+            self._terminate(worker)
+        self._idle.clear()
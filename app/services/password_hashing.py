@@ -0,0 +1,78 @@
+from passlib.context import CryptContext
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Callable, Optional, Tuple
+import asyncio
+from app.core import metrics
+from app.core.config import settings
+
+# Hashes below BCRYPT_ROUNDS (or from a deprecated scheme) are flagged for an upgrade
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=settings.BCRYPT_ROUNDS,
+    bcrypt__min_rounds=settings.BCRYPT_ROUNDS
+)
+
+
+class PasswordHasherBusyError(RuntimeError):
+    """Raised when every hashing slot is taken and a request cannot be admitted"""
+
+
+class PasswordHasher:
+    """Runs bcrypt on its own small thread pool with a bounded queue.
+
+    bcrypt releases the GIL, so threads hash in parallel, but each hash is
+    deliberately slow. Keeping them off the shared threadpool means a login storm
+    can't starve chat and upload requests; beyond the queue limit callers are
+    turned away immediately instead of waiting.
+    """
+
+    def __init__(self, context: CryptContext = pwd_context, max_workers: int = 2, max_queued: int = 16):
+        self.context = context
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="password-hash")
+        self._admitted = 0
+        self.rejected = 0
+
+    async def _run(self, stage: str, function: Callable, *args):
+        if self._admitted >= self.max_workers + self.max_queued:
+            # Counted rather than logged: during a storm this happens many times a second
+            self.rejected += 1
+            raise PasswordHasherBusyError("Too many sign-in requests, please retry shortly")
+
+        self._admitted += 1
+        try:
+            with metrics.span(stage):
+                return await asyncio.get_running_loop().run_in_executor(self._executor, function, *args)
+        finally:
+            self._admitted -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run("password_hash", self.context.hash, password)
+
+    async def verify_and_update(self, password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+        """Return (valid, replacement hash if the stored one uses outdated parameters)"""
+        return await self._run("password_verify", self.context.verify_and_update, password, hashed_password)
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": self._admitted,
+            "max_workers": self.max_workers,
+            "max_queued": self.max_queued,
+            "rejected": self.rejected
+        }
+
+    def shutdown(self) -> None:
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+@lru_cache
+def get_password_hasher() -> PasswordHasher:
+    hasher = PasswordHasher(
+        max_workers=settings.PASSWORD_HASH_WORKERS,
+        max_queued=settings.PASSWORD_HASH_QUEUE_SIZE
+    )
+    metrics.register_collector("password_hasher", hasher.stats)
+    return hasher
@@ -0,0 +1,95 @@
+from sqlalchemy import event, inspect
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+import threading
+import time
+from app.core import metrics
+from app.core.config import settings
+from app.db.models import User as UserModel
+from app.schemas import User
+
+
+class PrincipalCache:
+    """Short-TTL LRU cache of verified users keyed by token subject (the email).
+
+    Entries are dropped in-process whenever a user row is updated or deleted. Other
+    worker processes only see the change once the entry expires, so the TTL bounds
+    how long a deactivated user keeps access there.
+    """
+
+    def __init__(self, max_entries: int = 10_000, ttl: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, Tuple[User, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl > 0 and self.max_entries > 0
+
+    def get(self, subject: str) -> Optional[User]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            entry = self._entries.get(subject)
+            if entry is None or time.monotonic() - entry[1] > self.ttl:
+                if entry is not None:
+                    del self._entries[subject]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(subject)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, subject: str, user: User) -> None:
+        if not self.enabled:
+            return
+        with self._lock:
+            self._entries[subject] = (user, time.monotonic())
+            self._entries.move_to_end(subject)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, subject: str) -> None:
+        with self._lock:
+            if self._entries.pop(subject, None) is not None:
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "hit_ratio": self.hits / lookups if lookups else 0.0
+        }
+
+
+@lru_cache
+def get_principal_cache() -> PrincipalCache:
+    cache = PrincipalCache(
+        max_entries=settings.AUTH_CACHE_MAX_ENTRIES,
+        ttl=settings.AUTH_CACHE_TTL
+    )
+    metrics.register_collector("principal_cache", cache.stats)
+    return cache
+
+
+@event.listens_for(UserModel, "after_update")
+@event.listens_for(UserModel, "after_delete")
+def _invalidate_changed_user(mapper, connection, target: UserModel) -> None:
+    cache = get_principal_cache()
+    cache.invalidate(target.email)
+    # A changed email also retires the old subject
+    for email in inspect(target).attrs.email.history.deleted:
+        cache.invalidate(email)
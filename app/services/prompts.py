@@ -52,3 +52,22 @@ Instructions:
 Summary:""",
     input_variables=["content"]
 )
+
+# History Summary Prompt
+HISTORY_SUMMARY_PROMPT = PromptTemplate(
+    template="""Progressively summarize the conversation between a user and DocMind, adding onto the previous summary and returning a new summary.
+
+Current summary:
+{summary}
+
+New lines of conversation:
+{new_lines}
+
+Instructions:
+1. Keep names, document references, figures and open questions the user may refer back to.
+2. Drop greetings and pleasantries.
+3. Be concise.
+
+New summary:""",
+    input_variables=["summary", "new_lines"]
+)
@@ -0,0 +1,45 @@
+from typing import List
+import re
+
+WORD_PATTERN = re.compile(r"[a-z0-9']+")
+
+# A message made only of these words, with at least one greeting word, is small talk
+GREETING_WORDS = frozenset(
+    "hi hello hey hiya howdy greetings yo thanks thank thx ty cheers bye goodbye "
+    "morning afternoon evening night ok okay cool great nice awesome".split()
+)
+SMALL_TALK_WORDS = GREETING_WORDS | frozenset(
+    "there all everyone folks you so much very good how are is it going doing what's "
+    "up a lot again and see later docmind".split()
+)
+
+# Words that usually point back at an earlier turn ("what about its fees?")
+REFERENCE_WORDS = frozenset(
+    "it its it's this that these those they them their theirs he him his she her "
+    "former latter above previous same also else more one ones".split()
+)
+FOLLOW_UP_OPENERS = ("and ", "but ", "so ", "what about", "how about", "why not", "then ")
+MIN_STANDALONE_WORDS = 4
+
+
+def words(text: str) -> List[str]:
+    return WORD_PATTERN.findall(text.lower())
+
+
+def is_small_talk(query: str) -> bool:
+    """Greetings, thanks and goodbyes that need no document context"""
+    terms = words(query)
+    if not terms or len(terms) > 6:
+        return False
+    return all(term in SMALL_TALK_WORDS for term in terms) and any(term in GREETING_WORDS for term in terms)
+
+
+def is_standalone(query: str) -> bool:
+    """True when the query can be retrieved for as-is, without rewriting it against the chat history"""
+    text = query.strip().lower()
+    if text.startswith(FOLLOW_UP_OPENERS):
+        return False
+    terms = words(text)
+    if len(terms) < MIN_STANDALONE_WORDS:
+        return False
+    return not any(term in REFERENCE_WORDS for term in terms)
@@ -0,0 +1,126 @@
+from langchain_core.callbacks import (
+    AsyncCallbackManagerForRetrieverRun,
+    CallbackManagerForRetrieverRun
+)
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from fastapi.concurrency import run_in_threadpool
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from app.services.keyword_index import KeywordIndex, tokenize
+
+
+def _doc_key(doc: Document) -> str:
+    return doc.metadata.get("chunk_id") or getattr(doc, "id", None) or doc.page_content
+
+
+def reciprocal_rank_fusion(rankings: List[List[Document]], k: int, rrf_k: int = 60) -> List[Document]:
+    """Merge ranked lists by summing 1 / (rrf_k + rank) for each document"""
+    scores: Dict[str, float] = {}
+    docs: Dict[str, Document] = {}
+    for ranking in rankings:
+        for rank, doc in enumerate(ranking, start=1):
+            key = _doc_key(doc)
+            docs.setdefault(key, doc)
+            scores[key] = scores.get(key, 0.0) + 1.0 / (rrf_k + rank)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
+
+
+def search_by_vectors(vectorstore: Any, vectors: List[List[float]], k: int) -> List[List[Document]]:
+    """Nearest chunks for several query embeddings, in one collection query"""
+    if not vectors:
+        return []
+    search_by_vectors = getattr(vectorstore, "similarity_search_by_vectors", None)
+    if search_by_vectors is not None:
+        # The compact index scores every query in one matmul
+        return search_by_vectors(vectors, k)
+    results = vectorstore._collection.query(
+        query_embeddings=vectors, n_results=k, include=["documents", "metadatas"]
+    )
+    return [
+        [
+            Document(page_content=text, metadata={**(metadata or {}), "chunk_id": chunk_id})
+            for chunk_id, text, metadata in zip(ids, texts, metadatas)
+        ]
+        for ids, texts, metadatas in zip(results["ids"], results["documents"], results["metadatas"])
+    ]
+
+
+class HybridRetriever(BaseRetriever):
+    """BM25 keyword search fused with vector search, with a keyword-only fast path.
+
+    The fast path skips the query embedding entirely when the query contains an
+    identifier-like term (one with a digit, e.g. a clause number or SKU) and the
+    best keyword hit scores above fast_path_confidence of the achievable maximum.
+    """
+
+    vectorstore: Any
+    keyword_index: KeywordIndex
+    k: int = 4
+    candidates: int = 20
+    rrf_k: int = 60
+    fast_path_confidence: Optional[float] = None
+
+    def _keyword_docs(self, query: str) -> Tuple[List[Document], List[Tuple[str, float]]]:
+        hits = self.keyword_index.search(query, self.candidates)
+        found = self.keyword_index.documents(chunk_id for chunk_id, _ in hits)
+        # Chunks removed by a concurrent write since the search are dropped
+        hits = [(chunk_id, score) for chunk_id, score in hits if chunk_id in found]
+        docs = [
+            Document(page_content=found[chunk_id][0], metadata={**found[chunk_id][1], "chunk_id": chunk_id})
+            for chunk_id, _ in hits
+        ]
+        return docs, hits
+
+    def _keyword_search(self, query: str) -> Tuple[List[Document], bool]:
+        """Keyword hits as documents, and whether they are confident enough to skip vector search"""
+        docs, hits = self._keyword_docs(query)
+        return docs, self._use_fast_path(query, hits)
+
+    def _use_fast_path(self, query: str, hits: List[Tuple[str, float]]) -> bool:
+        if self.fast_path_confidence is None or not hits:
+            return False
+        if not any(any(ch.isdigit() for ch in term) for term in tokenize(query)):
+            return False
+        return self.keyword_index.confidence(query, hits[0][1]) >= self.fast_path_confidence
+
+    def _get_relevant_documents(
+        self, query: str, *, run_manager: CallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        keyword_docs, hits = self._keyword_docs(query)
+        if self._use_fast_path(query, hits):
+            return keyword_docs[:self.k]
+        vector_docs = self.vectorstore.similarity_search(query, k=self.candidates)
+        return reciprocal_rank_fusion([vector_docs, keyword_docs], self.k, self.rrf_k)
+
+    async def _aget_relevant_documents(
+        self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun
+    ) -> List[Document]:
+        # SQLite reads, kept off the event loop
+        keyword_docs, fast = await run_in_threadpool(self._keyword_search, query)
+        if fast:
+            return keyword_docs[:self.k]
+        vector_docs = await self.vectorstore.asimilarity_search(query, k=self.candidates)
+        return reciprocal_rank_fusion([vector_docs, keyword_docs], self.k, self.rrf_k)
+
+    def search_batch(
+        self, queries: List[str], embed: Callable[[List[str]], List[List[float]]]
+    ) -> List[List[Document]]:
+        """Retrieve for several queries, embedding only those that miss the fast path, in one call"""
+        keyword_results = [self._keyword_docs(query) for query in queries]
+        results: List[Optional[List[Document]]] = [None] * len(queries)
+        pending = []
+        for position, (query, (keyword_docs, hits)) in enumerate(zip(queries, keyword_results)):
+            if self._use_fast_path(query, hits):
+                results[position] = keyword_docs[:self.k]
+            else:
+                pending.append(position)
+
+        if pending:
+            vectors = embed([queries[position] for position in pending])
+            vector_results = search_by_vectors(self.vectorstore, vectors, self.candidates)
+            for position, vector_docs in zip(pending, vector_results):
+                results[position] = reciprocal_rank_fusion(
+                    [vector_docs, keyword_results[position][0]], self.k, self.rrf_k
+                )
+        return results
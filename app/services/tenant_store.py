@@ -0,0 +1,100 @@
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+TENANT_KEY = "user_id"
+
+
+def tenant_filter(user_id: str, where: Optional[Dict] = None) -> Dict:
+    """A Chroma where clause limited to one tenant"""
+    if not where:
+        return {TENANT_KEY: user_id}
+    return {"$and": [{TENANT_KEY: user_id}, where]}
+
+
+class TenantCollection:
+    """The subset of the Chroma collection API the app uses, scoped to one tenant"""
+
+    def __init__(self, collection, user_id: str):
+        self.collection = collection
+        self.user_id = user_id
+
+    def _tag(self, metadatas: Optional[List[Dict]], count: int) -> List[Dict]:
+        return [{**(metadata or {}), TENANT_KEY: self.user_id} for metadata in (metadatas or [{}] * count)]
+
+    def upsert(self, ids: List[str], metadatas: Optional[List[Dict]] = None, **kwargs) -> None:
+        self.collection.upsert(ids=ids, metadatas=self._tag(metadatas, len(ids)), **kwargs)
+
+    def add(self, ids: List[str], metadatas: Optional[List[Dict]] = None, **kwargs) -> None:
+        self.collection.add(ids=ids, metadatas=self._tag(metadatas, len(ids)), **kwargs)
+
+    def update(self, ids: List[str], metadatas: Optional[List[Dict]] = None, **kwargs) -> None:
+        self.collection.update(ids=ids, metadatas=self._tag(metadatas, len(ids)) if metadatas else None, **kwargs)
+
+    def get(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None, **kwargs) -> Dict:
+        return self.collection.get(ids=ids, where=tenant_filter(self.user_id, where), **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, where: Optional[Dict] = None) -> None:
+        self.collection.delete(ids=ids, where=tenant_filter(self.user_id, where))
+
+    def query(self, where: Optional[Dict] = None, **kwargs) -> Dict:
+        return self.collection.query(where=tenant_filter(self.user_id, where), **kwargs)
+
+    def count(self, limit: Optional[int] = None) -> int:
+        """The tenant's chunk count, or at most limit; counting lists their ids, so pass one when you can"""
+        return len(self.get(include=[], limit=limit)["ids"])
+
+
+class TenantVectorStore(VectorStore):
+    """One user's view of a shared Chroma collection; every read and write carries their user_id"""
+
+    def __init__(self, store: Chroma, user_id: str):
+        self.store = store
+        self.user_id = user_id
+        self._collection = TenantCollection(store._collection, user_id)
+
+    @property
+    def embeddings(self) -> Optional[Embeddings]:
+        return self.store.embeddings
+
+    def add_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[Dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any
+    ) -> List[str]:
+        texts = list(texts)
+        metadatas = [{**(metadata or {}), TENANT_KEY: self.user_id} for metadata in (metadatas or [{}] * len(texts))]
+        return self.store.add_texts(texts, metadatas=metadatas, ids=ids, **kwargs)
+
+    def delete(self, ids: Optional[List[str]] = None, **kwargs: Any) -> None:
+        self._collection.delete(ids=ids)
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return self.store.similarity_search(query, k=k, filter=tenant_filter(self.user_id, filter), **kwargs)
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        return self.store.similarity_search_with_score(
+            query, k=k, filter=tenant_filter(self.user_id, filter), **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return self.store.similarity_search_by_vector(
+            embedding, k=k, filter=tenant_filter(self.user_id, filter), **kwargs
+        )
+
+    def _select_relevance_score_fn(self):
+        return self.store._select_relevance_score_fn()
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Tenant stores are opened from the vectorstore pool")
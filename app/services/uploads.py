@@ -0,0 +1,151 @@
+from fastapi import UploadFile, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from typing import Collection, List, NamedTuple, Optional
+import hashlib
+import os
+import tempfile
+import zipfile
+import logging
+
+
+class SpooledUpload(NamedTuple):
+    path: str
+    size: int
+    sha256: str
+
+
+def _too_large(max_size: int) -> HTTPException:
+    return HTTPException(
+        status_code=413,
+        detail=f"File exceeds the maximum upload size of {max_size // (1024 * 1024)}MB"
+    )
+
+
+async def spool_upload(
+    file: UploadFile,
+    suffix: str,
+    max_size: int,
+    chunk_size: int = 1024 * 1024,
+    directory: Optional[str] = None
+) -> SpooledUpload:
+    """Stream an upload to disk in fixed-size chunks, hashing it and enforcing max_size.
+
+    By now Starlette has received the whole request; RequestSizeLimitMiddleware is
+    what stops an oversized body early. This enforces the per-file limit.
+    """
+    # Starlette knows the size of fully received multipart files, so reject those up front
+    if file.size is not None and file.size > max_size:
+        raise _too_large(max_size)
+
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    digest = hashlib.sha256()
+    size = 0
+    fd, path = tempfile.mkstemp(suffix=suffix, dir=directory)
+    try:
+        with os.fdopen(fd, "wb") as out:
+            while True:
+                chunk = await file.read(chunk_size)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > max_size:
+                    raise _too_large(max_size)
+                digest.update(chunk)
+                await run_in_threadpool(out.write, chunk)
+
+        if size == 0:
+            raise ValueError("Empty file uploaded")
+    except BaseException:
+        os.unlink(path)
+        raise
+
+    logging.info(f"Spooled {size} bytes of {file.filename} to {path}")
+    return SpooledUpload(path=path, size=size, sha256=digest.hexdigest())
+
+
+class ReceivedFile(NamedTuple):
+    """One file of a bulk upload: spooled to disk, or rejected with an error"""
+    filename: str  # for archive members, their path inside the archive
+    upload: Optional[SpooledUpload]
+    error: Optional[str] = None
+
+
+def extract_zip(
+    path: str,
+    extensions: Collection[str],
+    max_size: int,
+    max_files: int,
+    max_total_size: int,
+    directory: Optional[str] = None,
+    chunk_size: int = 1024 * 1024
+) -> List[ReceivedFile]:
+    """Spool each file in a ZIP archive to its own temp file, hashing it like an upload.
+
+    Members are never written under their archive path, so "../" entries can't
+    escape directory. Unsupported or oversized members are returned with an
+    error instead of being extracted; too many members or too much data in total
+    rejects the archive. Runs in the threadpool.
+    """
+    members: List[ReceivedFile] = []
+    total = 0
+    try:
+        archive = zipfile.ZipFile(path)
+    except zipfile.BadZipFile:
+        raise ValueError("Not a valid ZIP archive")
+    try:
+        with archive:
+            infos = [
+                info for info in archive.infolist()
+                if not info.is_dir() and not info.filename.startswith("__MACOSX/")
+                and not os.path.basename(info.filename).startswith(".")
+            ]
+            if len(infos) > max_files:
+                raise ValueError(f"Archive holds {len(infos)} files; at most {max_files} are accepted per upload")
+            for info in infos:
+                extension = os.path.splitext(info.filename)[1].lower()
+                if extension not in extensions:
+                    members.append(ReceivedFile(info.filename, None, f"Unsupported file type: {extension or 'none'}"))
+                    continue
+                # Sizes in the directory can be forged, so they are enforced again while reading
+                if info.file_size > max_size:
+                    members.append(ReceivedFile(info.filename, None, str(_too_large(max_size).detail)))
+                    continue
+                digest = hashlib.sha256()
+                size = 0
+                fd, member_path = tempfile.mkstemp(suffix=extension, dir=directory)
+                try:
+                    with os.fdopen(fd, "wb") as out, archive.open(info) as source:
+                        for block in iter(lambda: source.read(chunk_size), b""):
+                            size += len(block)
+                            total += len(block)
+                            if size > max_size:
+                                raise _too_large(max_size)
+                            if total > max_total_size:
+                                raise ValueError(
+                                    f"Archive expands to more than {max_total_size // (1024 * 1024)}MB"
+                                )
+                            digest.update(block)
+                            out.write(block)
+                except HTTPException as e:
+                    os.unlink(member_path)
+                    members.append(ReceivedFile(info.filename, None, str(e.detail)))
+                    continue
+                except BaseException:
+                    os.unlink(member_path)
+                    raise
+                if size == 0:
+                    os.unlink(member_path)
+                    members.append(ReceivedFile(info.filename, None, "Empty file uploaded"))
+                    continue
+                members.append(ReceivedFile(info.filename, SpooledUpload(member_path, size, digest.hexdigest())))
+    except BaseException:
+        for member in members:
+            if member.upload is not None and os.path.exists(member.upload.path):
+                os.unlink(member.upload.path)
+        raise
+
+    extracted = sum(member.upload is not None for member in members)
+    logging.info(f"Extracted {extracted} of {len(members)} files from {path}")
+    return members
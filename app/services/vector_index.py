@@ -0,0 +1,322 @@
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+from langchain_core.vectorstores import VectorStore
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+import json
+import os
+import threading
+import uuid
+import numpy as np
+import logging
+from app.services.keyword_index import KeywordIndex
+
+FLOAT16 = "float16"
+INT8 = "int8"
+# Rows upcast to float32 per matmul, bounding the temporary; small tenants are scored in one block
+SEARCH_BLOCK_ROWS = 8192
+# Share of removed rows at which save() rewrites the matrix without them instead of appending
+COMPACT_REMOVED_FRACTION = 0.25
+
+
+class CompactVectorIndex:
+    """A user's chunk embeddings as one quantized matrix, memory-mapped from disk and searched by brute force.
+
+    Rows are L2-normalized before quantizing, so scores are cosine similarities.
+    float16 halves the size of float32 embeddings; int8 quarters it, storing each
+    row as round(v / scale) with a per-row scale. The matrix file is append-only:
+    added rows collect in memory until save() appends them, and removed rows are
+    only marked in the header until enough of them pile up for save() to rewrite
+    the file, a block at a time. The per-row scales are kept in memory.
+    """
+
+    def __init__(self, path: Optional[str] = None, dtype: str = FLOAT16):
+        if dtype not in (FLOAT16, INT8):
+            raise ValueError(f"Unknown COMPACT_INDEX_DTYPE: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.dimensions: Optional[int] = None
+        # Chunk id per row, None for removed rows
+        self.ids: List[Optional[str]] = []
+        self._positions: Dict[str, int] = {}
+        self._removed = np.empty(0, dtype=np.int64)
+        self._matrix: Optional[np.ndarray] = None
+        self._scales: Optional[np.ndarray] = None
+        self._pending: List[np.ndarray] = []
+        self._files: List[str] = []
+        self._lock = threading.RLock()
+
+    def __len__(self) -> int:
+        return len(self._positions)
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            rows = (len(self._matrix) if self._matrix is not None else 0) + sum(len(rows) for rows in self._pending)
+            scales = self._scales.nbytes if self._scales is not None else 0
+            return rows * (self.dimensions or 0) * np.dtype(self.dtype).itemsize + scales
+
+    def _quantize(self, vectors: Sequence[Sequence[float]]) -> Tuple[np.ndarray, Optional[np.ndarray]]:
+        matrix = np.array(vectors, dtype=np.float32)
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        matrix /= np.where(norms == 0, 1.0, norms)
+        if self.dtype == FLOAT16:
+            return matrix.astype(np.float16), None
+        scales = np.abs(matrix).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        return np.rint(matrix / scales[:, None]).astype(np.int8), scales.astype(np.float32)
+
+    def _blocks(self, matrix: Optional[np.ndarray], pending: List[np.ndarray]) -> Iterator[Tuple[int, np.ndarray]]:
+        """(first row, rows) over the saved matrix in SEARCH_BLOCK_ROWS blocks, then the unsaved rows"""
+        start = 0
+        if matrix is not None:
+            for start in range(0, len(matrix), SEARCH_BLOCK_ROWS):
+                yield start, matrix[start:start + SEARCH_BLOCK_ROWS]
+            start = len(matrix)
+        for rows in pending:
+            yield start, rows
+            start += len(rows)
+
+    def add(self, ids: List[str], vectors: Sequence[Sequence[float]]) -> None:
+        if not ids:
+            return
+        rows, scales = self._quantize(vectors)
+        with self._lock:
+            if self.dimensions is None:
+                self.dimensions = rows.shape[1]
+            elif rows.shape[1] != self.dimensions:
+                raise ValueError(f"Expected {self.dimensions}-dimensional embeddings, got {rows.shape[1]}")
+            self._remove(ids)
+            self._pending = self._pending + [rows]
+            if scales is not None:
+                self._scales = scales if self._scales is None else np.concatenate([self._scales, scales])
+            # Replaced rather than appended to, so searches holding the old list stay consistent
+            self.ids = self.ids + list(ids)
+            for position, chunk_id in enumerate(ids, start=len(self.ids) - len(ids)):
+                self._positions[chunk_id] = position
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            self._remove(ids)
+
+    def _remove(self, ids: Iterable[str]) -> None:
+        drop = [self._positions.pop(chunk_id) for chunk_id in ids if chunk_id in self._positions]
+        if not drop:
+            return
+        self.ids = list(self.ids)
+        for position in drop:
+            self.ids[position] = None
+        self._removed = np.concatenate([self._removed, np.array(drop, dtype=np.int64)])
+
+    def search_many(self, vectors: Sequence[Sequence[float]], k: int = 4) -> List[List[Tuple[str, float]]]:
+        """Top-k (chunk_id, cosine similarity) pairs for each query vector"""
+        with self._lock:
+            matrix, pending, scales = self._matrix, self._pending, self._scales
+            ids, removed, live = self.ids, self._removed, len(self._positions)
+        queries = np.array(vectors, dtype=np.float32).reshape(len(vectors), -1)
+        if not live:
+            return [[] for _ in range(len(queries))]
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries /= np.where(norms == 0, 1.0, norms)
+
+        scores = np.empty((len(queries), len(ids)), dtype=np.float32)
+        for start, rows in self._blocks(matrix, pending):
+            block = np.asarray(rows, dtype=np.float32)
+            scores[:, start:start + len(block)] = queries @ block.T
+        if scales is not None:
+            scores *= scales
+        scores[:, removed] = -np.inf
+
+        k = min(k, live)
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        results = []
+        for row, candidates in zip(scores, top):
+            ranked = candidates[np.argsort(-row[candidates])]
+            results.append([(ids[position], float(row[position])) for position in ranked])
+        return results
+
+    def search(self, vector: Sequence[float], k: int = 4) -> List[Tuple[str, float]]:
+        return self.search_many([vector], k)[0]
+
+    def _row_bytes(self) -> int:
+        return (self.dimensions or 0) * np.dtype(self.dtype).itemsize
+
+    def _append(self, directory: str, name: str, rows: int, pending: List[np.ndarray]) -> None:
+        with open(os.path.join(directory, name), "r+b") as f:
+            # Drops rows from a save that failed before its header was written
+            f.truncate(rows * self._row_bytes())
+            f.seek(0, os.SEEK_END)
+            for block in pending:
+                f.write(block.tobytes())
+
+    def _rewrite(self, directory: str, name: str) -> None:
+        """Write the rows that haven't been removed to a new matrix file, a block at a time"""
+        removed = np.zeros(len(self.ids), dtype=bool)
+        removed[self._removed] = True
+        with open(os.path.join(directory, name), "wb") as f:
+            for start, rows in self._blocks(self._matrix, self._pending):
+                f.write(np.ascontiguousarray(rows[~removed[start:start + len(rows)]]).tobytes())
+        if self._scales is not None:
+            self._scales = self._scales[~removed]
+        self.ids = [chunk_id for chunk_id in self.ids if chunk_id is not None]
+        self._positions = {chunk_id: position for position, chunk_id in enumerate(self.ids)}
+        self._removed = np.empty(0, dtype=np.int64)
+
+    def _map(self, directory: str, name: str, rows: int) -> Optional[np.ndarray]:
+        if not rows:
+            return None
+        return np.memmap(os.path.join(directory, name), dtype=self.dtype, mode="r", shape=(rows, self.dimensions))
+
+    def save(self) -> None:
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        with self._lock:
+            previous = list(self._files)
+            matrix_file = next((name for name in previous if name.startswith("vectors-")), None)
+            rows = len(self.ids)
+            files = {}
+            # .npy matrices from before the append-only format are rewritten once
+            rewrite = matrix_file is None or matrix_file.endswith(".npy")
+            if rewrite or len(self._removed) > rows * COMPACT_REMOVED_FRACTION:
+                # A new file, so readers of the old header keep their mapping
+                files["matrix"] = f"vectors-{uuid.uuid4().hex[:12]}.bin"
+                self._rewrite(directory, files["matrix"])
+                rows = len(self.ids)
+            else:
+                files["matrix"] = matrix_file
+                if self._pending:
+                    saved = len(self._matrix) if self._matrix is not None else 0
+                    self._append(directory, matrix_file, saved, self._pending)
+            if self._scales is not None:
+                # Small next to the matrix, so written whole
+                files["scales"] = f"scales-{uuid.uuid4().hex[:12]}.npy"
+                np.save(os.path.join(directory, files["scales"]), self._scales)
+            header = {
+                "dtype": self.dtype, "dimensions": self.dimensions, "rows": rows, "ids": self.ids, **files
+            }
+            temp_path = f"{self.path}.tmp"
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(header, f)
+            os.replace(temp_path, self.path)
+
+            self._files = list(files.values())
+            self._matrix = self._map(directory, files["matrix"], rows)
+            self._pending = []
+        for name in previous:
+            if name in self._files:
+                continue
+            try:
+                os.unlink(os.path.join(directory, name))
+            except FileNotFoundError:
+                pass
+
+    def delete_files(self) -> None:
+        """Remove the header and matrix files; the in-memory index stays usable"""
+        if not self.path:
+            return
+        directory = os.path.dirname(self.path)
+        with self._lock:
+            names, self._files = self._files, []
+        for path in [self.path] + [os.path.join(directory, name) for name in names]:
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+    @classmethod
+    def load(cls, path: str) -> "CompactVectorIndex":
+        with open(path, encoding="utf-8") as f:
+            header = json.load(f)
+        index = cls(path, header["dtype"])
+        index.dimensions = header["dimensions"]
+        index.ids = header["ids"]
+        index._positions = {chunk_id: position for position, chunk_id in enumerate(index.ids) if chunk_id is not None}
+        index._removed = np.array(
+            [position for position, chunk_id in enumerate(index.ids) if chunk_id is None], dtype=np.int64
+        )
+        directory = os.path.dirname(path)
+        if "matrix" in header:
+            index._files.append(header["matrix"])
+            if header["matrix"].endswith(".npy"):
+                index._matrix = np.load(os.path.join(directory, header["matrix"]), mmap_mode="r")
+            else:
+                index._matrix = index._map(directory, header["matrix"], header["rows"])
+            if "scales" in header:
+                index._scales = np.load(os.path.join(directory, header["scales"]))
+                index._files.append(header["scales"])
+            rows = len(index._matrix) if index._matrix is not None else 0
+            if rows != len(index.ids):
+                raise ValueError(f"{path} lists {len(index.ids)} ids for {rows} rows")
+        return index
+
+    @classmethod
+    def from_collection(cls, path: str, collection, dtype: str = FLOAT16) -> "CompactVectorIndex":
+        """Build an index from the embeddings already stored in a Chroma collection"""
+        index = cls(path, dtype)
+        records = collection.get(include=["embeddings"])
+        if len(records["ids"]):
+            index.add(records["ids"], records["embeddings"])
+        index.save()
+        logging.info(f"Built {dtype} compact vector index with {len(index)} chunks at {path}")
+        return index
+
+
+class CompactVectorStore(VectorStore):
+    """Read-only search over a CompactVectorIndex, with chunk text and metadata from the keyword index.
+
+    Writes still go to Chroma, which stays the source of truth; ingestion keeps
+    the compact index in step with it.
+    """
+
+    def __init__(self, index: CompactVectorIndex, documents: KeywordIndex, embeddings: Embeddings):
+        self.index = index
+        self.documents = documents
+        self._embeddings = embeddings
+
+    @property
+    def embeddings(self) -> Embeddings:
+        return self._embeddings
+
+    def _to_documents(self, hits: List[Tuple[str, float]]) -> List[Tuple[Document, float]]:
+        found = self.documents.documents(chunk_id for chunk_id, _ in hits)
+        results = []
+        for chunk_id, score in hits:
+            if chunk_id not in found:
+                # Removed from the keyword index by a concurrent write
+                continue
+            text, metadata = found[chunk_id]
+            results.append((Document(page_content=text, metadata={**metadata, "chunk_id": chunk_id}), score))
+        return results
+
+    def similarity_search_by_vectors(self, vectors: List[List[float]], k: int = 4) -> List[List[Document]]:
+        return [[doc for doc, _ in self._to_documents(hits)] for hits in self.index.search_many(vectors, k)]
+
+    def similarity_search_with_score(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        if filter:
+            raise NotImplementedError("The compact vector index does not support metadata filters")
+        return self._to_documents(self.index.search(self.embeddings.embed_query(query), k))
+
+    def similarity_search_by_vector(
+        self, embedding: List[float], k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        if filter:
+            raise NotImplementedError("The compact vector index does not support metadata filters")
+        return [doc for doc, _ in self._to_documents(self.index.search(embedding, k))]
+
+    def similarity_search(
+        self, query: str, k: int = 4, filter: Optional[Dict] = None, **kwargs: Any
+    ) -> List[Document]:
+        return [doc for doc, _ in self.similarity_search_with_score(query, k, filter, **kwargs)]
+
+    def _select_relevance_score_fn(self):
+        # Scores are already cosine similarities
+        return lambda score: score
+
+    def add_texts(self, texts: Iterable[str], metadatas: Optional[List[Dict]] = None, **kwargs: Any) -> List[str]:
+        raise NotImplementedError("Chunks are written to Chroma; the compact index follows it")
+
+    @classmethod
+    def from_texts(cls, texts, embedding, metadatas=None, **kwargs):
+        raise NotImplementedError("Compact stores are opened from the vectorstore pool")
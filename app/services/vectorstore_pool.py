@@ -0,0 +1,387 @@
+from langchain_chroma import Chroma
+from langchain_core.embeddings import Embeddings
+from fastapi.concurrency import run_in_threadpool
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from functools import lru_cache
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Union
+import os
+import shutil
+import threading
+import time
+import zlib
+import logging
+from app.core.config import settings
+from app.services.embeddings import get_embeddings
+from app.services.keyword_index import KeywordIndex
+from app.services.tenant_store import TenantCollection, TenantVectorStore
+from app.services.vector_index import FLOAT16, CompactVectorIndex, CompactVectorStore
+
+KEYWORD_INDEX_FILE = "keyword_index.sqlite3"
+LEGACY_KEYWORD_INDEX_FILE = "keyword_index.json"  # converted on first open
+VECTOR_INDEX_FILE = "vector_index.json"
+PER_USER = "per_user"
+SHARED = "shared"
+# Under the persist directory in the shared layout: one Chroma database, plus a small directory per user
+SHARED_DIRECTORY = "shared"
+TENANTS_DIRECTORY = "tenants"
+
+
+def shard_for(user_id: str, shards: int) -> int:
+    return zlib.crc32(user_id.encode("utf-8")) % shards
+
+
+class _Handle:
+    __slots__ = (
+        "_open", "_vectorstore", "_open_lock", "index_lock", "keyword_index", "vector_index",
+        "vector_index_loaded", "last_used", "leases"
+    )
+
+    def __init__(self, open_vectorstore: Callable[[], Union[Chroma, TenantVectorStore]]):
+        # Opened on first use: searches served by the compact index never need the Chroma client
+        self._open = open_vectorstore
+        self._vectorstore: Optional[Union[Chroma, TenantVectorStore]] = None
+        self._open_lock = threading.Lock()
+        # Held while the user's indexes are loaded or built, which can read their whole collection
+        self.index_lock = threading.Lock()
+        self.keyword_index: Optional[KeywordIndex] = None
+        self.vector_index: Optional[CompactVectorIndex] = None
+        self.vector_index_loaded = False
+        self.last_used = time.monotonic()
+        self.leases = 0
+
+    @property
+    def opened(self) -> bool:
+        return self._vectorstore is not None
+
+    @property
+    def vectorstore(self) -> Union[Chroma, TenantVectorStore]:
+        with self._open_lock:
+            if self._vectorstore is None:
+                self._vectorstore = self._open()
+            return self._vectorstore
+
+
+class VectorStorePool:
+    """Bounded LRU pool of per-user Chroma handles, reopened lazily from disk.
+
+    In the shared layout each handle is a user_id-filtered view of one of a fixed
+    number of collections in a single Chroma database, so the number of open
+    clients and files no longer grows with the number of users.
+
+    With compact_max_chunks set, users with at most that many chunks are searched
+    through a CompactVectorIndex kept next to their collection instead.
+    """
+
+    def __init__(
+        self,
+        persist_directory: str,
+        embeddings: Embeddings,
+        max_size: int = 64,
+        idle_ttl: float = 900.0,
+        layout: str = PER_USER,
+        shards: int = 1,
+        compact_max_chunks: int = 0,
+        compact_dtype: str = FLOAT16
+    ):
+        if layout not in (PER_USER, SHARED):
+            raise ValueError(f"Unknown VECTORSTORE_LAYOUT: {layout}")
+        self.persist_directory = persist_directory
+        self.embeddings = embeddings
+        self.max_size = max_size
+        self.idle_ttl = idle_ttl
+        self.layout = layout
+        self.shards = max(1, shards)
+        self.compact_max_chunks = compact_max_chunks
+        self.compact_dtype = compact_dtype
+        self._shard_stores: Dict[int, Chroma] = {}
+        self._handles: "OrderedDict[str, _Handle]" = OrderedDict()
+        self._lock = threading.RLock()
+        self._evict_listeners: List[Callable[[str], None]] = []
+        self.hits = 0
+        self.misses = 0
+        self.opens = 0
+        self.evictions = 0
+        self.open_seconds_total = 0.0
+
+    def user_path(self, user_id: str) -> str:
+        """Where the user's files live: their Chroma database, or just their keyword index when shared"""
+        if self.layout == SHARED:
+            return f"{self.persist_directory}/{TENANTS_DIRECTORY}/{user_id}"
+        return f"{self.persist_directory}/{user_id}"
+
+    def shared_store(self, shard: int) -> Chroma:
+        """The shared collection for a shard, opened once and kept for the life of the pool"""
+        with self._lock:
+            store = self._shard_stores.get(shard)
+            if store is None:
+                store = Chroma(
+                    persist_directory=f"{self.persist_directory}/{SHARED_DIRECTORY}",
+                    embedding_function=self.embeddings,
+                    collection_name=f"documents_{shard}"
+                )
+                self._shard_stores[shard] = store
+            return store
+
+    def exists(self, user_id: str) -> bool:
+        return user_id in self._handles or os.path.exists(self.user_path(user_id))
+
+    def on_evict(self, listener: Callable[[str], None]) -> None:
+        """Register a callback run after a user's handle is closed"""
+        self._evict_listeners.append(listener)
+
+    def _open(self, user_id: str) -> Union[Chroma, TenantVectorStore]:
+        start = time.perf_counter()
+        if self.layout == SHARED:
+            vectorstore = TenantVectorStore(self.shared_store(shard_for(user_id, self.shards)), user_id)
+        else:
+            vectorstore = Chroma(
+                persist_directory=self.user_path(user_id),
+                embedding_function=self.embeddings,
+                collection_name=f"user_{user_id}"
+            )
+        elapsed = time.perf_counter() - start
+        self.opens += 1
+        self.open_seconds_total += elapsed
+        logging.info(f"Opened vectorstore for user {user_id} in {elapsed * 1000:.1f}ms")
+        return vectorstore
+
+    def _acquire(self, user_id: str, create: bool) -> Optional[_Handle]:
+        with self._lock:
+            self._evict_idle()
+            handle = self._handles.get(user_id)
+            if handle is not None:
+                self.hits += 1
+                self._handles.move_to_end(user_id)
+            else:
+                if not create and not os.path.exists(self.user_path(user_id)):
+                    return None
+                self.misses += 1
+                os.makedirs(self.user_path(user_id), exist_ok=True)
+                handle = _Handle(lambda: self._open(user_id))
+                self._handles[user_id] = handle
+                self._evict_overflow()
+            handle.last_used = time.monotonic()
+            return handle
+
+    def get(self, user_id: str, create: bool = False) -> Optional[Chroma]:
+        """Return the user's vectorstore, opening it from disk if it exists (or create is set)"""
+        handle = self._acquire(user_id, create)
+        return handle.vectorstore if handle else None
+
+    def keyword_index(self, user_id: str) -> Optional[KeywordIndex]:
+        """The user's keyword index, loaded (or built from the collection) alongside the handle"""
+        # Pinned while loading, so a build isn't closed underneath by eviction
+        with self._pinned(user_id, create=False) as handle:
+            return self._keyword_index(user_id, handle) if handle else None
+
+    def _keyword_index(self, user_id: str, handle: _Handle) -> KeywordIndex:
+        # Under the handle's lock rather than the pool's, so other users aren't held up by a build
+        with handle.index_lock:
+            if handle.keyword_index is None:
+                path = os.path.join(self.user_path(user_id), KEYWORD_INDEX_FILE)
+                legacy_path = os.path.join(self.user_path(user_id), LEGACY_KEYWORD_INDEX_FILE)
+                if os.path.exists(path):
+                    handle.keyword_index = KeywordIndex(path)
+                elif os.path.exists(legacy_path):
+                    handle.keyword_index = KeywordIndex.from_json(path, legacy_path)
+                else:
+                    handle.keyword_index = KeywordIndex.from_collection(path, handle.vectorstore._collection)
+            return handle.keyword_index
+
+    def vector_index(self, user_id: str) -> Optional[CompactVectorIndex]:
+        """The user's compact vector index, or None when disabled or they have more than compact_max_chunks"""
+        if not self.compact_max_chunks:
+            return None
+        with self._pinned(user_id, create=False) as handle:
+            return self._vector_index(user_id, handle) if handle else None
+
+    def _vector_index(self, user_id: str, handle: _Handle) -> Optional[CompactVectorIndex]:
+        if not self.compact_max_chunks:
+            return None
+        # Under the handle's lock rather than the pool's, as building reads the whole collection
+        with handle.index_lock:
+            if not handle.vector_index_loaded:
+                handle.vector_index = self._load_vector_index(user_id, handle)
+                handle.vector_index_loaded = True
+            return handle.vector_index
+
+    def _load_vector_index(self, user_id: str, handle: _Handle) -> Optional[CompactVectorIndex]:
+        path = os.path.join(self.user_path(user_id), VECTOR_INDEX_FILE)
+        if os.path.exists(path):
+            try:
+                return CompactVectorIndex.load(path)
+            except (OSError, ValueError) as e:
+                logging.warning(f"Rebuilding compact vector index for user {user_id}: {str(e)}")
+        collection = handle.vectorstore._collection
+        if isinstance(collection, TenantCollection):
+            # A shared collection can only count a tenant by listing their ids, so stop one past the limit
+            chunks = collection.count(limit=self.compact_max_chunks + 1)
+        else:
+            chunks = collection.count()
+        if chunks > self.compact_max_chunks:
+            return None
+        return CompactVectorIndex.from_collection(path, collection, self.compact_dtype)
+
+    def save_vector_index(self, user_id: str, index: CompactVectorIndex) -> None:
+        """Persist the index after a write, or drop it once the user has outgrown it"""
+        if len(index) <= self.compact_max_chunks:
+            index.save()
+            return
+        with self._lock:
+            handle = self._handles.get(user_id)
+        if handle is not None:
+            with handle.index_lock:
+                if handle.vector_index is index:
+                    handle.vector_index = None
+        index.delete_files()
+        logging.info(
+            f"User {user_id} has {len(index)} chunks, above the compact index limit of "
+            f"{self.compact_max_chunks}; searching Chroma"
+        )
+        # Conversations built on the compact store rebuild their retriever against Chroma
+        for listener in self._evict_listeners:
+            listener(user_id)
+
+    def _retrieval_store(self, user_id: str, handle: _Handle) -> Union[Chroma, TenantVectorStore, CompactVectorStore]:
+        index = self._vector_index(user_id, handle)
+        if index is None:
+            return handle.vectorstore
+        return CompactVectorStore(index, self._keyword_index(user_id, handle), self.embeddings)
+
+    def retrieval_store(self, user_id: str) -> Optional[Union[Chroma, TenantVectorStore, CompactVectorStore]]:
+        """What to search the user's chunks with: their compact index if they have one, else Chroma"""
+        with self._pinned(user_id, create=False) as handle:
+            return self._retrieval_store(user_id, handle) if handle else None
+
+    def _pin(self, user_id: str, create: bool) -> Optional[_Handle]:
+        with self._lock:
+            handle = self._acquire(user_id, create)
+            if handle:
+                handle.leases += 1
+            return handle
+
+    def _unpin(self, handle: _Handle) -> None:
+        with self._lock:
+            handle.leases -= 1
+            handle.last_used = time.monotonic()
+
+    @contextmanager
+    def _pinned(self, user_id: str, create: bool) -> Iterator[Optional[_Handle]]:
+        handle = self._pin(user_id, create)
+        try:
+            yield handle
+        finally:
+            if handle:
+                self._unpin(handle)
+
+    @contextmanager
+    def lease(self, user_id: str, create: bool = False) -> Iterator[Optional[Chroma]]:
+        """Like get(), but the handle cannot be evicted until the block exits"""
+        with self._pinned(user_id, create) as handle:
+            yield handle.vectorstore if handle else None
+
+    @asynccontextmanager
+    async def alease(self, user_id: str, create: bool = False) -> AsyncIterator[Optional[Chroma]]:
+        """lease() for the event loop: the handle is pinned and its client opened on the threadpool"""
+        handle = await run_in_threadpool(self._pin, user_id, create)
+        try:
+            yield await run_in_threadpool(getattr, handle, "vectorstore") if handle else None
+        finally:
+            if handle:
+                self._unpin(handle)
+
+    @contextmanager
+    def lease_retrieval(self, user_id: str) -> Iterator[Optional[Union[Chroma, TenantVectorStore, CompactVectorStore]]]:
+        """Like retrieval_store(), but the handle cannot be evicted until the block exits"""
+        with self._pinned(user_id, create=False) as handle:
+            yield self._retrieval_store(user_id, handle) if handle else None
+
+    @asynccontextmanager
+    async def alease_retrieval(
+        self, user_id: str
+    ) -> AsyncIterator[Optional[Union[Chroma, TenantVectorStore, CompactVectorStore]]]:
+        """lease_retrieval() for the event loop: the handle is pinned and its indexes loaded on the threadpool"""
+        handle = await run_in_threadpool(self._pin, user_id, False)
+        try:
+            yield await run_in_threadpool(self._retrieval_store, user_id, handle) if handle else None
+        finally:
+            if handle:
+                self._unpin(handle)
+
+    def evict(self, user_id: str) -> None:
+        with self._lock:
+            handle = self._handles.pop(user_id, None)
+        if handle is not None:
+            self._close(user_id, handle)
+
+    def delete_user(self, user_id: str) -> None:
+        """Close the user's handle and remove all of their chunks and files"""
+        self.evict(user_id)
+        if self.layout == SHARED:
+            store = self.shared_store(shard_for(user_id, self.shards))
+            TenantVectorStore(store, user_id).delete()
+        user_path = self.user_path(user_id)
+        if os.path.exists(user_path):
+            shutil.rmtree(user_path)
+
+    def _evict_idle(self) -> None:
+        cutoff = time.monotonic() - self.idle_ttl
+        idle = [
+            user_id for user_id, handle in self._handles.items()
+            if handle.last_used < cutoff and handle.leases == 0
+        ]
+        for user_id in idle:
+            self._close(user_id, self._handles.pop(user_id))
+
+    def _evict_overflow(self) -> None:
+        # Oldest first; leased handles are skipped so in-flight work keeps its client
+        for user_id in list(self._handles):
+            if len(self._handles) <= self.max_size:
+                break
+            if self._handles[user_id].leases == 0:
+                self._close(user_id, self._handles.pop(user_id))
+
+    def _close(self, user_id: str, handle: _Handle) -> None:
+        self.evictions += 1
+        client = getattr(handle._vectorstore, "_client", None)
+        close = getattr(client, "close", None)
+        if callable(close):
+            try:
+                close()
+            except Exception as e:
+                logging.warning(f"Error closing vectorstore for user {user_id}: {str(e)}")
+        for listener in self._evict_listeners:
+            listener(user_id)
+        logging.info(f"Evicted vectorstore handle for user {user_id}")
+
+    def stats(self) -> Dict:
+        return {
+            "layout": self.layout,
+            "open_handles": len(self._handles),
+            "open_clients": sum(1 for handle in self._handles.values() if handle.opened),
+            "compact_indexes": sum(1 for handle in self._handles.values() if handle.vector_index is not None),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "opens": self.opens,
+            "evictions": self.evictions,
+            "open_seconds_total": self.open_seconds_total
+        }
+
+
+@lru_cache
+def get_vectorstore_pool(persist_directory: str) -> VectorStorePool:
+    if settings.VECTOR_INDEX_BACKEND not in ("chroma", "compact"):
+        raise ValueError(f"Unknown VECTOR_INDEX_BACKEND: {settings.VECTOR_INDEX_BACKEND}")
+    os.makedirs(persist_directory, exist_ok=True)
+    return VectorStorePool(
+        persist_directory,
+        get_embeddings(),
+        max_size=settings.VECTORSTORE_POOL_SIZE,
+        idle_ttl=settings.VECTORSTORE_IDLE_TTL,
+        layout=settings.VECTORSTORE_LAYOUT,
+        shards=settings.VECTORSTORE_SHARDS,
+        compact_max_chunks=settings.COMPACT_INDEX_MAX_CHUNKS if settings.VECTOR_INDEX_BACKEND == "compact" else 0,
+        compact_dtype=settings.COMPACT_INDEX_DTYPE
+    )
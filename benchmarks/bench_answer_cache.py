@@ -0,0 +1,109 @@
+"""Answer cache hits and correctness for follow-up questions.
+
+Run with: python -m benchmarks.bench_answer_cache
+
+Each conversation asks about one clause, then asks to have it explained. The
+follow-up reads the same every time, so a cache keyed on the question alone
+hands the first clause's explanation to every later conversation. The chat
+keys follow-ups by the history they were asked after; standalone questions are
+still shared. Each mode's answers are checked against the answers given with
+the cache off. Modes:
+
+  history   cache key includes a digest of the chat history for follow-ups (the chat's behaviour)
+  query     cache key is the question alone
+
+Exits non-zero if a follow-up gets an answer meant for another clause.
+"""
+from langchain.chains import ConversationalRetrievalChain
+from langchain.memory import ConversationBufferMemory
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from contextlib import asynccontextmanager
+from typing import List
+import argparse
+import asyncio
+import re
+import sys
+from app.services import chat_manager as chat_manager_module
+from app.services.answer_cache import AnswerCache
+from app.services.chat_manager import ChatManager
+from app.services.prompts import CHAT_PROMPT
+from benchmarks.fakes import FakeChatModel
+
+CONVERSATIONS = [
+    ["What does clause 3 say?", "Explain it simply"],
+    ["What does clause 7 say?", "Explain it simply"],
+    ["What does clause 3 say?", "Explain it simply"],
+]
+
+
+class ClauseRetriever(BaseRetriever):
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        numbers = re.findall(r"\d+", query) or ["0"]
+        return [Document(page_content=f"Clause {numbers[-1]}: the supplier may terminate on notice.")]
+
+
+class NoVectorstores:
+    @asynccontextmanager
+    async def alease_retrieval(self, user_id: str):
+        yield None
+
+
+async def run(mode: str):
+    llm = FakeChatModel(latency=0.0, answer_words=8)
+    # Only the answer pipeline and its cache are exercised; the stored history is not
+    manager = ChatManager.__new__(ChatManager)
+    manager.llm = llm
+    manager.answer_cache = AnswerCache() if mode != "off" else None
+    manager.vectorstores = NoVectorstores()
+    manager._save_turn = lambda user_id, question, answer: None
+    if mode == "query":
+        context_of = lambda query, chat_history: ""
+    else:
+        context_of = chat_manager_module._cache_context
+
+    rows = []
+    original = chat_manager_module._cache_context
+    chat_manager_module._cache_context = context_of
+    try:
+        for number, turns in enumerate(CONVERSATIONS):
+            memory = ConversationBufferMemory(
+                memory_key="chat_history", output_key="answer", input_key="question", return_messages=True
+            )
+            chain = ConversationalRetrievalChain.from_llm(
+                llm=llm, retriever=ClauseRetriever(), memory=memory, combine_docs_chain_kwargs={"prompt": CHAT_PROMPT}
+            )
+            manager.conversations = {"1": {"chain": chain, "memory": memory, "user_name": "Ada"}}
+            for query in turns:
+                hits = manager.answer_cache.hits if manager.answer_cache is not None else 0
+                calls = llm.calls
+                response = await manager.get_response("1", query)
+                hit = manager.answer_cache is not None and manager.answer_cache.hits > hits
+                rows.append((number, query, hit, llm.calls - calls, response["answer"]))
+    finally:
+        chat_manager_module._cache_context = original
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--modes", default="history,query")
+    args = parser.parse_args()
+
+    reference = [row[-1] for row in asyncio.run(run("off"))]
+    wrong = {}
+    for mode in args.modes.split(","):
+        rows = asyncio.run(run(mode))
+        print(f"mode={mode}")
+        print(f"{'conversation':>13} {'question':<26} {'cache hit':>10} {'llm calls':>10} {'correct':>8}")
+        for (number, query, hit, calls, answer), right in zip(rows, reference):
+            print(f"{number:>13} {query:<26} {str(hit):>10} {calls:>10} {str(answer == right):>8}")
+        wrong[mode] = sum(row[-1] != right for row, right in zip(rows, reference))
+        print(f"hits={sum(row[2] for row in rows)}/{len(rows)} wrong answers={wrong[mode]}\n")
+    if wrong.get("history"):
+        sys.exit("follow-up questions were answered from another conversation's cache entry")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Requests per second on an authenticated no-op endpoint: the old blocking lookup vs the new path.
+
+Run with: python -m benchmarks.bench_auth --seconds 5 --concurrency 12 --db-latency 0.002
+
+Serves the real app under uvicorn against a scratch SQLite database. --db-latency
+adds a sleep to every SQL statement, standing in for a round trip to a networked
+database. Modes:
+
+  blocking   the previous get_current_user: a synchronous query on the event loop,
+             with a pooled session held for the whole request
+  offload    the lookup runs in the threadpool on every request (AUTH_CACHE_TTL=0)
+  cached     verified users are served from the principal cache (AUTH_CACHE_TTL>0)
+
+Above DB_POOL_SIZE + DB_MAX_OVERFLOW concurrent requests, blocking mode stalls:
+the pool wait itself blocks the event loop, so no session is ever returned and
+requests fail after DB_POOL_TIMEOUT. Those failures are counted as errors.
+"""
+from fastapi import Depends, HTTPException
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+import argparse
+import asyncio
+import shutil
+import tempfile
+import time
+import httpx
+from benchmarks.e2e import scenarios
+from benchmarks.e2e.server import AppServer, configure
+
+
+async def load(base_url: str, path: str, headers, seconds: float, concurrency: int):
+    latencies, errors = [], 0
+    deadline = time.perf_counter() + seconds
+    limits = httpx.Limits(max_connections=concurrency + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=seconds + 5, limits=limits) as client:
+        async def worker():
+            nonlocal errors
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                try:
+                    response = await client.get(path, headers=headers)
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                if response.status_code == 200:
+                    latencies.append(time.perf_counter() - start)
+                else:
+                    errors += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    return len(latencies) / elapsed, scenarios.summarize(latencies), errors
+
+
+async def login(base_url: str):
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        return await scenarios.create_user(client, "auth-bench@example.com")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0, help="load duration per mode")
+    parser.add_argument("--concurrency", type=int, default=12)
+    parser.add_argument("--db-latency", type=float, default=0.002, help="seconds added to every SQL statement")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docmind_auth_bench_")
+    configure(workdir, 0.0, 0.0, 0.0, 0.0)
+    try:
+        import main as docmind
+        from app.core.deps import oauth2_scheme
+        from app.db.database import engine, get_db
+        from app.services import auth_service
+        from app.services.principal_cache import get_principal_cache
+
+        # The dependency as it was before the principal cache, for comparison
+        async def blocking_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+            from jose import jwt
+
+            email = jwt.decode(token, docmind.settings.SECRET_KEY, algorithms=[docmind.settings.ALGORITHM])["sub"]
+            user = auth_service.get_user_by_email(db, email=email)
+            if user is None:
+                raise HTTPException(status_code=401)
+            return {"id": user.id}
+
+        @docmind.app.get("/bench/blocking-me")
+        async def blocking_me(user=Depends(blocking_current_user)):
+            return user
+
+        if args.db_latency:
+            @event.listens_for(engine, "before_cursor_execute")
+            def simulate_round_trip(*_):
+                time.sleep(args.db_latency)
+
+        principals = get_principal_cache()
+        ttl = principals.ttl or 30.0
+        me = f"{docmind.settings.API_V1_STR}/auth/me"
+        modes = [("blocking", "/bench/blocking-me", 0), ("offload", me, 0), ("cached", me, ttl)]
+
+        print(f"concurrency={args.concurrency} db_latency={args.db_latency * 1000:.1f}ms seconds={args.seconds}")
+        print(f"{'mode':>10} {'req/s':>9} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+        with AppServer(docmind.app) as server:
+            headers = asyncio.run(login(server.base_url))
+            for name, path, mode_ttl in modes:
+                principals.ttl = mode_ttl
+                principals.clear()
+                rps, latency, errors = asyncio.run(
+                    load(server.base_url, path, headers, args.seconds, args.concurrency)
+                )
+                print(f"{name:>10} {rps:>9.0f} {latency.get('p50_ms', 0):>8.1f} {latency.get('p99_ms', 0):>8.1f} {errors:>7}")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
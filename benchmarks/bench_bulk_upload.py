@@ -0,0 +1,128 @@
+"""Onboarding throughput: looping POST /documents/upload vs one /documents/upload/bulk request.
+
+Run with: python -m benchmarks.bench_bulk_upload --files 100 --embedding-latency 0.1
+
+Serves the real app under uvicorn with fake embeddings paying a fixed latency per
+call, like a remote API; parsing and Chroma are real. Each mode indexes the same
+corpus for its own user, with the embedding cache off so no mode reuses another's
+vectors. Modes:
+
+  loop     upload one file and wait for its job before the next, as clients onboard today
+  queued   upload every file, then wait for all the jobs (INGEST_WORKERS at a time)
+  bulk     every file in one multipart /documents/upload/bulk request
+  zip      the same files as a single ZIP archive
+"""
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import zipfile
+import httpx
+from benchmarks.e2e import scenarios
+from benchmarks.e2e.corpus import generate_corpus
+from benchmarks.e2e.server import AppServer, configure
+
+API = "/api/v1"
+
+
+async def loop(client: httpx.AsyncClient, headers, paths: list, workdir: str) -> dict:
+    for path in paths:
+        job = await scenarios.upload(client, headers, path)
+        await scenarios.wait_for_job(client, headers, job["job_id"])
+    return {}
+
+
+async def queued(client: httpx.AsyncClient, headers, paths: list, workdir: str) -> dict:
+    jobs = [await scenarios.upload(client, headers, path) for path in paths]
+    await asyncio.gather(*(scenarios.wait_for_job(client, headers, job["job_id"]) for job in jobs))
+    return {}
+
+
+async def post_bulk(client: httpx.AsyncClient, headers, files: list) -> dict:
+    response = await client.post(f"{API}/documents/upload/bulk", files=files, headers=headers)
+    response.raise_for_status()
+    body = response.json()
+    return {"failed": body["failed"]}
+
+
+async def bulk(client: httpx.AsyncClient, headers, paths: list, workdir: str) -> dict:
+    files = []
+    for path in paths:
+        with open(path, "rb") as f:
+            files.append(("files", (os.path.basename(path), f.read())))
+    return await post_bulk(client, headers, files)
+
+
+async def archive(client: httpx.AsyncClient, headers, paths: list, workdir: str) -> dict:
+    # Built inside the timed section, as a client would
+    zip_path = os.path.join(workdir, "corpus.zip")
+    with zipfile.ZipFile(zip_path, "w", zipfile.ZIP_DEFLATED) as out:
+        for path in paths:
+            out.write(path, os.path.join("corpus", os.path.basename(path)))
+    with open(zip_path, "rb") as f:
+        return await post_bulk(client, headers, [("files", ("corpus.zip", f.read()))])
+
+
+async def run_mode(base_url: str, name: str, mode, paths: list, workdir: str) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=1800) as client:
+        headers = await scenarios.create_user(client, f"bulk-{name}@example.com")
+        start = time.perf_counter()
+        result = await mode(client, headers, paths, workdir)
+        result["seconds"] = time.perf_counter() - start
+        response = await client.get(f"{API}/documents/", headers=headers)
+        response.raise_for_status()
+        documents = response.json()
+        result["documents"] = len(documents)
+        result["chunks"] = sum(document["chunks"] for document in documents)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100, help="spread evenly over --formats")
+    parser.add_argument("--formats", default=".pdf,.docx,.pptx,.txt")
+    parser.add_argument("--pages", type=int, default=2, help="pages per file")
+    parser.add_argument("--embedding-latency", type=float, default=0.1, help="seconds per embedding call")
+    parser.add_argument("--modes", default="loop,queued,bulk,zip")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docmind_bulk_bench_")
+    os.environ.setdefault("EMBEDDING_CACHE_ENABLED", "false")
+    _, embeddings = configure(workdir, 0.0, 0.0, args.embedding_latency, 0.0)
+    try:
+        import main as docmind
+
+        formats = args.formats.split(",")
+        corpus = generate_corpus(
+            os.path.join(workdir, "corpus"), 0, docs_per_format=max(1, args.files // len(formats)), pages=args.pages
+        )
+        paths = [file["path"] for file in corpus if file["format"] in formats]
+        settings = docmind.settings
+        print(
+            f"files={len(paths)} pages={args.pages} embedding_latency={args.embedding_latency}s "
+            f"EMBEDDING_BATCH_SIZE={settings.EMBEDDING_BATCH_SIZE} "
+            f"BULK_EMBEDDING_BATCH_SIZE={settings.BULK_EMBEDDING_BATCH_SIZE} "
+            f"PARSER_WORKERS={settings.PARSER_WORKERS} INGEST_WORKERS={settings.INGEST_WORKERS}"
+        )
+        print(
+            f"{'mode':>7} {'seconds':>8} {'files/s':>8} {'chunks/s':>9} {'documents':>10} "
+            f"{'chunks':>7} {'embed calls':>12} {'failed':>7}"
+        )
+        modes = {"loop": loop, "queued": queued, "bulk": bulk, "zip": archive}
+        with AppServer(docmind.app) as server:
+            for name in args.modes.split(","):
+                calls = embeddings.calls
+                result = asyncio.run(run_mode(server.base_url, name, modes[name], paths, workdir))
+                print(
+                    f"{name:>7} {result['seconds']:>8.2f} {len(paths) / result['seconds']:>8.1f} "
+                    f"{result['chunks'] / result['seconds']:>9.1f} {result['documents']:>10} "
+                    f"{result['chunks']:>7} {embeddings.calls - calls:>12} {result.get('failed', '-'):>7}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
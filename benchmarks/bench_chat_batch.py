@@ -0,0 +1,140 @@
+"""Report-style question sets: one /chat/ request per question vs a single /chat/batch request.
+
+Run with: python -m benchmarks.bench_chat_batch --questions 30 --llm-latency 0.5 --embedding-latency 0.1
+
+Serves the real app under uvicorn with a fake LLM and embeddings, each call
+paying a fixed latency like a remote API. The answer cache is off, so every
+question is answered. Modes:
+
+  sequential    POST /chat/ once per question, waiting for each answer, as clients do today
+  batch         POST /chat/batch with every question, CHAT_BATCH_CONCURRENCY answers at a time
+  batch_stream  POST /chat/batch/stream; also reports when the first answer arrived
+
+Questions mix clause lookups (answered by the keyword fast path in hybrid
+retrieval) with topic questions that need a vector search.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import shutil
+import tempfile
+import time
+import httpx
+from benchmarks.e2e import scenarios
+from benchmarks.e2e.corpus import WORDS, generate_corpus
+from benchmarks.e2e.server import AppServer, configure
+
+API = "/api/v1"
+
+
+def make_questions(count: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    questions = []
+    for index in range(count):
+        if index % 3 == 0:
+            questions.append(f"What period does clause {index % 5 + 1}.{index % 6 + 1} set? (question {index})")
+        else:
+            # No digits, so these always take the vector search
+            first, second, third = rng.sample(WORDS, 3)
+            questions.append(f"What does the agreement say about {first}, {second} and {third}?")
+    return questions
+
+
+async def sequential(client: httpx.AsyncClient, headers, questions: list) -> dict:
+    for question in questions:
+        response = await client.post(f"{API}/chat/", json={"query": question}, headers=headers)
+        response.raise_for_status()
+    return {}
+
+
+async def batch(client: httpx.AsyncClient, headers, questions: list) -> dict:
+    response = await client.post(f"{API}/chat/batch", json={"queries": questions}, headers=headers)
+    response.raise_for_status()
+    body = response.json()
+    return {"sources": len(body["sources"]), "failed": body["done"]["failed"]}
+
+
+async def batch_stream(client: httpx.AsyncClient, headers, questions: list) -> dict:
+    start = time.perf_counter()
+    first_answer, event, sources, failed = None, None, 0, 0
+    async with client.stream("POST", f"{API}/chat/batch/stream", json={"queries": questions}, headers=headers) as response:
+        response.raise_for_status()
+        async for line in response.aiter_lines():
+            if line.startswith("event: "):
+                event = line[len("event: "):]
+            elif line.startswith("data: "):
+                data = json.loads(line[len("data: "):])
+                if event == "sources":
+                    sources = len(data)
+                elif event == "answer" and first_answer is None:
+                    first_answer = time.perf_counter() - start
+                elif event == "done":
+                    failed = data["failed"]
+    return {"sources": sources, "failed": failed, "first_answer_s": first_answer}
+
+
+async def prepare(base_url: str, corpus_file: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        headers = await scenarios.create_user(client, "batch-bench@example.com")
+        job = await scenarios.upload(client, headers, corpus_file)
+        await scenarios.wait_for_job(client, headers, job["job_id"])
+    return headers
+
+
+async def run_mode(base_url: str, headers, questions: list, mode) -> dict:
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        start = time.perf_counter()
+        result = await mode(client, headers, questions)
+        result["seconds"] = time.perf_counter() - start
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--questions", type=int, default=30)
+    parser.add_argument("--pages", type=int, default=5, help="pages in the indexed document")
+    parser.add_argument("--llm-latency", type=float, default=0.5)
+    parser.add_argument("--embedding-latency", type=float, default=0.1)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docmind_batch_bench_")
+    os.environ.setdefault("ANSWER_CACHE_ENABLED", "false")
+    llm, embeddings = configure(workdir, args.llm_latency, 0.0, args.embedding_latency, 0.0)
+    try:
+        import main as docmind
+
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), 0, docs_per_format=1, pages=args.pages)
+        corpus_file = next(file["path"] for file in corpus if file["format"] == ".txt")
+        questions = make_questions(args.questions)
+
+        print(
+            f"questions={args.questions} llm_latency={args.llm_latency}s embedding_latency={args.embedding_latency}s "
+            f"batch_concurrency={docmind.settings.CHAT_BATCH_CONCURRENCY} retrieval={docmind.settings.RETRIEVAL_MODE}"
+        )
+        print(
+            f"{'mode':>13} {'seconds':>8} {'q/s':>7} {'first answer':>13} {'embed calls':>12} "
+            f"{'llm calls':>10} {'sources':>8}"
+        )
+        with AppServer(docmind.app) as server:
+            headers = asyncio.run(prepare(server.base_url, corpus_file))
+            for name, mode in (("sequential", sequential), ("batch", batch), ("batch_stream", batch_stream)):
+                embed_calls, llm_calls = embeddings.calls, llm.calls
+                # Distinct wording per mode, in case the answer cache is switched back on
+                result = asyncio.run(run_mode(
+                    server.base_url, headers, [f"{question} [{name}]" for question in questions], mode
+                ))
+                first_answer = result.get("first_answer_s")
+                print(
+                    f"{name:>13} {result['seconds']:>8.2f} {args.questions / result['seconds']:>7.2f} "
+                    f"{(f'{first_answer:.2f}s' if first_answer is not None else '-'):>13} "
+                    f"{embeddings.calls - embed_calls:>12} {llm.calls - llm_calls:>10} "
+                    f"{result.get('sources', '-'):>8}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""Prompt tokens per turn over a long chat session, by memory mode.
+
+Run with: python -m benchmarks.bench_chat_memory
+"""
+from langchain.memory import ConversationBufferMemory
+from langchain_core.language_models.fake import FakeListLLM
+from langchain_core.messages import get_buffer_string
+import argparse
+from app.services.memory import TokenBudgetMemory, count_tokens
+from app.services.prompts import CHAT_PROMPT
+
+CONTEXT = "\n\n".join(f"Section {i}: " + "The agreement renews annually unless terminated. " * 18 for i in range(4))
+
+
+def make_memory(mode: str, budget: int):
+    kwargs = {"memory_key": "chat_history", "output_key": "answer", "input_key": "question"}
+    if mode == "buffer":
+        return ConversationBufferMemory(**kwargs)
+    llm = FakeListLLM(responses=["The user asked about renewal terms, fees and notice periods."]) if mode == "summary" else None
+    return TokenBudgetMemory(max_token_limit=budget, llm=llm, **kwargs)
+
+
+def prompt_tokens(memory, question: str) -> int:
+    history = get_buffer_string(memory.chat_memory.messages)
+    prompt = CHAT_PROMPT.format(context=CONTEXT, chat_history=history, user_name="Ada", question=question)
+    return count_tokens(prompt)
+
+
+def run(mode: str, turns: int, budget: int):
+    memory = make_memory(mode, budget)
+    per_turn = []
+    for turn in range(turns):
+        question = f"Question {turn}: what does clause {turn} say about notice periods and renewal fees?"
+        per_turn.append(prompt_tokens(memory, question))
+        answer = f"Clause {turn} states that " + "either party may terminate with thirty days notice. " * 6
+        memory.save_context({"question": question}, {"answer": answer})
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--turns", type=int, default=50)
+    parser.add_argument("--budget", type=int, default=1000)
+    args = parser.parse_args()
+
+    results = {mode: run(mode, args.turns, args.budget) for mode in ("buffer", "token_budget", "summary")}
+    print(f"{'turn':>4} " + " ".join(f"{mode:>13}" for mode in results))
+    for turn in range(args.turns):
+        if turn < 5 or (turn + 1) % 5 == 0:
+            print(f"{turn + 1:>4} " + " ".join(f"{results[mode][turn]:>13}" for mode in results))
+    print(f"{'sum':>4} " + " ".join(f"{sum(values):>13}" for values in results.values()))
+
+
+if __name__ == "__main__":
+    main()
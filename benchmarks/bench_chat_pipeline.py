@@ -0,0 +1,90 @@
+"""LLM calls and retrievals per chat turn: CHAT_PIPELINE_MODE "chain" vs "single_call".
+
+Run with: python -m benchmarks.bench_chat_pipeline
+"""
+from langchain.chains import ConversationalRetrievalChain
+from langchain.memory import ConversationBufferMemory
+from langchain_core.callbacks import CallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.language_models.fake_chat_models import FakeListChatModel
+from langchain_core.retrievers import BaseRetriever
+from typing import List
+import argparse
+import asyncio
+from app.core.config import settings
+from app.services.chat_manager import ChatManager
+from app.services.prompts import CHAT_PROMPT
+from benchmarks.fakes import LLMCallCounter
+
+TURNS = [
+    "hi",
+    "What is the notice period for terminating the agreement?",
+    "and what about the renewal fees?",
+    "Does clause 7.2 cover late payment penalties?",
+    "thanks!",
+    "Why is it so high?",
+    "What are the data retention obligations of the processor?",
+    "ok bye",
+]
+
+
+class CountingRetriever(BaseRetriever):
+    calls: int = 0
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun) -> List[Document]:
+        self.calls += 1
+        return [Document(page_content=f"Clause {i}: the agreement renews annually.") for i in range(4)]
+
+
+async def run(mode: str):
+    settings.CHAT_PIPELINE_MODE = mode
+    counter = LLMCallCounter()
+    llm = FakeListChatModel(responses=["A rewritten question or an answer."], callbacks=[counter])
+    retriever = CountingRetriever()
+    memory = ConversationBufferMemory(
+        memory_key="chat_history", output_key="answer", input_key="question", return_messages=True
+    )
+    conversation = {
+        "chain": ConversationalRetrievalChain.from_llm(
+            llm=llm, retriever=retriever, memory=memory, combine_docs_chain_kwargs={"prompt": CHAT_PROMPT}
+        ),
+        "memory": memory,
+        "user_name": "Ada"
+    }
+    # Only the answer pipeline is exercised, so skip the manager's model and vectorstore setup
+    manager = ChatManager.__new__(ChatManager)
+    manager.llm = llm
+
+    per_turn = []
+    for query in TURNS:
+        llm_before, retrievals_before = counter.calls, retriever.calls
+        question, docs, chat_history, _ = await manager._prepare_answer(conversation, query)
+        message = await llm.ainvoke(manager._answer_prompt(conversation, question, docs, chat_history))
+        await memory.asave_context({"question": query}, {"answer": message.content})
+        per_turn.append((counter.calls - llm_before, retriever.calls - retrievals_before))
+    return per_turn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--llm-latency", type=float, default=0.8, help="seconds per LLM round trip")
+    parser.add_argument("--retrieval-latency", type=float, default=0.15, help="seconds per retrieval")
+    args = parser.parse_args()
+
+    results = {mode: asyncio.run(run(mode)) for mode in ("chain", "single_call")}
+    print(f"{'turn':<60} " + " ".join(f"{mode + ' llm/ret':>17}" for mode in results))
+    for index, query in enumerate(TURNS):
+        cells = " ".join(f"{f'{calls}/{retrievals}':>17}" for calls, retrievals in (r[index] for r in results.values()))
+        print(f"{query:<60} {cells}")
+    for mode, per_turn in results.items():
+        calls = sum(c for c, _ in per_turn)
+        retrievals = sum(r for _, r in per_turn)
+        estimated = calls * args.llm_latency + retrievals * args.retrieval_latency
+        print(
+            f"{mode:>12}: {calls} LLM calls, {retrievals} retrievals, "
+            f"~{estimated / len(per_turn):.2f}s per turn at the given latencies"
+        )
+
+
+if __name__ == "__main__":
+    main()
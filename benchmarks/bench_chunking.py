@@ -0,0 +1,87 @@
+"""Chunking throughput and peak memory: OffsetTextSplitter vs RecursiveCharacterTextSplitter.
+
+Run with: python -m benchmarks.bench_chunking --megabytes 100
+
+Peak memory is measured with tracemalloc in a second pass, so it doesn't skew the
+timings. "peak MB" covers everything allocated while splitting, including the
+chunks; "scratch MB" is the part of the peak that was not the returned chunks.
+"""
+from langchain.text_splitter import RecursiveCharacterTextSplitter
+from langchain_core.documents import Document
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from app.services.chunking import OffsetTextSplitter
+
+WORDS = (
+    "the agreement renews annually unless either party gives written notice of termination "
+    "fees are payable within thirty days clause schedule annex supplier customer liability"
+).split()
+
+
+def make_text(megabytes: float, seed: int = 0) -> str:
+    rng = random.Random(seed)
+    target = int(megabytes * 1024 * 1024)
+    paragraphs, size = [], 0
+    while size < target:
+        sentences = [
+            " ".join(rng.choice(WORDS) for _ in range(rng.randint(6, 24))).capitalize() + "."
+            for _ in range(rng.randint(2, 8))
+        ]
+        paragraph = " ".join(sentences)
+        paragraphs.append(paragraph)
+        size += len(paragraph) + 2
+    return "\n\n".join(paragraphs)
+
+
+def measure(splitter, document: Document):
+    gc.collect()
+    start = time.perf_counter()
+    chunks = splitter.split_documents([document])
+    elapsed = time.perf_counter() - start
+    count = len(chunks)
+    del chunks
+    gc.collect()
+
+    tracemalloc.start()
+    chunks = splitter.split_documents([document])
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del chunks
+    return elapsed, peak, peak - retained, count
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--megabytes", type=float, default=100)
+    parser.add_argument("--chunk-size", type=int, default=1000)
+    parser.add_argument("--chunk-overlap", type=int, default=200)
+    args = parser.parse_args()
+
+    text = make_text(args.megabytes)
+    document = Document(page_content=text, metadata={"source": "bench.txt"})
+    megabytes = len(text) / 1024 / 1024
+    splitters = {
+        "recursive": RecursiveCharacterTextSplitter(
+            chunk_size=args.chunk_size,
+            chunk_overlap=args.chunk_overlap,
+            length_function=len,
+            separators=["\n\n", "\n", " ", ""]
+        ),
+        "offset": OffsetTextSplitter(args.chunk_size, args.chunk_overlap)
+    }
+
+    print(f"{megabytes:.1f} MB of text, chunk_size={args.chunk_size}, chunk_overlap={args.chunk_overlap}")
+    print(f"{'splitter':>10} {'seconds':>9} {'MB/s':>8} {'peak MB':>9} {'scratch MB':>11} {'chunks':>9}")
+    for name, splitter in splitters.items():
+        elapsed, peak, scratch, count = measure(splitter, document)
+        print(
+            f"{name:>10} {elapsed:>9.2f} {megabytes / elapsed:>8.1f} "
+            f"{peak / 1024 / 1024:>9.1f} {scratch / 1024 / 1024:>11.1f} {count:>9}"
+        )
+
+
+if __name__ == "__main__":
+    main()
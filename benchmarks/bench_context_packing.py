@@ -0,0 +1,122 @@
+"""Prompt context tokens per query before and after context packing.
+
+Run with: python -m benchmarks.bench_context_packing --top-k 8 --budgets none,2000,1000
+
+Pages from the end-to-end corpus are split with the app's splitter (CHUNK_SIZE
+and CHUNK_OVERLAP), indexed in Chroma and the keyword index, and searched with
+hybrid retrieval. Every query asks about one clause, quoting some of its words,
+so the chunks retrieved for it often share text with each other. For each
+CONTEXT_TOKEN_BUDGET the retrieved chunks are packed as the chat does, and the
+context tokens sent to the LLM are compared with joining the chunks as retrieved. "kept" is the share of
+queries whose clause sentence is still in the packed context.
+"""
+from langchain_chroma import Chroma
+from langchain_core.documents import Document
+import argparse
+import os
+import random
+import statistics
+import time
+import uuid
+import logging
+
+
+def build_chunks(documents: int, pages: int, chunk_size: int, chunk_overlap: int):
+    from app.services.chunking import OffsetTextSplitter
+    from benchmarks.e2e.corpus import make_pages
+
+    rng = random.Random(0)
+    splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+    chunks, clauses = [], []
+    for number in range(documents):
+        document_id = f"doc-{number}"
+        content = make_pages(rng, pages)
+        page_documents = [
+            Document(page_content="\n\n".join(paragraphs), metadata={"page": page, "document_id": document_id})
+            for page, paragraphs in enumerate(content)
+        ]
+        chunks.extend(splitter.split_documents(page_documents))
+        for paragraphs in content:
+            clauses.extend(paragraphs)
+    for chunk in chunks:
+        chunk.metadata["chunk_id"] = str(uuid.uuid4())
+    return chunks, clauses
+
+
+def make_retriever(chunks, top_k: int):
+    from app.services.keyword_index import KeywordIndex
+    from app.services.retrievers import HybridRetriever
+    from benchmarks.fakes import HashingEmbeddings
+
+    vectorstore = Chroma(collection_name=f"bench_{uuid.uuid4().hex}", embedding_function=HashingEmbeddings())
+    ids = [chunk.metadata["chunk_id"] for chunk in chunks]
+    texts = [chunk.page_content for chunk in chunks]
+    metadatas = [chunk.metadata for chunk in chunks]
+    for start in range(0, len(ids), 500):
+        vectorstore.add_texts(texts[start:start + 500], metadatas[start:start + 500], ids=ids[start:start + 500])
+    keyword_index = KeywordIndex()
+    keyword_index.add(ids, texts, metadatas)
+    return HybridRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=top_k, fast_path_confidence=None)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=5)
+    parser.add_argument("--pages", type=int, default=10, help="pages per document")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=8, help="chunks retrieved per query, i.e. TOP_K")
+    parser.add_argument("--question-words", type=int, default=8, help="words of the clause quoted in each question")
+    parser.add_argument("--budgets", default="none,2000,1000,500", help="CONTEXT_TOKEN_BUDGET values to compare")
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    for key, value in {"SECRET_KEY": "benchmark", "GOOGLE_API_KEY": "benchmark", "DATABASE_URL": "sqlite://"}.items():
+        os.environ.setdefault(key, value)
+    from app.core.config import settings
+    from app.services.context_packing import SEPARATOR, pack_context
+    from app.services.memory import count_tokens
+
+    chunks, clauses = build_chunks(args.documents, args.pages, settings.CHUNK_SIZE, settings.CHUNK_OVERLAP)
+    retriever = make_retriever(chunks, args.top_k)
+    rng = random.Random(7)
+    targets = rng.sample(clauses, min(args.queries, len(clauses)))
+    retrieved = []
+    for paragraph in targets:
+        # "Clause 2.3 sets the notice period to 30 days.", asked about with words from the rest of the clause
+        clause, rest = paragraph.split(" days. ", 1)
+        question = f"{clause} days: what about {' '.join(rest.split()[:args.question_words])}?"
+        retrieved.append((clause + " days.", retriever.invoke(question)))
+
+    print(
+        f"{len(chunks)} chunks (CHUNK_SIZE={settings.CHUNK_SIZE}, CHUNK_OVERLAP={settings.CHUNK_OVERLAP}), "
+        f"{len(retrieved)} queries, top_k={args.top_k}, encoding={settings.CHUNK_ENCODING}"
+    )
+    print(
+        f"{'budget':>7} {'before':>8} {'after':>8} {'saved/query':>12} {'saved %':>8} {'sources':>8} "
+        f"{'kept':>6} {'pack p50 ms':>12}"
+    )
+    before = [
+        count_tokens(SEPARATOR.join(doc.page_content for doc in docs), settings.CHUNK_ENCODING)
+        for _, docs in retrieved
+    ]
+    for budget in args.budgets.split(","):
+        token_budget = None if budget.strip().lower() == "none" else int(budget)
+        after, sources, kept, timings = [], [], 0, []
+        for clause, docs in retrieved:
+            start = time.perf_counter()
+            packed = pack_context(docs, token_budget, settings.CHUNK_ENCODING)
+            timings.append(time.perf_counter() - start)
+            context = SEPARATOR.join(doc.page_content for doc in packed.documents)
+            after.append(count_tokens(context, settings.CHUNK_ENCODING))
+            sources.append(len(packed.documents))
+            kept += clause in context
+        saved = [b - a for b, a in zip(before, after)]
+        print(
+            f"{budget.strip():>7} {statistics.mean(before):>8.0f} {statistics.mean(after):>8.0f} "
+            f"{statistics.mean(saved):>12.0f} {100 * sum(saved) / sum(before):>7.1f}% "
+            f"{statistics.mean(sources):>8.2f} {kept / len(retrieved):>6.2f} "
+            f"{statistics.median(timings) * 1000:>12.2f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
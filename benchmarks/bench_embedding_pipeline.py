@@ -0,0 +1,56 @@
+"""Throughput of EmbeddingPipeline against a fake embedding backend.
+
+Run with: python -m benchmarks.bench_embedding_pipeline
+"""
+from langchain_core.documents import Document
+import argparse
+import asyncio
+import time
+from app.services.ingestion import EmbeddingPipeline
+from benchmarks.fakes import FakeEmbeddings, FakeVectorStore
+
+
+async def run_case(documents, batch_size: int, concurrency: int, latency: float, per_text_latency: float) -> float:
+    embeddings = FakeEmbeddings(latency=latency, per_text_latency=per_text_latency)
+    pipeline = EmbeddingPipeline(embeddings, batch_size=batch_size, concurrency=concurrency)
+    vectorstore = FakeVectorStore()
+    start = time.perf_counter()
+    indexed = await pipeline.add_documents(vectorstore, documents)
+    elapsed = time.perf_counter() - start
+    assert indexed == len(documents) == vectorstore._collection.count()
+    return len(documents) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=1000)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fixed seconds per embedding call")
+    parser.add_argument("--per-text-latency", type=float, default=0.0005, help="Extra seconds per text")
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[16, 64, 128])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    args = parser.parse_args()
+
+    documents = [
+        Document(page_content=f"chunk {i} " + "lorem ipsum " * 40, metadata={"source": "bench.pdf"})
+        for i in range(args.chunks)
+    ]
+
+    # Baseline: one synchronous call over every split, like Chroma.add_documents did
+    embeddings = FakeEmbeddings(latency=args.latency, per_text_latency=args.per_text_latency)
+    start = time.perf_counter()
+    embeddings.embed_documents([doc.page_content for doc in documents])
+    baseline = len(documents) / (time.perf_counter() - start)
+
+    print(f"{args.chunks} chunks, {args.latency * 1000:.0f}ms/call + {args.per_text_latency * 1000:.1f}ms/text")
+    print(f"single synchronous call: {baseline:8.1f} chunks/s (blocks the event loop)")
+    print(f"{'batch':>6} {'conc':>5} {'chunks/s':>10}")
+    for batch_size in args.batch_sizes:
+        for concurrency in args.concurrency:
+            rate = asyncio.run(run_case(
+                documents, batch_size, concurrency, args.latency, args.per_text_latency
+            ))
+            print(f"{batch_size:>6} {concurrency:>5} {rate:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
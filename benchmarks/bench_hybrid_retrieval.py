@@ -0,0 +1,83 @@
+"""Recall@k and latency of vector, keyword, hybrid (RRF) and fast-path retrieval.
+
+Run with: python -m benchmarks.bench_hybrid_retrieval
+"""
+from langchain_chroma import Chroma
+import argparse
+import random
+import statistics
+import time
+import uuid
+from app.services.keyword_index import KeywordIndex
+from app.services.retrievers import HybridRetriever
+from benchmarks.fakes import HashingEmbeddings
+
+TOPICS = ["renewal", "termination", "payment", "liability", "warranty", "delivery", "confidentiality", "pricing"]
+FILLER = "the parties agree that obligations under this agreement shall remain in force subject to applicable law".split()
+
+
+def build_corpus(size: int, rng: random.Random):
+    """Chunks mention a topic and an identifier; queries target one chunk by either"""
+    chunks, queries = [], []
+    for i in range(size):
+        topic = rng.choice(TOPICS)
+        sku = f"SKU-{10000 + i}"
+        clause = f"{i // 10 + 1}.{i % 10 + 1}"
+        words = rng.sample(FILLER, 10)
+        text = f"Clause {clause} on {topic}: item {sku} " + " ".join(words) + f" {topic} terms apply."
+        chunk_id = str(uuid.uuid4())
+        chunks.append((chunk_id, text))
+        queries.append((f"What does the contract say about {sku}?", chunk_id, "identifier"))
+        queries.append((f"{topic} terms for item {sku} under clause {clause}", chunk_id, "mixed"))
+    return chunks, queries
+
+
+def evaluate(name, retrieve, queries, k):
+    latencies, found = [], 0
+    for query, expected, _ in queries:
+        start = time.perf_counter()
+        docs = retrieve(query)
+        latencies.append(time.perf_counter() - start)
+        found += any(doc.metadata.get("chunk_id") == expected for doc in docs[:k])
+    latencies.sort()
+    p50 = statistics.median(latencies) * 1000
+    p99 = latencies[int(len(latencies) * 0.99) - 1] * 1000
+    print(f"{name:<16} recall@{k}={found / len(queries):.3f}  p50={p50:7.2f}ms  p99={p99:7.2f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--chunks", type=int, default=2000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=4)
+    parser.add_argument("--embed-latency", type=float, default=0.03, help="Seconds per query embedding")
+    args = parser.parse_args()
+
+    rng = random.Random(7)
+    chunks, queries = build_corpus(args.chunks, rng)
+    queries = rng.sample(queries, min(args.queries, len(queries)))
+
+    embeddings = HashingEmbeddings()
+    vectorstore = Chroma(collection_name=f"bench_{uuid.uuid4().hex}", embedding_function=embeddings)
+    ids = [chunk_id for chunk_id, _ in chunks]
+    texts = [text for _, text in chunks]
+    metadatas = [{"chunk_id": chunk_id} for chunk_id in ids]
+    for start in range(0, len(ids), 500):
+        vectorstore.add_texts(texts[start:start + 500], metadatas[start:start + 500], ids=ids[start:start + 500])
+    keyword_index = KeywordIndex()
+    keyword_index.add(ids, texts, metadatas)
+
+    # Only query embeddings pay the simulated remote latency
+    embeddings.latency = args.embed_latency
+    hybrid = HybridRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=args.k)
+    fast = HybridRetriever(vectorstore=vectorstore, keyword_index=keyword_index, k=args.k, fast_path_confidence=0.5)
+
+    print(f"{args.chunks} chunks, {len(queries)} queries, {args.embed_latency * 1000:.0f}ms per query embedding")
+    evaluate("vector", lambda q: vectorstore.similarity_search(q, k=args.k), queries, args.k)
+    evaluate("keyword (BM25)", lambda q: hybrid._keyword_docs(q)[0], queries, args.k)
+    evaluate("hybrid (RRF)", hybrid.invoke, queries, args.k)
+    evaluate("hybrid+fastpath", fast.invoke, queries, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""Chat latency while a login storm hits the server, with and without the dedicated hashing pool.
+
+Run with: python -m benchmarks.bench_login_storm --seconds 10 --login-concurrency 64
+
+Serves the real app under uvicorn with a fake LLM and embeddings. One user chats
+at a steady rate while --login-concurrency clients log in as fast as they can.
+Modes:
+
+  idle       no logins, the chat baseline
+  shared     bcrypt on the shared threadpool with no admission limit, as before
+  dedicated  bcrypt on the PASSWORD_HASH_WORKERS pool; logins beyond the queue get 503
+"""
+from fastapi.concurrency import run_in_threadpool
+import argparse
+import asyncio
+import os
+import shutil
+import tempfile
+import time
+import httpx
+from benchmarks.e2e import scenarios
+from benchmarks.e2e.corpus import generate_corpus
+from benchmarks.e2e.server import AppServer, configure
+
+API = "/api/v1"
+
+
+async def chat_loop(client: httpx.AsyncClient, headers, deadline: float, interval: float):
+    latencies, errors, index = [], 0, 0
+    while time.perf_counter() < deadline:
+        index += 1
+        start = time.perf_counter()
+        try:
+            response = await client.post(
+                f"{API}/chat/", json={"query": f"What period does clause 1.{index % 6 + 1} set? ({index})"},
+                headers=headers
+            )
+            response.raise_for_status()
+            latencies.append(time.perf_counter() - start)
+        except httpx.HTTPError:
+            errors += 1
+        await asyncio.sleep(max(0.0, interval - (time.perf_counter() - start)))
+    return latencies, errors
+
+
+async def login_loop(client: httpx.AsyncClient, email: str, deadline: float, outcomes: dict):
+    while time.perf_counter() < deadline:
+        try:
+            response = await client.post(
+                f"{API}/auth/login", data={"username": email, "password": scenarios.PASSWORD}
+            )
+            outcomes[response.status_code] = outcomes.get(response.status_code, 0) + 1
+            if response.status_code == 503:
+                # Well-behaved clients back off as told
+                await asyncio.sleep(float(response.headers.get("retry-after", 1)))
+        except httpx.HTTPError:
+            outcomes["error"] = outcomes.get("error", 0) + 1
+
+
+async def run_mode(base_url: str, chat_headers, storm_email: str, args, storm: bool):
+    limits = httpx.Limits(max_connections=args.login_concurrency + 8)
+    async with httpx.AsyncClient(base_url=base_url, timeout=120, limits=limits) as client:
+        deadline = time.perf_counter() + args.seconds
+        outcomes: dict = {}
+        logins = [
+            login_loop(client, storm_email, deadline, outcomes)
+            for _ in range(args.login_concurrency if storm else 0)
+        ]
+        (latencies, errors), *_ = await asyncio.gather(
+            chat_loop(client, chat_headers, deadline, args.chat_interval), *logins
+        )
+    return scenarios.summarize(latencies), errors, outcomes
+
+
+async def prepare(base_url: str, corpus_file: str):
+    async with httpx.AsyncClient(base_url=base_url, timeout=120) as client:
+        headers = await scenarios.create_user(client, "storm-chat@example.com")
+        job = await scenarios.upload(client, headers, corpus_file)
+        await scenarios.wait_for_job(client, headers, job["job_id"])
+        await scenarios.create_user(client, "storm-login@example.com")
+    return headers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=10.0, help="duration of each mode")
+    parser.add_argument("--login-concurrency", type=int, default=64)
+    parser.add_argument("--chat-interval", type=float, default=0.25, help="seconds between chat requests")
+    parser.add_argument("--llm-latency", type=float, default=0.05)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docmind_login_bench_")
+    configure(workdir, args.llm_latency, 0.0, 0.0, 0.0)
+    try:
+        import main as docmind
+        from app.services.password_hashing import get_password_hasher
+
+        hasher = get_password_hasher()
+        corpus = generate_corpus(os.path.join(workdir, "corpus"), 0, docs_per_format=1, pages=3)
+        corpus_file = next(file["path"] for file in corpus if file["format"] == ".txt")
+
+        print(
+            f"login_concurrency={args.login_concurrency} hash_workers={hasher.max_workers} "
+            f"hash_queue={hasher.max_queued} seconds={args.seconds}"
+        )
+        print(f"{'mode':>10} {'chat p50':>9} {'chat p99':>9} {'chat err':>9} {'login 200':>10} {'login 503':>10}")
+        with AppServer(docmind.app) as server:
+            chat_headers = asyncio.run(prepare(server.base_url, corpus_file))
+            for mode in ("idle", "shared", "dedicated"):
+                if mode == "shared":
+                    # Hash on the same threadpool as every other blocking call, with no limit
+                    hasher._run = lambda stage, function, *call_args: run_in_threadpool(function, *call_args)
+                else:
+                    hasher.__dict__.pop("_run", None)
+                latency, errors, outcomes = asyncio.run(run_mode(
+                    server.base_url, chat_headers, "storm-login@example.com", args, storm=mode != "idle"
+                ))
+                print(
+                    f"{mode:>10} {latency.get('p50_ms', 0):>9.1f} {latency.get('p99_ms', 0):>9.1f} {errors:>9} "
+                    f"{outcomes.get(200, 0):>10} {outcomes.get(503, 0):>10}"
+                )
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,129 @@
+"""Cold start: import time, startup and time to first request, in fresh interpreters.
+
+Run with: python -m benchmarks.bench_startup --runs 3
+
+Each run starts a new Python process that imports main, runs its lifespan startup
+(through TestClient) and sends one request. Modes:
+
+  lazy   WARM_UP_ON_STARTUP=false: components are built by the first request that needs them
+  warm   WARM_UP_ON_STARTUP=true: components are built in the background after startup;
+         "ready" is when /health/ready first returns 200
+
+To compare against an older tree, check it out with `git worktree add /tmp/before <ref>`
+and pass --repo /tmp/before. Trees without /health/ready built everything at import,
+so they count as ready once the first request is answered.
+
+Also prints the slowest imports under `import main`, from python -X importtime.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+CHILD = r"""
+import json, sys, time
+start = time.perf_counter()
+import main
+imported = time.perf_counter()
+from fastapi.testclient import TestClient
+with TestClient(main.app) as client:
+    started = time.perf_counter()
+    status = client.get(main.settings.API_V1_STR + "/auth/me", headers={"Authorization": "Bearer x"}).status_code
+    first = time.perf_counter()
+    first_wall = time.time()
+    ready = first
+    while True:
+        response = client.get("/health/ready")
+        if response.status_code != 503:
+            ready = time.perf_counter() if response.status_code == 200 else first
+            break
+        time.sleep(0.01)
+print(json.dumps({
+    "import_s": imported - start,
+    "startup_s": started - imported,
+    "first_request_s": first - started,
+    "ready_s": ready - start,
+    "first_request_wall": first_wall,
+    "status": status
+}))
+"""
+
+
+def child_env(workdir: str, warm_up: bool) -> dict:
+    env = dict(os.environ)
+    env.setdefault("SECRET_KEY", "benchmark")
+    env.setdefault("GOOGLE_API_KEY", "benchmark")
+    env.update({
+        "DATABASE_URL": f"sqlite:///{workdir}/docmind.db",
+        "VECTOR_STORE_PATH": f"{workdir}/chroma_db",
+        "UPLOAD_FOLDER": f"{workdir}/uploads",
+        "EMBEDDING_CACHE_PATH": f"{workdir}/embedding_cache/embeddings.sqlite3",
+        "WARM_UP_ON_STARTUP": "true" if warm_up else "false",
+        "PYTHONDONTWRITEBYTECODE": "1"
+    })
+    return env
+
+
+def run_once(repo: str, warm_up: bool) -> dict:
+    with tempfile.TemporaryDirectory(prefix="docmind_startup_") as workdir:
+        spawned = time.time()
+        result = subprocess.run(
+            [sys.executable, "-c", CHILD], cwd=repo, env=child_env(workdir, warm_up),
+            capture_output=True, text=True
+        )
+    if result.returncode != 0:
+        raise RuntimeError(f"Benchmark child failed:\n{result.stderr[-2000:]}")
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    timings["time_to_first_request_s"] = timings.pop("first_request_wall") - spawned
+    return timings
+
+
+def slowest_imports(repo: str, count: int) -> list:
+    with tempfile.TemporaryDirectory(prefix="docmind_startup_") as workdir:
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", "import main"], cwd=repo,
+            env=child_env(workdir, False), capture_output=True, text=True
+        )
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        # Only modules imported directly by a top-level import, so nested ones aren't counted twice
+        if len(name) - len(name.lstrip(" ")) != 3:
+            continue
+        rows.append((int(cumulative) / 1e6, name.strip()))
+    return [row for row in sorted(rows, reverse=True)[:count] if row[0] >= 0.01]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=3)
+    parser.add_argument("--repo", default=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    parser.add_argument("--top", type=int, default=8, help="slowest imports to list")
+    args = parser.parse_args()
+
+    print(f"repo={args.repo} runs={args.runs} (median seconds)")
+    print(f"{'mode':>6} {'import':>8} {'startup':>8} {'first req':>10} {'to first req':>13} {'ready':>7}")
+    for mode in ("lazy", "warm"):
+        runs = [run_once(args.repo, warm_up=mode == "warm") for _ in range(args.runs)]
+
+        def median(key: str) -> float:
+            return statistics.median(run[key] for run in runs)
+
+        print(
+            f"{mode:>6} {median('import_s'):>8.2f} {median('startup_s'):>8.2f} {median('first_request_s'):>10.3f} "
+            f"{median('time_to_first_request_s'):>13.2f} {median('ready_s'):>7.2f}"
+        )
+
+    print("\nslowest imports under `import main` (cumulative seconds):")
+    for seconds, name in slowest_imports(args.repo, args.top):
+        print(f"  {seconds:>6.2f}  {name}")
+
+
+if __name__ == "__main__":
+    main()
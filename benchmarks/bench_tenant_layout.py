@@ -0,0 +1,106 @@
+"""Query latency and disk footprint by VECTORSTORE_LAYOUT as the number of tenants grows.
+
+Run with: python -m benchmarks.bench_tenant_layout --tenants 1000 10000
+
+Every tenant gets --chunks hash-embedded chunks. Queries go through the vectorstore
+pool for randomly chosen tenants, so "cold" includes opening a handle the pool had
+evicted and "warm" repeats the query on an open handle. Building 10k per-user
+databases takes several minutes.
+"""
+from typing import Dict, List, Tuple
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+import logging
+from app.services.vectorstore_pool import PER_USER, SHARED, VectorStorePool
+from benchmarks.fakes import HashingEmbeddings
+
+
+def disk_usage(path: str) -> Tuple[int, int]:
+    size, files = 0, 0
+    for root, _, names in os.walk(path):
+        for name in names:
+            size += os.path.getsize(os.path.join(root, name))
+            files += 1
+    return size, files
+
+
+def populate(pool: VectorStorePool, embeddings: HashingEmbeddings, tenants: int, chunks: int) -> float:
+    start = time.perf_counter()
+    for tenant in range(tenants):
+        user_id = str(tenant)
+        texts = [f"tenant {tenant} section {i} covers renewal notice and late fees" for i in range(chunks)]
+        vectorstore = pool.get(user_id, create=True)
+        vectorstore._collection.upsert(
+            ids=[f"{user_id}-{i}" for i in range(chunks)],
+            embeddings=embeddings.embed_documents(texts),
+            documents=texts,
+            metadatas=[{"page": i} for i in range(chunks)]
+        )
+        pool.evict(user_id)
+    return time.perf_counter() - start
+
+
+def percentile(values: List[float], fraction: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def run(layout: str, tenants: int, chunks: int, shards: int, queries: int, pool_size: int) -> Dict:
+    directory = tempfile.mkdtemp(prefix=f"bench_{layout}_")
+    embeddings = HashingEmbeddings()
+    try:
+        pool = VectorStorePool(directory, embeddings, max_size=pool_size, layout=layout, shards=shards)
+        build_seconds = populate(pool, embeddings, tenants, chunks)
+        size, files = disk_usage(directory)
+
+        rng = random.Random(0)
+        cold, warm = [], []
+        for _ in range(queries):
+            user_id = str(rng.randrange(tenants))
+            start = time.perf_counter()
+            docs = pool.get(user_id).similarity_search("renewal notice", k=4)
+            cold.append(time.perf_counter() - start)
+            assert all(doc.page_content.startswith(f"tenant {user_id} ") for doc in docs)
+            start = time.perf_counter()
+            pool.get(user_id).similarity_search("late fees", k=4)
+            warm.append(time.perf_counter() - start)
+        return {
+            "build_s": build_seconds,
+            "disk_mb": size / 1024 / 1024,
+            "files": files,
+            "cold_p50_ms": statistics.median(cold) * 1000,
+            "cold_p95_ms": percentile(cold, 0.95) * 1000,
+            "warm_p50_ms": statistics.median(warm) * 1000
+        }
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--chunks", type=int, default=20, help="chunks per tenant")
+    parser.add_argument("--shards", type=int, default=1)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--pool-size", type=int, default=64)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+
+    columns = ["build_s", "disk_mb", "files", "cold_p50_ms", "cold_p95_ms", "warm_p50_ms"]
+    print(f"{'layout':>9} {'tenants':>8} " + " ".join(f"{column:>12}" for column in columns))
+    for tenants in args.tenants:
+        for layout in (PER_USER, SHARED):
+            result = run(layout, tenants, args.chunks, args.shards, args.queries, args.pool_size)
+            cells = " ".join(
+                f"{result[column]:>12}" if column == "files" else f"{result[column]:>12.2f}" for column in columns
+            )
+            print(f"{layout:>9} {tenants:>8} {cells}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,200 @@
+"""Search latency and resident memory for small tenants: per-user Chroma vs the compact NumPy index.
+
+Run with: python -m benchmarks.bench_vector_index --tenants 50 --chunks 2000 --dimensions 768
+
+Every tenant gets --chunks random embeddings in its own Chroma database (the
+per_user layout). Each backend is then measured in a fresh interpreter, so RSS
+isn't shared between them:
+
+  chroma    VECTOR_INDEX_BACKEND=chroma, a persistent Chroma client per tenant
+  float16   VECTOR_INDEX_BACKEND=compact with COMPACT_INDEX_DTYPE=float16
+  int8      VECTOR_INDEX_BACKEND=compact with COMPACT_INDEX_DTYPE=int8
+
+"cold" is the first search of a tenant, including opening its handle; "warm"
+repeats searches on open handles. RSS is measured after every tenant has been
+searched once, relative to the interpreter with everything imported; for the
+compact backends it includes each tenant's open keyword index connection, which
+they read chunk text from (hybrid retrieval opens it with either backend). The
+compact indexes are built from the Chroma collections beforehand, as they would
+be on the first search after switching backends. recall@k is the overlap with
+exact float32 cosine top-k.
+"""
+from typing import Dict
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import logging
+
+RESULT_PREFIX = "RESULT "
+
+
+def tenant_vectors(tenant: int, chunks: int, dimensions: int):
+    """Unit-length, like the Google embeddings, so Chroma's L2 ranking matches cosine"""
+    import numpy as np
+
+    vectors = np.random.default_rng(tenant).normal(size=(chunks, dimensions)).astype(np.float32)
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def query_vectors(count: int, dimensions: int):
+    import numpy as np
+
+    return np.random.default_rng(10_000).normal(size=(count, dimensions)).astype(np.float32)
+
+
+def make_pool(directory: str, dimensions: int, tenants: int, dtype: str = None):
+    from app.services.vectorstore_pool import VectorStorePool
+    from benchmarks.fakes import HashingEmbeddings
+
+    return VectorStorePool(
+        directory, HashingEmbeddings(dimensions=dimensions), max_size=tenants,
+        compact_max_chunks=1_000_000 if dtype else 0, compact_dtype=dtype or "float16"
+    )
+
+
+def populate(directory: str, tenants: int, chunks: int, dimensions: int) -> float:
+    pool = make_pool(directory, dimensions, tenants)
+    start = time.perf_counter()
+    for tenant in range(tenants):
+        user_id = str(tenant)
+        vectors = tenant_vectors(tenant, chunks, dimensions)
+        vectorstore = pool.get(user_id, create=True)
+        for offset in range(0, chunks, 1000):
+            count = min(1000, chunks - offset)
+            vectorstore._collection.upsert(
+                ids=[f"{user_id}-{i}" for i in range(offset, offset + count)],
+                embeddings=vectors[offset:offset + count].tolist(),
+                documents=[f"tenant {tenant} chunk {i}" for i in range(offset, offset + count)],
+                metadatas=[{"page": i} for i in range(offset, offset + count)]
+            )
+        # Written at ingestion in the app; the compact store reads chunk text from it
+        pool.keyword_index(user_id)
+        pool.evict(user_id)
+    return time.perf_counter() - start
+
+
+def build_compact(directory: str, tenants: int, dimensions: int, dtype: str) -> None:
+    from app.services.vectorstore_pool import VECTOR_INDEX_FILE
+
+    pool = make_pool(directory, dimensions, tenants, dtype)
+    for tenant in range(tenants):
+        user_path = pool.user_path(str(tenant))
+        for name in os.listdir(user_path):
+            if name == VECTOR_INDEX_FILE or name.startswith(("vectors-", "scales-")):
+                os.unlink(os.path.join(user_path, name))
+        pool.vector_index(str(tenant))
+        pool.evict(str(tenant))
+
+
+def measure(directory: str, tenants: int, chunks: int, dimensions: int, dtype: str, queries: int, k: int) -> Dict:
+    import numpy as np
+    from benchmarks.e2e.scenarios import rss_bytes
+
+    probes = query_vectors(queries, dimensions)
+    pool = make_pool(directory, dimensions, tenants, dtype)
+    # After the imports, so only what the open tenants hold is counted
+    rss_before = rss_bytes()
+
+    cold = []
+    for tenant in range(tenants):
+        start = time.perf_counter()
+        pool.retrieval_store(str(tenant)).similarity_search_by_vector(probes[tenant % queries].tolist(), k=k)
+        cold.append(time.perf_counter() - start)
+    rss_after = rss_bytes()
+
+    rng = random.Random(0)
+    warm, recalls = [], []
+    for index in range(queries):
+        tenant = rng.randrange(tenants)
+        probe = probes[index].tolist()
+        start = time.perf_counter()
+        docs = pool.retrieval_store(str(tenant)).similarity_search_by_vector(probe, k=k)
+        warm.append(time.perf_counter() - start)
+
+        vectors = tenant_vectors(tenant, chunks, dimensions)
+        scores = vectors @ probes[index]
+        exact = {f"tenant {tenant} chunk {i}" for i in np.argsort(-scores)[:k]}
+        recalls.append(len(exact & {doc.page_content for doc in docs}) / k)
+
+    ordered = sorted(warm)
+    return {
+        "cold_p50_ms": statistics.median(cold) * 1000,
+        "warm_p50_ms": statistics.median(warm) * 1000,
+        "warm_p95_ms": ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000,
+        "rss_mb": (rss_after - rss_before) / 1024 / 1024 if rss_before and rss_after else float("nan"),
+        "recall": statistics.mean(recalls),
+        "open_clients": pool.stats()["open_clients"]
+    }
+
+
+def run_child(args, directory: str, dtype: str) -> Dict:
+    payload = json.dumps({
+        "directory": directory, "tenants": args.tenants, "chunks": args.chunks,
+        "dimensions": args.dimensions, "dtype": dtype, "queries": args.queries, "k": args.k
+    })
+    repo = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    result = subprocess.run(
+        [sys.executable, "-m", "benchmarks.bench_vector_index", "--child", payload],
+        cwd=repo, capture_output=True, text=True
+    )
+    lines = [line for line in result.stdout.splitlines() if line.startswith(RESULT_PREFIX)]
+    if result.returncode != 0 or not lines:
+        raise RuntimeError(f"Benchmark child failed:\n{result.stderr[-2000:]}")
+    return json.loads(lines[-1][len(RESULT_PREFIX):])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--tenants", type=int, default=50)
+    parser.add_argument("--chunks", type=int, default=2000, help="chunks per tenant")
+    parser.add_argument("--dimensions", type=int, default=768)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=20, help="results per search, e.g. RETRIEVAL_CANDIDATES")
+    parser.add_argument("--child", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    logging.disable(logging.INFO)
+    # Settings are required on import; nothing here touches the database or Google
+    for key, value in {"SECRET_KEY": "benchmark", "GOOGLE_API_KEY": "benchmark", "DATABASE_URL": "sqlite://"}.items():
+        os.environ.setdefault(key, value)
+
+    if args.child:
+        options = json.loads(args.child)
+        result = measure(
+            options["directory"], options["tenants"], options["chunks"], options["dimensions"],
+            options["dtype"], options["queries"], options["k"]
+        )
+        print(RESULT_PREFIX + json.dumps(result))
+        return
+
+    directory = tempfile.mkdtemp(prefix="bench_vector_index_")
+    try:
+        build_seconds = populate(directory, args.tenants, args.chunks, args.dimensions)
+        print(
+            f"tenants={args.tenants} chunks={args.chunks} dimensions={args.dimensions} k={args.k} "
+            f"(populated in {build_seconds:.1f}s)"
+        )
+        columns = ["cold_p50_ms", "warm_p50_ms", "warm_p95_ms", "rss_mb", "recall", "open_clients"]
+        print(f"{'backend':>8} " + " ".join(f"{column:>12}" for column in columns))
+        for backend in ("chroma", "float16", "int8"):
+            dtype = None if backend == "chroma" else backend
+            if dtype:
+                build_compact(directory, args.tenants, args.dimensions, dtype)
+            result = run_child(args, directory, dtype)
+            cells = " ".join(
+                f"{result[column]:>12}" if column == "open_clients" else f"{result[column]:>12.2f}"
+                for column in columns
+            )
+            print(f"{backend:>8} {cells}")
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
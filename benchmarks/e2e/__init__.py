@@ -0,0 +1,4 @@
+"""End-to-end benchmark of the real app with fake Google clients.
+
+Run with: python -m benchmarks.e2e --output results.json
+"""
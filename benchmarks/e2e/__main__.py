@@ -0,0 +1,140 @@
+"""End-to-end benchmark: the real FastAPI app with deterministic, latency-configurable fakes
+for the Google chat model and embeddings.
+
+Run with: python -m benchmarks.e2e --output results.json
+
+Scenarios: upload throughput over a generated PDF/DOCX/PPTX/TXT corpus, concurrent
+chat latency (plain and streaming) and memory growth per user. Results are printed
+as JSON, with the git commit and settings, so runs can be compared across commits.
+"""
+from datetime import datetime, timezone
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import httpx
+from benchmarks.e2e import scenarios
+from benchmarks.e2e.corpus import generate_corpus
+from benchmarks.e2e.server import AppServer, configure
+
+SECRET_SETTINGS = {"SECRET_KEY", "GOOGLE_API_KEY", "DATABASE_URL"}
+
+
+def git_commit() -> str:
+    try:
+        commit = subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+        return f"{commit}-dirty" if dirty else commit
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+async def run_scenarios(base_url: str, args, workdir: str) -> dict:
+    limits = httpx.Limits(max_connections=max(args.concurrency, args.upload_concurrency) + 4)
+    async with httpx.AsyncClient(base_url=base_url, timeout=args.timeout, limits=limits) as client:
+        users = [await scenarios.create_user(client, f"user{index}@example.com") for index in range(args.users)]
+        corpora = [
+            generate_corpus(os.path.join(workdir, "corpus", str(index)), index, args.docs_per_format, args.pages)
+            for index in range(args.users)
+        ]
+        results = {
+            "upload_throughput": await scenarios.upload_throughput(client, users, corpora, args.upload_concurrency),
+            "chat": await scenarios.chat_latency(client, users, args.chat_requests, args.concurrency),
+            "chat_stream": await scenarios.chat_latency(
+                client, users, args.chat_requests, args.concurrency, stream=True
+            )
+        }
+        memory_file = next(file["path"] for file in corpora[0] if file["format"] == ".txt")
+        results["memory_per_user"] = await scenarios.memory_per_user(
+            client, args.memory_users, memory_file, "memory"
+        )
+        results["stages"] = await scenarios.stage_timings(client)
+    return results
+
+
+def app_stats(llm, embeddings) -> dict:
+    from app.core.components import build_chat_manager
+
+    chat_manager = build_chat_manager()
+    stats = {
+        "llm_calls": llm.calls,
+        "embedding_calls": embeddings.calls,
+        "texts_embedded": embeddings.texts_embedded,
+        "vectorstore_pool": chat_manager.vectorstores.stats(),
+        "conversations": chat_manager.conversations.stats()
+    }
+    if chat_manager.answer_cache is not None:
+        stats["answer_cache"] = chat_manager.answer_cache.stats()
+    return stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--output", help="also write the JSON results to this file")
+    parser.add_argument("--users", type=int, default=4)
+    parser.add_argument("--docs-per-format", type=int, default=2)
+    parser.add_argument("--pages", type=int, default=5, help="pages (or slides/sections) per document")
+    parser.add_argument("--upload-concurrency", type=int, default=8)
+    parser.add_argument("--chat-requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16, help="concurrent chat requests")
+    parser.add_argument("--memory-users", type=int, default=20)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="seconds per LLM call")
+    parser.add_argument("--token-latency", type=float, default=0.005, help="seconds per streamed word")
+    parser.add_argument("--embedding-latency", type=float, default=0.05, help="seconds per embedding call")
+    parser.add_argument("--per-text-latency", type=float, default=0.0005, help="extra seconds per embedded text")
+    parser.add_argument("--timeout", type=float, default=120.0)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch directory")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="docmind_bench_")
+    llm, embeddings = configure(
+        workdir, args.llm_latency, args.token_latency, args.embedding_latency, args.per_text_latency
+    )
+    try:
+        # Imported only now: settings are read, and the fakes installed, at import time
+        import main as docmind
+        from app.core.config import settings
+
+        start = time.perf_counter()
+        with AppServer(docmind.app) as server:
+            results = asyncio.run(run_scenarios(server.base_url, args, workdir))
+            stats = app_stats(llm, embeddings)
+
+        report = {
+            "meta": {
+                "commit": git_commit(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "seconds": round(time.perf_counter() - start, 2),
+                "args": {key: value for key, value in vars(args).items() if key not in ("output", "keep")},
+                "settings": {
+                    key: value for key, value in settings.model_dump().items() if key not in SECRET_SETTINGS
+                }
+            },
+            "scenarios": results,
+            "app": stats
+        }
+        output = json.dumps(report, indent=2, default=str)
+        print(output)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                f.write(output + "\n")
+    finally:
+        if not args.keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+"""Deterministic PDF, DOCX, PPTX and TXT documents for the end-to-end benchmark"""
+from typing import Dict, List
+import os
+import random
+
+FORMATS = (".pdf", ".docx", ".pptx", ".txt")
+WORDS = (
+    "agreement supplier customer invoice payment schedule renewal termination notice liability "
+    "warranty delivery service level credit penalty audit confidentiality data retention annex"
+).split()
+
+
+def make_pages(rng: random.Random, pages: int, paragraphs_per_page: int = 6) -> List[List[str]]:
+    """Pages of paragraphs; each paragraph states a numbered fact that chat queries can ask about"""
+    result = []
+    for page in range(pages):
+        paragraphs = []
+        for number in range(paragraphs_per_page):
+            filler = " ".join(rng.choice(WORDS) for _ in range(rng.randint(30, 60)))
+            paragraphs.append(
+                f"Clause {page + 1}.{number + 1} sets the {rng.choice(WORDS)} period to "
+                f"{rng.randint(5, 90)} days. {filler.capitalize()}."
+            )
+        result.append(paragraphs)
+    return result
+
+
+def _pdf_escape(text: str) -> str:
+    return text.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)")
+
+
+def _wrap(text: str, width: int = 95) -> List[str]:
+    lines, line = [], ""
+    for word in text.split():
+        if line and len(line) + len(word) + 1 > width:
+            lines.append(line)
+            line = word
+        else:
+            line = f"{line} {word}".strip()
+    if line:
+        lines.append(line)
+    return lines
+
+
+def write_pdf(path: str, pages: List[List[str]]) -> None:
+    """A minimal text-only PDF (Helvetica, one content stream per page) that pypdf can extract"""
+    objects: List[bytes] = []
+    page_ids = [4 + 2 * index for index in range(len(pages))]
+    objects.append(b"<< /Type /Catalog /Pages 2 0 R >>")
+    kids = " ".join(f"{page_id} 0 R" for page_id in page_ids)
+    objects.append(f"<< /Type /Pages /Kids [{kids}] /Count {len(pages)} >>".encode())
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    for page_id, paragraphs in zip(page_ids, pages):
+        lines = []
+        for paragraph in paragraphs:
+            lines.extend(_wrap(paragraph))
+            lines.append("")
+        body = "".join(f"({_pdf_escape(line)}) '\n" for line in lines[:60])
+        stream = f"BT /F1 9 Tf 11 TL 40 800 Td\n{body}ET".encode("latin-1")
+        objects.append(
+            f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+            f"/Resources << /Font << /F1 3 0 R >> >> /Contents {page_id + 1} 0 R >>".encode()
+        )
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n".encode() + stream + b"\nendstream")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, obj in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += f"{number} 0 obj\n".encode() + obj + b"\nendobj\n"
+    xref = len(output)
+    output += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n".encode()
+    output += "".join(f"{offset:010d} 00000 n \n" for offset in offsets).encode()
+    output += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n".encode()
+    with open(path, "wb") as f:
+        f.write(output)
+
+
+def write_docx(path: str, pages: List[List[str]]) -> None:
+    import docx
+
+    document = docx.Document()
+    for number, paragraphs in enumerate(pages, start=1):
+        document.add_heading(f"Section {number}", level=1)
+        for paragraph in paragraphs:
+            document.add_paragraph(paragraph)
+    document.save(path)
+
+
+def write_pptx(path: str, pages: List[List[str]]) -> None:
+    import pptx
+
+    presentation = pptx.Presentation()
+    for number, paragraphs in enumerate(pages, start=1):
+        slide = presentation.slides.add_slide(presentation.slide_layouts[1])
+        slide.shapes.title.text = f"Section {number}"
+        slide.placeholders[1].text = "\n".join(paragraphs)
+    presentation.save(path)
+
+
+def write_txt(path: str, pages: List[List[str]]) -> None:
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("\n\n".join("\n\n".join(paragraphs) for paragraphs in pages))
+
+
+WRITERS = {".pdf": write_pdf, ".docx": write_docx, ".pptx": write_pptx, ".txt": write_txt}
+
+
+def generate_corpus(directory: str, seed: int, docs_per_format: int = 2, pages: int = 5) -> List[Dict]:
+    """Write docs_per_format documents of each format; returns [{path, format, bytes}]"""
+    os.makedirs(directory, exist_ok=True)
+    rng = random.Random(seed)
+    files = []
+    for extension in FORMATS:
+        for index in range(docs_per_format):
+            path = os.path.join(directory, f"doc_{seed}_{index}{extension}")
+            WRITERS[extension](path, make_pages(rng, pages))
+            files.append({"path": path, "format": extension, "bytes": os.path.getsize(path)})
+    return files
@@ -0,0 +1,219 @@
+"""Benchmark scenarios; each takes an httpx.AsyncClient pointed at the running app and returns a dict"""
+from typing import Dict, List, Optional
+import asyncio
+import gc
+import os
+import statistics
+import time
+import httpx
+
+API = "/api/v1"
+FINISHED = {"succeeded", "failed", "cancelled", "skipped"}
+PASSWORD = "benchmark-password"
+
+
+def summarize(seconds: List[float]) -> Dict:
+    """Latency percentiles in milliseconds (nearest rank)"""
+    if not seconds:
+        return {"count": 0}
+    ordered = sorted(seconds)
+
+    def rank(fraction: float) -> float:
+        return round(ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] * 1000, 2)
+
+    return {
+        "count": len(ordered),
+        "mean_ms": round(statistics.fmean(ordered) * 1000, 2),
+        "p50_ms": rank(0.50),
+        "p90_ms": rank(0.90),
+        "p99_ms": rank(0.99),
+        "max_ms": round(ordered[-1] * 1000, 2)
+    }
+
+
+def rss_bytes() -> Optional[int]:
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        pass
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        return None
+
+
+async def create_user(client: httpx.AsyncClient, email: str) -> Dict[str, str]:
+    """Sign up and log in; returns the auth headers"""
+    await client.post(f"{API}/auth/signup", json={"email": email, "password": PASSWORD, "name": "Bench"})
+    response = await client.post(f"{API}/auth/login", data={"username": email, "password": PASSWORD})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+
+async def upload(client: httpx.AsyncClient, headers: Dict[str, str], path: str) -> Dict:
+    with open(path, "rb") as f:
+        content = f.read()
+    response = await client.post(
+        f"{API}/documents/upload",
+        files={"file": (os.path.basename(path), content)},
+        headers=headers
+    )
+    response.raise_for_status()
+    return response.json()
+
+
+async def wait_for_job(client: httpx.AsyncClient, headers: Dict[str, str], job_id: str, poll: float = 0.05) -> Dict:
+    while True:
+        response = await client.get(f"{API}/documents/jobs/{job_id}", headers=headers)
+        response.raise_for_status()
+        job = response.json()
+        if job["status"] in FINISHED:
+            return job
+        await asyncio.sleep(poll)
+
+
+async def upload_throughput(
+    client: httpx.AsyncClient,
+    users: List[Dict[str, str]],
+    corpora: List[List[Dict]],
+    concurrency: int
+) -> Dict:
+    """Every user uploads their own corpus; timed until every ingestion job has finished"""
+    semaphore = asyncio.Semaphore(concurrency)
+    request_seconds = []
+
+    async def ingest(headers: Dict[str, str], file: Dict) -> Dict:
+        async with semaphore:
+            start = time.perf_counter()
+            job = await upload(client, headers, file["path"])
+            request_seconds.append(time.perf_counter() - start)
+        job = await wait_for_job(client, headers, job["job_id"])
+        return {**file, "status": job["status"], "chunks": job["chunks_indexed"], "error": job["error"]}
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(
+        ingest(headers, file) for headers, corpus in zip(users, corpora) for file in corpus
+    ))
+    elapsed = time.perf_counter() - start
+
+    by_format: Dict[str, Dict] = {}
+    for result in results:
+        entry = by_format.setdefault(result["format"], {"files": 0, "succeeded": 0, "chunks": 0, "errors": []})
+        entry["files"] += 1
+        if result["status"] == "succeeded":
+            entry["succeeded"] += 1
+            entry["chunks"] += result["chunks"]
+        elif result["error"] and result["error"] not in entry["errors"]:
+            entry["errors"].append(result["error"])
+
+    succeeded = [result for result in results if result["status"] == "succeeded"]
+    total_bytes = sum(result["bytes"] for result in succeeded)
+    chunks = sum(result["chunks"] for result in succeeded)
+    return {
+        "users": len(users),
+        "files": len(results),
+        "succeeded": len(succeeded),
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(succeeded) / elapsed, 3),
+        "mb_per_second": round(total_bytes / 1024 / 1024 / elapsed, 3),
+        "chunks_per_second": round(chunks / elapsed, 2),
+        "upload_request": summarize(request_seconds),
+        "by_format": by_format
+    }
+
+
+async def chat_latency(
+    client: httpx.AsyncClient,
+    users: List[Dict[str, str]],
+    requests: int,
+    concurrency: int,
+    stream: bool = False
+) -> Dict:
+    """Concurrent chat requests spread round-robin over users; every query is distinct, so none hit the answer cache"""
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies, first_tokens, errors = [], [], []
+
+    async def ask(index: int) -> None:
+        headers = users[index % len(users)]
+        endpoint = "stream" if stream else "chat"
+        query = {"query": f"What period does clause {index % 5 + 1}.{index % 6 + 1} set? ({endpoint} request {index})"}
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                if stream:
+                    first_token = None
+                    async with client.stream("POST", f"{API}/chat/stream", json=query, headers=headers) as response:
+                        response.raise_for_status()
+                        async for line in response.aiter_lines():
+                            if first_token is None and line == "event: token":
+                                first_token = time.perf_counter() - start
+                            elif line == "event: error":
+                                raise RuntimeError("error event in chat stream")
+                    if first_token is not None:
+                        first_tokens.append(first_token)
+                else:
+                    response = await client.post(f"{API}/chat/", json=query, headers=headers)
+                    response.raise_for_status()
+                latencies.append(time.perf_counter() - start)
+            except (httpx.HTTPError, RuntimeError) as e:
+                errors.append(str(e))
+
+    start = time.perf_counter()
+    await asyncio.gather(*(ask(index) for index in range(requests)))
+    elapsed = time.perf_counter() - start
+    result = {
+        "endpoint": "/chat/stream" if stream else "/chat/",
+        "requests": requests,
+        "concurrency": concurrency,
+        "errors": len(errors),
+        "requests_per_second": round(len(latencies) / elapsed, 3),
+        "latency": summarize(latencies)
+    }
+    if stream:
+        result["time_to_first_token"] = summarize(first_tokens)
+    if errors:
+        result["first_error"] = errors[0]
+    return result
+
+
+async def memory_per_user(client: httpx.AsyncClient, users: int, path: str, email_prefix: str) -> Dict:
+    """Resident memory growth as users sign up, upload a document and start a conversation"""
+    gc.collect()
+    before = rss_bytes()
+    for index in range(users):
+        headers = await create_user(client, f"{email_prefix}{index}@example.com")
+        job = await upload(client, headers, path)
+        await wait_for_job(client, headers, job["job_id"])
+        response = await client.post(f"{API}/chat/", json={"query": "What period does clause 1.1 set?"}, headers=headers)
+        response.raise_for_status()
+    gc.collect()
+    after = rss_bytes()
+    if before is None or after is None:
+        return {"users": users, "rss_available": False}
+    return {
+        "users": users,
+        "rss_before_mb": round(before / 1024 / 1024, 2),
+        "rss_after_mb": round(after / 1024 / 1024, 2),
+        "kb_per_user": round((after - before) / 1024 / users, 1)
+    }
+
+
+async def stage_timings(client: httpx.AsyncClient) -> Dict:
+    """Per-stage counts and mean durations scraped from /metrics; empty when metrics are disabled"""
+    response = await client.get("/metrics")
+    if response.status_code != 200:
+        return {}
+    totals: Dict[str, Dict] = {}
+    for line in response.text.splitlines():
+        for suffix in ("_sum", "_count"):
+            prefix = f"docmind_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, value = line[len(prefix):].split("\"} ")
+                totals.setdefault(stage, {})[suffix[1:]] = float(value)
+    return {
+        stage: {"count": int(values["count"]), "mean_ms": round(values["sum"] / values["count"] * 1000, 2)}
+        for stage, values in sorted(totals.items())
+        if values.get("count")
+    }
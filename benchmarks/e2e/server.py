@@ -0,0 +1,78 @@
+"""Runs the real FastAPI app in-process with the Google clients swapped for fakes"""
+from typing import Tuple
+import os
+import socket
+import threading
+import time
+import uvicorn
+from benchmarks.fakes import FakeChatModel, HashingEmbeddings
+
+
+def configure(
+    workdir: str,
+    llm_latency: float,
+    token_latency: float,
+    embedding_latency: float,
+    per_text_latency: float
+) -> Tuple[FakeChatModel, HashingEmbeddings]:
+    """Point the app at a scratch directory and install the fakes; must run before main is imported.
+
+    Settings already present in the environment win, so a run can be repeated with
+    e.g. VECTORSTORE_LAYOUT=shared to compare configurations.
+    """
+    defaults = {
+        "SECRET_KEY": "benchmark",
+        "GOOGLE_API_KEY": "benchmark",
+        "DATABASE_URL": f"sqlite:///{workdir}/docmind.db",
+        "VECTOR_STORE_PATH": f"{workdir}/chroma_db",
+        "UPLOAD_FOLDER": f"{workdir}/uploads",
+        "EMBEDDING_CACHE_PATH": f"{workdir}/embedding_cache/embeddings.sqlite3",
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+    import app.services.chat_manager as chat_manager_module
+    import app.services.embeddings as embeddings_module
+
+    llm = FakeChatModel(latency=llm_latency, token_latency=token_latency)
+    embeddings = HashingEmbeddings(latency=embedding_latency, per_text_latency=per_text_latency)
+    # Replace the client classes rather than the factories, so caching and pooling stay real
+    chat_manager_module.ChatGoogleGenerativeAI = _constructing(llm)
+    embeddings_module.GoogleGenerativeAIEmbeddings = _constructing(embeddings)
+    return llm, embeddings
+
+
+def _constructing(instance) -> type:
+    """Stand-in for a client class: constructing it returns instance, and isinstance checks against it still work"""
+    return type(f"Fake{type(instance).__name__}", (), {"__new__": lambda cls, **kwargs: instance})
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class AppServer:
+    """uvicorn serving main.app on a background thread, running its lifespan startup and shutdown"""
+
+    def __init__(self, app, startup_timeout: float = 60.0):
+        self.port = _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.startup_timeout = startup_timeout
+        config = uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning", lifespan="on")
+        self.server = uvicorn.Server(config)
+        self.thread = threading.Thread(target=self.server.run, daemon=True)
+
+    def __enter__(self) -> "AppServer":
+        self.thread.start()
+        deadline = time.monotonic() + self.startup_timeout
+        while not self.server.started:
+            if not self.thread.is_alive() or time.monotonic() > deadline:
+                raise RuntimeError("Benchmark server failed to start")
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.server.should_exit = True
+        self.thread.join(timeout=30)
@@ -0,0 +1,137 @@
+"""Deterministic stand-ins for remote backends, used by the offline benchmarks"""
+from langchain_core.callbacks import BaseCallbackHandler
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage, get_buffer_string
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from typing import AsyncIterator, Dict, List
+import asyncio
+import hashlib
+import threading
+import time
+
+
+class FakeEmbeddings(Embeddings):
+    """Hash-based embeddings with a fixed per-call latency, like a remote API round trip"""
+
+    def __init__(self, latency: float = 0.05, dimensions: int = 64, per_text_latency: float = 0.0):
+        self.latency = latency
+        self.per_text_latency = per_text_latency
+        self.dimensions = dimensions
+        self.calls = 0
+        self.texts_embedded = 0
+        self._lock = threading.Lock()
+
+    def _vector(self, text: str) -> List[float]:
+        digest = hashlib.sha256(text.encode("utf-8")).digest()
+        return [(digest[i % len(digest)] - 128) / 128.0 for i in range(self.dimensions)]
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        with self._lock:
+            self.calls += 1
+            self.texts_embedded += len(texts)
+        time.sleep(self.latency + self.per_text_latency * len(texts))
+        return [self._vector(text) for text in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class HashingEmbeddings(FakeEmbeddings):
+    """Bag-of-words feature hashing, so texts sharing words get similar vectors"""
+
+    def __init__(self, latency: float = 0.0, dimensions: int = 256, per_text_latency: float = 0.0):
+        super().__init__(latency=latency, dimensions=dimensions, per_text_latency=per_text_latency)
+
+    def _vector(self, text: str) -> List[float]:
+        vector = [0.0] * self.dimensions
+        for word in text.lower().split():
+            digest = hashlib.md5(word.strip(".,?!:;").encode("utf-8")).digest()
+            vector[int.from_bytes(digest[:4], "little") % self.dimensions] += 1.0 if digest[4] % 2 else -1.0
+        norm = sum(x * x for x in vector) ** 0.5 or 1.0
+        return [x / norm for x in vector]
+
+
+class FakeChatModel(BaseChatModel):
+    """Chat model that answers deterministically after a fixed latency, streaming word by word"""
+
+    latency: float = 0.5
+    token_latency: float = 0.0
+    answer_words: int = 40
+    calls: int = 0
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake-chat"
+
+    def _answer(self, messages: List[BaseMessage]) -> str:
+        digest = hashlib.sha256(get_buffer_string(messages).encode("utf-8")).hexdigest()
+        return " ".join(f"w{digest[i % len(digest)]}{i}" for i in range(self.answer_words))
+
+    def _usage(self, messages: List[BaseMessage]) -> Dict[str, int]:
+        """Usage metadata like a real model reports, counting words as tokens"""
+        input_tokens = len(get_buffer_string(messages).split())
+        return {
+            "input_tokens": input_tokens,
+            "output_tokens": self.answer_words,
+            "total_tokens": input_tokens + self.answer_words
+        }
+
+    def _result(self, messages: List[BaseMessage]) -> ChatResult:
+        message = AIMessage(content=self._answer(messages), usage_metadata=self._usage(messages))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        time.sleep(self.latency + self.token_latency * self.answer_words)
+        return self._result(messages)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        self.calls += 1
+        await asyncio.sleep(self.latency + self.token_latency * self.answer_words)
+        return self._result(messages)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        for word in self._answer(messages).split(" "):
+            await asyncio.sleep(self.token_latency)
+            yield ChatGenerationChunk(message=AIMessageChunk(content=f"{word} "))
+        # Like Gemini, report usage once, on a final empty chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages)))
+
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Counts model invocations; attach it to a fake LLM via callbacks=[counter]"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def on_llm_start(self, serialized, prompts, **kwargs) -> None:
+        self.calls += 1
+
+    def on_chat_model_start(self, serialized, messages, **kwargs) -> None:
+        self.calls += 1
+
+
+class FakeCollection:
+    """Minimal stand-in for a Chroma collection that only records upserts"""
+
+    def __init__(self):
+        self.records: Dict[str, Dict] = {}
+
+    def upsert(self, ids, embeddings, documents, metadatas) -> None:
+        for record_id, embedding, document, metadata in zip(ids, embeddings, documents, metadatas):
+            self.records[record_id] = {
+                "embedding": embedding,
+                "document": document,
+                "metadata": metadata
+            }
+
+    def count(self) -> int:
+        return len(self.records)
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self._collection = FakeCollection()
@@ -1,13 +1,49 @@
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
+from contextlib import asynccontextmanager
+import asyncio
+from app.core import components, metrics
 from app.core.config import settings
+from app.core.request_limits import RequestSizeLimitMiddleware
 from app.api.routes import api_router
+from app.api.endpoints import health
 from app.db.database import create_tables
+from app.api.endpoints.documents import ingestion_queue
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Create database tables here rather than at import, so importing the app stays cheap
+    await run_in_threadpool(create_tables)
+    app.state.database_ready = True
+    await ingestion_queue.start()
+    warm_up = None
+    if settings.WARM_UP_ON_STARTUP:
+        # Build the LLM, embedding and Chroma clients in the background; /health/ready waits for them
+        warm_up = app.state.warm_up = asyncio.create_task(components.warm_up())
+    yield
+    if warm_up is not None and not warm_up.done():
+        warm_up.cancel()
+        await asyncio.gather(warm_up, return_exceptions=True)
+    await ingestion_queue.stop()
+    await run_in_threadpool(components.shutdown)
 
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
-    openapi_url=f"{settings.API_V1_STR}/openapi.json"
+    openapi_url=f"{settings.API_V1_STR}/openapi.json",
+    lifespan=lifespan
+)
+
+# Oversized uploads are refused before their bodies are received; added first so CORS headers wrap the 413
+app.add_middleware(
+    RequestSizeLimitMiddleware,
+    limits={
+        f"{settings.API_V1_STR}/documents/upload": settings.MAX_UPLOAD_SIZE,
+        f"{settings.API_V1_STR}/documents/upload/bulk": settings.BULK_UPLOAD_MAX_SIZE
+    }
 )
 
 # Set up CORS middleware
@@ -19,8 +55,15 @@ app.add_middleware(
     allow_headers=["*"],  # Allows all headers
 )
 
-# Create database tables
-create_tables()
+# Time each request's stages and report them in a Server-Timing header
+if settings.METRICS_ENABLED:
+    app.add_middleware(metrics.ServerTimingMiddleware)
 
 # Include API router
-app.include_router(api_router, prefix=settings.API_V1_STR)
\ No newline at end of file
+app.include_router(api_router, prefix=settings.API_V1_STR)
+app.include_router(health.router, prefix="/health", tags=["health"])
+
+if settings.METRICS_ENABLED:
+    @app.get("/metrics", include_in_schema=False)
+    async def prometheus_metrics():
+        return PlainTextResponse(metrics.render(), media_type=metrics.CONTENT_TYPE)